@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 import os
-from typing import Optional
+from typing import Dict, Optional
 
 from pydantic_settings import BaseSettings
 
@@ -14,15 +14,32 @@ def _normalize_db_url(url: str) -> str:
     return url
 
 
+_SECRET_DIRS = ("/etc/secrets", os.getcwd())
+_SECRET_LISTING: Optional[Dict[str, set]] = None
+
+
+def _secret_listing() -> Dict[str, set]:
+    # One listdir per directory instead of an isfile() probe per secret.
+    global _SECRET_LISTING
+    if _SECRET_LISTING is None:
+        listing: Dict[str, set] = {}
+        for d in _SECRET_DIRS:
+            try:
+                listing[d] = set(os.listdir(d))
+            except OSError:
+                listing[d] = set()
+        _SECRET_LISTING = listing
+    return _SECRET_LISTING
+
+
 def _read_secret_file(name: str) -> Optional[str]:
     # Render Secret Files:
     #  - /etc/secrets/<filename>
     #  - app root: ./<filename>
-    candidates = [
-        os.path.join("/etc/secrets", name),
-        os.path.join(os.getcwd(), name),
-    ]
-    for p in candidates:
+    for d, names in _secret_listing().items():
+        if name not in names:
+            continue
+        p = os.path.join(d, name)
         try:
             if os.path.isfile(p):
                 with open(p, "r", encoding="utf-8") as f:
@@ -53,6 +70,13 @@ class Settings(BaseSettings):
     DATABASE_URL: str = ""
     LOG_LEVEL: str = "INFO"
 
+    # DB pool (one engine per process, see db.get_engine)
+    DB_POOL_MODE: str = "session"  # session | transaction (PgBouncer)
+    DB_POOL_SIZE: int = 3
+    DB_MAX_OVERFLOW: int = 2
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+
     MAX_REQUESTS_PER_IP_PER_MIN: int = 60
     MAX_QUEUE_BACKLOG: int = 60
     MAX_CONCURRENT_JOBS: int = 2
@@ -61,6 +85,72 @@ class Settings(BaseSettings):
     # Hybrid behaviour
     ASYNC_ENABLED: bool = True
 
+    # Queue / worker
+    REDIS_URL: str = ""
+    QUEUE_NAME: str = "default"  # interactive queue; batch/render get -batch / -render suffixes
+    QUEUE_WEIGHTS: str = "interactive=6,render=2,batch=1"
+    QUEUE_SLO_SEC: str = "interactive=5,render=60,batch=300"  # max acceptable queue wait
+    FAIR_MAX_INFLIGHT_PER_CREATOR: int = 1  # 0 disables per-creator fairness
+    WORKER_MODE: str = "fork"  # fork (rq.Worker) | persistent (fixed pool) | autoscale
+    WORKER_MAX_JOBS: int = 500  # recycle a persistent process after N jobs (0 = never)
+    WORKER_MIN_PROCS: int = 1
+    WORKER_MAX_PROCS: int = 4
+    WORKER_SCALE_UP_DEPTH: int = 3  # queued jobs per process before adding one
+    WORKER_SCALE_UP_AGE_SEC: float = 20.0  # oldest queued job older than this -> add one
+    WORKER_SCALE_DOWN_IDLE_SEC: float = 120.0
+    WORKER_SCALE_INTERVAL_SEC: float = 5.0
+
+    # Build-pack submissions with the same normalized request inside this window
+    # return the existing job/pack instead of generating again (0 disables reuse).
+    IDEMPOTENCY_WINDOW_SEC: int = 600
+
+    # url-mode ingestion (utils.url_fetch)
+    URL_FETCH_MAX_BYTES: int = 2_000_000  # stop downloading after this many body bytes
+    URL_FETCH_MAX_CHARS: int = 6000  # stop once this much main-content text is collected
+    URL_FETCH_TIMEOUT_SEC: float = 20.0  # whole-download deadline
+    URL_CACHE_BACKEND: str = "auto"  # auto (redis if REDIS_URL, else disk) | redis | disk | off
+    URL_CACHE_DIR: str = "/tmp/dominator-url-cache"
+    URL_CACHE_TTL_SEC: int = 3600  # served without revalidation
+    URL_CACHE_MAX_AGE_SEC: int = 7 * 86400  # kept for conditional revalidation
+    URL_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Trends cache (services.trends_cache): served stale-while-revalidate
+    TRENDS_FRESH_SEC: int = 900  # older entries are served but refreshed
+    TRENDS_MAX_STALE_SEC: int = 7 * 86400  # entries dropped after this
+    TRENDS_ACTIVE_SEC: int = 86400  # keys requested within this window are kept warm
+    TRENDS_REFRESH_SEC: int = 300  # background refresh period (worker scheduler)
+    TRENDS_CACHE_LIMIT: int = 30  # hashtags fetched per key (requests slice this)
+
+    # Trend time-series store (services.trend_store)
+    TREND_STORE_DIR: str = "/tmp/dominator-trends"  # used when REDIS_URL is not set
+    TREND_BUCKET_SEC: int = 900
+    TREND_WINDOW_BUCKETS: int = 96  # 24h of 15-minute buckets
+    TREND_FAST_HALFLIFE: float = 2.0  # in buckets
+    TREND_SLOW_HALFLIFE: float = 8.0
+    TREND_TOPK: int = 50
+
+    # Shared SIC platform-performance memory (sic_memory)
+    SIC_MEMORY_BACKEND: str = "auto"  # auto (redis if REDIS_URL, else sql if DATABASE_URL) | redis | sql | local
+    SIC_MEMORY_FLUSH_SEC: float = 2.0  # write-behind: pending increments are flushed at least this often
+    SIC_MEMORY_FLUSH_MAX: int = 200  # ... or once this many are pending
+    SIC_MEMORY_REFRESH_SEC: float = 30.0  # local read snapshot refresh period
+    SIC_MEMORY_HALF_LIFE_DAYS: float = 14.0
+    SIC_MEMORY_WINDOW_DAYS: int = 90  # daily counters older than this are ignored / expire
+    SIC_MEMORY_PRIOR: float = 4.0  # Beta prior strength (pseudo-observations) per level
+
+    # Response compression (utils.compression)
+    COMPRESS_ENABLED: bool = True
+    COMPRESS_MIN_BYTES: int = 1024  # smaller bodies go out as-is
+    COMPRESS_GZIP_LEVEL: int = 6
+    COMPRESS_BROTLI_QUALITY: int = 5
+
+    # Pre-render gate for /api/tactical/execute (app.StrategicIntelligenceCore):
+    # drafts scoring below RENDER_GATE_MIN_SCORE are not rendered. Each draft
+    # past the first is one more Gemini call (and its latency) on the request
+    # path before any image is paid for.
+    RENDER_GATE_MIN_SCORE: float = 70.0
+    RENDER_GATE_MAX_DRAFTS: int = 1
+
     WORKER_TICK_TOKEN: str = ""
 
     APIFY_API_KEY: str = ""
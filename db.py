@@ -1,24 +1,232 @@
 # db.py
 from __future__ import annotations
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 
 from config import settings
+from utils import fastjson
+
+
+# -------------------------------
+# Engine registry (one pool per process, fork-aware)
+# -------------------------------
+#
+# Every module that needs a database goes through get_engine(), so a process
+# holds exactly one pool per URL. Pools inherited across fork() (gunicorn
+# preload, RQ work-horse) are dropped in the child without closing the parent's
+# sockets; the child lazily reconnects on first checkout.
+
+_ENGINES: Dict[str, Engine] = {}
+_ENGINES_LOCK = threading.Lock()
+_ENGINES_PID = os.getpid()
+
+
+class _PoolStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_total_ms = 0.0
+            self.wait_max_ms = 0.0
+
+    def record(self, wait_ms: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            if timed_out:
+                self.timeouts += 1
+            self.wait_total_ms += wait_ms
+            if wait_ms > self.wait_max_ms:
+                self.wait_max_ms = wait_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            avg = self.wait_total_ms / self.checkouts if self.checkouts else 0.0
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(avg, 3),
+                "wait_max_ms": round(self.wait_max_ms, 3),
+            }
+
+
+class _MeteredQueuePool(QueuePool):
+    """
+    QueuePool that measures how long callers wait for a connection.
+    """
+
+    stats: _PoolStats
+
+    def _do_get(self):  # type: ignore[override]
+        t0 = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            self.stats.record((time.perf_counter() - t0) * 1000.0, timed_out=True)
+            raise
+        self.stats.record((time.perf_counter() - t0) * 1000.0)
+        return conn
+
+
+def _pool_mode() -> str:
+    mode = (getattr(settings, "DB_POOL_MODE", "session") or "session").strip().lower()
+    return "transaction" if mode == "transaction" else "session"
+
+
+def _json_kwargs() -> Dict[str, Any]:
+    # JSON/JSONB columns (packs.genes/assets/..., jobs.request) encode through
+    # the fast backend instead of the dialect's stdlib json.dumps.
+    return {"json_serializer": fastjson.dumps, "json_deserializer": fastjson.loads}
+
 
+def _build_engine(url: str) -> Engine:
+    if _pool_mode() == "transaction":
+        # PgBouncer (pool_mode=transaction) owns pooling: keep no idle
+        # connections here and never rely on session-level server state.
+        return create_engine(url, poolclass=NullPool, future=True, **_json_kwargs())
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=int(getattr(settings, "DB_POOL_SIZE", 3) or 3),
-    max_overflow=int(getattr(settings, "DB_MAX_OVERFLOW", 2) or 2),
-    future=True,
-)
+    # Stats live on a per-engine subclass so they survive pool.recreate()
+    # (dispose() swaps the pool instance but keeps its class).
+    pool_cls = type("MeteredQueuePool", (_MeteredQueuePool,), {"stats": _PoolStats()})
+    return create_engine(
+        url,
+        poolclass=pool_cls,
+        pool_pre_ping=True,
+        pool_size=int(getattr(settings, "DB_POOL_SIZE", 3) or 3),
+        max_overflow=int(getattr(settings, "DB_MAX_OVERFLOW", 2) or 2),
+        pool_timeout=float(getattr(settings, "DB_POOL_TIMEOUT", 30) or 30),
+        pool_recycle=int(getattr(settings, "DB_POOL_RECYCLE", 1800) or 1800),
+        future=True,
+        **_json_kwargs(),
+    )
 
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+
+def _after_fork_in_child() -> None:
+    global _ENGINES_PID
+    _ENGINES_PID = os.getpid()
+    for eng in list(_ENGINES.values()):
+        try:
+            # close=False: leave the parent's sockets alone, just forget them.
+            eng.dispose(close=False)
+        except Exception:
+            pass
+        stats = getattr(eng.pool, "stats", None)
+        if stats is not None:
+            stats.reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def get_engine(url: Optional[str] = None) -> Engine:
+    """
+    Returns the process-wide engine for `url` (defaults to settings.DATABASE_URL).
+    """
+    url = (url or settings.DATABASE_URL or "").strip()
+    if not url:
+        raise RuntimeError("DATABASE_URL is not set")
+
+    if os.getpid() != _ENGINES_PID:
+        # fork without register_at_fork (very old Pythons / exotic spawners)
+        _after_fork_in_child()
+
+    eng = _ENGINES.get(url)
+    if eng is not None:
+        return eng
+    with _ENGINES_LOCK:
+        eng = _ENGINES.get(url)
+        if eng is None:
+            eng = _build_engine(url)
+            _ENGINES[url] = eng
+    return eng
+
+
+def dispose_engines() -> None:
+    """
+    Close every pooled connection in this process (shutdown / tests).
+    """
+    with _ENGINES_LOCK:
+        for eng in _ENGINES.values():
+            eng.dispose()
+        _ENGINES.clear()
+
+
+def pool_stats() -> Dict[str, Any]:
+    """
+    Pool occupancy and checkout wait metrics for every registered engine.
+    saturation = checked-out connections / (pool_size + max_overflow).
+    """
+    out: Dict[str, Any] = {"mode": _pool_mode(), "pid": os.getpid(), "engines": []}
+    for url, eng in list(_ENGINES.items()):
+        pool = eng.pool
+        row: Dict[str, Any] = {"url": eng.url.render_as_string(hide_password=True)}
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(0, pool._max_overflow)
+            checked_out = pool.checkedout()
+            row.update(
+                {
+                    "size": pool.size(),
+                    "max_overflow": pool._max_overflow,
+                    "checked_out": checked_out,
+                    "checked_in": pool.checkedin(),
+                    "overflow": pool.overflow(),
+                    "saturation": round(checked_out / capacity, 3) if capacity > 0 else 0.0,
+                }
+            )
+            stats = getattr(pool, "stats", None)
+            if stats is not None:
+                row.update(stats.snapshot())
+        else:
+            row["pool"] = pool.__class__.__name__
+        out["engines"].append(row)
+    return out
+
+
+class _LazySessionmaker(sessionmaker):
+    def __call__(self, **kw: Any) -> Session:
+        if "bind" not in kw and self.kw.get("bind") is None:
+            kw["bind"] = get_engine()
+        return super().__call__(**kw)
+
+
+SessionLocal = _LazySessionmaker(autoflush=False, autocommit=False, future=True)
+
+
+def __getattr__(name: str) -> Any:
+    # Backward compatibility: `from db import engine` used to build the engine
+    # at import time. Resolve it lazily through the registry instead.
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(name)
 
 
 def init_db() -> None:
     from models import Base  # noqa
 
+    engine = get_engine()
     Base.metadata.create_all(bind=engine)
+
+    # create_all() never alters existing tables: add the submission-dedupe
+    # columns to databases created before they existed.
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(96)"))
+            conn.execute(text("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS request_hash VARCHAR(64)"))
+            conn.execute(text("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS client_key VARCHAR(64)"))
+            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_jobs_idempotency_key ON jobs (idempotency_key)"))
+            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_jobs_client_key ON jobs (client_key)"))
+            conn.execute(
+                text("CREATE INDEX IF NOT EXISTS ix_jobs_request_hash_created_at ON jobs (request_hash, created_at)")
+            )
@@ -1,5 +1,11 @@
 from __future__ import annotations
-from typing import Any, Dict, List
+
+import re
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from utils.text import normalize_text
 
 # =========================================================
 # Strategic Intelligence Core (SIC) - V14.1 FINAL STABILITY
@@ -16,7 +22,7 @@ WPIL_DOMINATOR_SYSTEM = """
 def get_elite_character() -> str:
     return "A sharp, charismatic young Middle-Eastern elite businessman, 30 years old, premium tailored charcoal suit, sophisticated appearance, standing in a high-tech modern office."
 
-def strategic_intelligence_core(idea: str = "") -> Dict[str, Any]:
+def elite_video_segments(idea: str = "") -> Dict[str, Any]:
     v_force = "Vertical 9:16 aspect ratio, cinematic 8k, professional photography."
     char = get_elite_character()
     scenes = [
@@ -34,3 +40,305 @@ def alchemy_fusion_core(gold_posts: List[Dict[str, Any]], niche: str) -> Dict[st
     صمم [VISUAL_PROMPT] يصف لقطة فوتوغرافية لـ {get_elite_character()} مرتبطة بالموضوع.
     """
     return {"synthesis_task": task, "logic_trace": "SYNTHESIS v14.1 ACTIVE"}
+
+
+# =========================================================
+# SIC decision engine (SIC_LOGIC.md / SIC_BLUEPRINT.md, V16.0)
+# =========================================================
+#
+# Stages, in blueprint order: normalize -> evaluate metrics -> dominance law
+# -> select platforms -> build directive. Every rule lives in the tables
+# below and is compiled to NumPy arrays once at import, so a batch of N
+# signals is a handful of array ops: metrics = clip(bias + F @ W), the
+# dominance law and the platform rules are column comparisons.
+#
+# Metrics (0..1) come from content_signal["metrics"] when the caller already
+# has them, otherwise from deterministic text features of raw_text. No
+# model calls, no logging, no exceptions: a malformed input is an
+# execute=false decision with its reason.
+
+METRICS = (
+    "curiosity", "shock", "skimmability", "share_trigger", "authority",
+    "depth", "visual_bias", "hook_strength",
+)
+
+# Dominance Law (SIC_LOGIC 5): abort below any of these
+DOMINANCE_LAW = (("curiosity", 0.7), ("share_trigger", 0.6), ("hook_strength", 0.6))
+
+# Platform selection (SIC_LOGIC 4.1): (platform, metric a, metric b, a + b >=, content_mode)
+PLATFORM_RULES = (
+    ("twitter", "curiosity", "skimmability", 1.6, "thread"),
+    ("linkedin", "authority", "depth", 1.5, "post"),
+    ("tiktok", "shock", "visual_bias", 1.4, "video"),
+)
+SUPPRESS_BELOW = 0.6  # SIC_LOGIC 4.2
+HISTORY_WEIGHT = 0.2  # platform score = (1 - w) * mean(a, b) + w * historical score
+
+INTENTS = ("inform", "persuade", "dominate")
+STYLES = ("Professional", "Aggressive", "Visionary", "Rebel")
+_INTENT_STYLE = {"inform": "Professional", "persuade": "Visionary", "dominate": "Aggressive"}
+_PLATFORM_ALIASES = {"x": "twitter", "x.com": "twitter", "linked_in": "linkedin"}
+
+# cue lists are matched on utils.text.normalize_text output
+_CUES = {
+    "curiosity": ("سر", "لماذا", "كيف", "لن تصدق", "الحقيقه", "ما لا", "اكتشف", "secret", "why", "how", "nobody", "truth", "what if", "the real"),
+    "shock": ("صادم", "توقف", "خطا", "كارثه", "لا تفعل", "انتهي", "shocking", "stop", "never", "mistake", "dead", "brutal", "wrong"),
+    "authority": ("دراسه", "بيانات", "سنوات", "خبره", "تجربه", "نتائج", "research", "data", "years", "study", "results", "proven"),
+    "visual": ("شاهد", "صوره", "فيديو", "انظر", "تخيل", "watch", "see", "look", "video", "imagine", "before", "after"),
+    "share": ("شارك", "احفظ", "منشن", "ارسل", "علق", "share", "save", "tag", "send", "repost", "comment"),
+}
+
+# feature columns (all scaled to roughly 0..1)
+FEATURES = (
+    "hook_brevity", "hook_question", "has_number", "curiosity_cues", "shock_cues",
+    "line_count", "short_lines", "authority_cues", "length", "visual_cues",
+    "share_cues", "list_ratio", "hook_score", "intent_inform", "intent_persuade", "intent_dominate",
+)
+
+# metric -> (bias, {feature: weight})
+METRIC_TABLE = {
+    "curiosity": (0.25, {"hook_question": 0.25, "curiosity_cues": 0.35, "has_number": 0.1, "hook_brevity": 0.15, "intent_dominate": 0.05}),
+    "shock": (0.2, {"shock_cues": 0.5, "has_number": 0.1, "hook_brevity": 0.1, "intent_dominate": 0.15}),
+    "skimmability": (0.15, {"line_count": 0.3, "short_lines": 0.35, "list_ratio": 0.2, "hook_brevity": 0.1}),
+    "share_trigger": (0.25, {"share_cues": 0.35, "curiosity_cues": 0.15, "has_number": 0.1, "list_ratio": 0.1, "intent_persuade": 0.1}),
+    "authority": (0.2, {"authority_cues": 0.45, "has_number": 0.15, "length": 0.1, "intent_inform": 0.1}),
+    "depth": (0.1, {"length": 0.5, "line_count": 0.2, "authority_cues": 0.2}),
+    "visual_bias": (0.2, {"visual_cues": 0.5, "shock_cues": 0.15, "hook_brevity": 0.1}),
+    "hook_strength": (0.1, {"hook_score": 0.6, "hook_brevity": 0.15, "hook_question": 0.1, "curiosity_cues": 0.1}),
+}
+
+
+_HOOK_SCORE = FEATURES.index("hook_score")
+
+
+def _compile_rules():
+    fi = {f: i for i, f in enumerate(FEATURES)}
+    mi = {m: i for i, m in enumerate(METRICS)}
+    weights = np.zeros((len(FEATURES), len(METRICS)), dtype=np.float64)
+    bias = np.zeros(len(METRICS), dtype=np.float64)
+    for m, (b, ws) in METRIC_TABLE.items():
+        bias[mi[m]] = b
+        for f, w in ws.items():
+            weights[fi[f], mi[m]] = w
+    law_idx = np.array([mi[m] for m, _ in DOMINANCE_LAW])
+    law_min = np.array([t for _, t in DOMINANCE_LAW])
+    rule_a = np.array([mi[a] for _, a, _, _, _ in PLATFORM_RULES])
+    rule_b = np.array([mi[b] for _, _, b, _, _ in PLATFORM_RULES])
+    rule_min = np.array([t for _, _, _, t, _ in PLATFORM_RULES])
+    return weights, bias, law_idx, law_min, rule_a, rule_b, rule_min
+
+
+_W, _BIAS, _LAW_IDX, _LAW_MIN, _RULE_A, _RULE_B, _RULE_MIN = _compile_rules()
+_RULE_PLATFORMS = tuple(r[0] for r in PLATFORM_RULES)
+_RULE_MODES = {r[0]: r[4] for r in PLATFORM_RULES}
+# cues start a word; Arabic ones may carry a conjunction / article prefix
+_CUE_RE = {
+    k: re.compile(r"(?<!\w)(?:وال|ال|و|ف|ب|ل)?(?:" + "|".join(re.escape(c) for c in sorted(v, key=len, reverse=True)) + ")")
+    for k, v in _CUES.items()
+}
+_NUM_RE = re.compile(r"[0-9٠-٩]")
+_LIST_RE = re.compile(r"^\s*(?:[0-9٠-٩]+[.)\-]|[-•*▪►✅👉→])")
+
+
+class _Signal:
+    __slots__ = ("ok", "reason", "text", "intent", "style", "confidence", "platforms", "history", "metrics")
+
+
+def _normalize(payload: Any) -> _Signal:
+    sig = _Signal()
+    sig.ok, sig.reason, sig.metrics = False, "", None
+    if not isinstance(payload, dict):
+        sig.reason = "malformed input: expected an object with content_signal / style_signal / context_signal / system_memory"
+        return sig
+    content = payload.get("content_signal")
+    context = payload.get("context_signal")
+    style = payload.get("style_signal") or {}
+    memory = payload.get("system_memory") or {}
+    if not isinstance(content, dict) or not isinstance(context, dict) or not isinstance(style, dict) or not isinstance(memory, dict):
+        sig.reason = "malformed input: content_signal and context_signal are required objects"
+        return sig
+
+    sig.text = str(content.get("raw_text") or "").strip()
+    metrics = content.get("metrics")
+    if not sig.text and not isinstance(metrics, dict):
+        sig.reason = "missing input: content_signal.raw_text is empty"
+        return sig
+    if isinstance(metrics, dict):
+        try:
+            sig.metrics = np.array([float(metrics.get(m, 0.0) or 0.0) for m in METRICS])
+        except (TypeError, ValueError):
+            sig.reason = "malformed input: content_signal.metrics must be numbers"
+            return sig
+
+    intent = str(content.get("intent") or "inform").strip().lower()
+    sig.intent = intent if intent in INTENTS else "inform"
+    dna = str(style.get("style_dna") or "").strip().title()
+    sig.style = dna if dna in STYLES else ""
+    try:
+        sig.confidence = float(style.get("confidence_level") or 0.0)
+    except (TypeError, ValueError):
+        sig.confidence = 0.0
+
+    raw_platforms = context.get("platforms_available")
+    if not isinstance(raw_platforms, (list, tuple)) or not raw_platforms:
+        sig.reason = "missing input: context_signal.platforms_available is empty"
+        return sig
+    sig.platforms = {_PLATFORM_ALIASES.get(str(p).strip().lower(), str(p).strip().lower()) for p in raw_platforms}
+
+    hist = memory.get("historical_scores") or {}
+    sig.history = {}
+    if isinstance(hist, dict):
+        for p, v in hist.items():
+            try:
+                sig.history[_PLATFORM_ALIASES.get(str(p).lower(), str(p).lower())] = float(v)
+            except (TypeError, ValueError):
+                continue
+    sig.ok = True
+    return sig
+
+
+def _features(sig: _Signal, out: np.ndarray) -> str:
+    # fills every feature but hook_score; returns the hook line, scored per batch
+    lines = [l for l in sig.text.splitlines() if l.strip()] or [sig.text]
+    norm = normalize_text(sig.text)
+    hook = lines[0].strip()
+    hook_words = len(hook.split())
+    words = len(norm.split())
+    line_words = words / max(1, len(lines))
+    cues = {k: len(r.findall(norm)) for k, r in _CUE_RE.items()}
+    out[:] = (
+        min(1.0, max(0.0, (18 - hook_words) / 12.0)),
+        1.0 if hook.endswith(("?", "؟")) else 0.0,
+        1.0 if _NUM_RE.search(sig.text) else 0.0,
+        min(1.0, cues["curiosity"] / 2.0),
+        min(1.0, cues["shock"] / 2.0),
+        min(1.0, len(lines) / 8.0),
+        min(1.0, max(0.0, (25 - line_words) / 17.0)),
+        min(1.0, cues["authority"] / 2.0),
+        min(1.0, words / 220.0),
+        min(1.0, cues["visual"] / 2.0),
+        min(1.0, cues["share"] / 2.0),
+        sum(1 for l in lines if _LIST_RE.match(l)) / len(lines),
+        0.0,
+        1.0 if sig.intent == "inform" else 0.0,
+        1.0 if sig.intent == "persuade" else 0.0,
+        1.0 if sig.intent == "dominate" else 0.0,
+    )
+    return hook
+
+
+def _abort(reason: str) -> Dict[str, Any]:
+    return {
+        "execute": False,
+        "primary_platform": None,
+        "secondary_platforms": [],
+        "content_mode": "post",
+        "style_override": "",
+        "rules": {},
+        "decision_reason": reason,
+    }
+
+
+def evaluate_metrics(payloads: List[Dict[str, Any]]) -> Tuple[np.ndarray, List[_Signal]]:
+    """
+    (N x len(METRICS) matrix, normalized signals); rows of malformed inputs are 0.
+    """
+    sigs = [_normalize(p) for p in payloads]
+    feats = np.zeros((len(sigs), len(FEATURES)), dtype=np.float64)
+    derived = np.zeros(len(sigs), dtype=bool)
+    hooks = []
+    for i, sig in enumerate(sigs):
+        if sig.ok and sig.metrics is None:
+            hooks.append(_features(sig, feats[i]))
+            derived[i] = True
+    if hooks:
+        from services.scoring import score_hooks
+
+        feats[derived, _HOOK_SCORE] = (score_hooks(hooks) - 50.0) / 45.0  # score_hook is 50..95
+    metrics = np.clip(_BIAS + feats @ _W, 0.0, 1.0)
+    metrics[~derived] = 0.0
+    for i, sig in enumerate(sigs):
+        if sig.ok and sig.metrics is not None:
+            metrics[i] = np.clip(sig.metrics, 0.0, 1.0)
+    return metrics, sigs
+
+
+def sic_decide_batch(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    One blueprint decision object per input, evaluated as a batch.
+    """
+    try:
+        metrics, sigs = evaluate_metrics(list(payloads))
+    except Exception as e:  # the contract forbids propagating
+        return [_abort(f"evaluation failed: {e}") for _ in payloads]
+
+    n = len(sigs)
+    law_ok = (metrics[:, _LAW_IDX] >= _LAW_MIN).all(axis=1) if n else np.zeros(0, dtype=bool)
+    a, b = metrics[:, _RULE_A], metrics[:, _RULE_B]
+    rule_ok = (a + b) >= _RULE_MIN - 1e-9
+    rule_mean = (a + b) / 2.0
+    history = np.array(
+        [[s.history.get(p, np.nan) if s.ok else np.nan for p in _RULE_PLATFORMS] for s in sigs], dtype=np.float64
+    ).reshape(n, len(_RULE_PLATFORMS))
+    platform_score = np.where(np.isnan(history), rule_mean, (1 - HISTORY_WEIGHT) * rule_mean + HISTORY_WEIGHT * history)
+    available = np.array([[s.ok and p in s.platforms for p in _RULE_PLATFORMS] for s in sigs], dtype=bool).reshape(n, -1)
+    selected = rule_ok & available & (platform_score >= SUPPRESS_BELOW)
+
+    out = []
+    for i, sig in enumerate(sigs):
+        if not sig.ok:
+            out.append(_abort(sig.reason))
+            continue
+        m = dict(zip(METRICS, np.round(metrics[i], 3).tolist()))
+        if not law_ok[i]:
+            failed = [f"{name}={m[name]:.2f}<{t}" for name, t in DOMINANCE_LAW if m[name] < t]
+            out.append(_abort("dominance law: " + ", ".join(failed)))
+            continue
+        if not selected[i].any():
+            passed = [p for j, p in enumerate(_RULE_PLATFORMS) if rule_ok[i, j]]
+            if not passed:
+                reason = "no platform rule satisfied"
+            elif not any(available[i, j] for j, p in enumerate(_RULE_PLATFORMS) if rule_ok[i, j]):
+                reason = f"rule platforms not available: {', '.join(passed)}"
+            else:
+                reason = f"suppressed (platform score < {SUPPRESS_BELOW}): {', '.join(passed)}"
+            out.append(_abort(reason))
+            continue
+
+        order = [j for j in np.argsort(-platform_score[i], kind="stable") if selected[i, j]]
+        primary = _RULE_PLATFORMS[order[0]]
+        style = sig.style if sig.style and sig.confidence >= 0.5 else _INTENT_STYLE[sig.intent]
+        if primary == "linkedin":
+            length = "long" if m["depth"] >= 0.75 else "medium"
+        else:
+            length = "short"
+        out.append(
+            {
+                "execute": True,
+                "primary_platform": primary,
+                "secondary_platforms": [_RULE_PLATFORMS[j] for j in order[1:]],
+                "content_mode": _RULE_MODES[primary],
+                "style_override": style,
+                "rules": {
+                    "hook_required": True,
+                    "cta_type": "share" if m["share_trigger"] >= 0.75 else "curiosity",
+                    "length": length,
+                },
+                "decision_reason": "; ".join(
+                    f"{_RULE_PLATFORMS[j]} score={platform_score[i, j]:.2f}" for j in order
+                ) + f" | curiosity={m['curiosity']:.2f} share={m['share_trigger']:.2f} hook={m['hook_strength']:.2f}",
+            }
+        )
+    return out
+
+
+def strategic_intelligence_core(sic_input: Any = None, *, idea: str | None = None) -> Dict[str, Any]:
+    """
+    SIC v1 decision for one input contract object (SIC_BLUEPRINT 3 / 5).
+
+    The pre-V16 call style (an idea string, or no argument) still returns the
+    v14.1 scene list; new code should call elite_video_segments() for that.
+    """
+    if idea is not None or sic_input is None or isinstance(sic_input, str):
+        return elite_video_segments(idea if idea is not None else sic_input or "")
+    return sic_decide_batch([sic_input])[0]
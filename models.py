@@ -5,7 +5,7 @@ import uuid
 from datetime import datetime, timezone
 from typing import Any, Dict, Optional
 
-from sqlalchemy import DateTime, Float, ForeignKey, String, Text, Index
+from sqlalchemy import DateTime, Float, ForeignKey, Integer, String, Text, Index
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 try:
@@ -31,6 +31,11 @@ class Job(Base):
 
     request: Mapped[Dict[str, Any]] = mapped_column(_JSON, default=dict, nullable=False)
 
+    # submission dedupe (see services/packs_api.py)
+    idempotency_key: Mapped[Optional[str]] = mapped_column(String(96), nullable=True)
+    client_key: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    request_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+
     pack_id: Mapped[Optional[str]] = mapped_column(String(32), ForeignKey("packs.id"), nullable=True)
     error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     error_trace: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
@@ -40,7 +45,9 @@ class Job(Base):
     started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
     finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
-    pack: Mapped[Optional["Pack"]] = relationship("Pack", back_populates="job", foreign_keys=[pack_id], uselist=False)
+    # jobs.pack_id and packs.job_id are two separate many-to-one links, not one
+    # bidirectional relationship.
+    pack: Mapped[Optional["Pack"]] = relationship("Pack", foreign_keys=[pack_id], uselist=False)
 
 
 class Pack(Base):
@@ -65,7 +72,24 @@ class Pack(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow, onupdate=_utcnow, nullable=False)
 
-    job: Mapped[Optional[Job]] = relationship("Job", back_populates="pack", foreign_keys=[job_id], uselist=False)
+    job: Mapped[Optional[Job]] = relationship("Job", foreign_keys=[job_id], uselist=False)
+
+
+class SicCounter(Base):
+    """
+    Daily success / failure counts per SIC memory dimension (sic_memory SQL
+    backend; Redis deployments keep these in hashes instead).
+    """
+
+    __tablename__ = "sic_counters"
+
+    day: Mapped[int] = mapped_column(Integer, primary_key=True)  # days since epoch (UTC)
+    dim: Mapped[str] = mapped_column(String(255), primary_key=True)
+    successes: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    failures: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
 
 
-Index("ix_packs_job_id", Pack.job_id)
+# ix_packs_job_id comes from Pack.job_id(index=True)
+Index("ux_jobs_idempotency_key", Job.idempotency_key, unique=True)
+Index("ux_jobs_client_key", Job.client_key, unique=True)
+Index("ix_jobs_request_hash_created_at", Job.request_hash, Job.created_at)
@@ -5,14 +5,26 @@ import re
 import time
 from urllib.parse import quote
 import requests
-from bs4 import BeautifulSoup
 
 from config import settings
 from services.trends import get_trending_hashtags
+from utils.url_cache import fetch_cached
 
 
 GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
 
+_HTTP: requests.Session | None = None
+
+
+def http_session() -> requests.Session:
+    """
+    Process-wide keep-alive session (reused across jobs by persistent workers).
+    """
+    global _HTTP
+    if _HTTP is None:
+        _HTTP = requests.Session()
+    return _HTTP
+
 
 def run_build_pack(payload: dict) -> dict:
     mode = (payload.get("mode") or "niche").lower()
@@ -21,18 +33,21 @@ def run_build_pack(payload: dict) -> dict:
     tone = payload.get("tone") or "authority"
     include_visual = bool(payload.get("include_visual", True))
 
-    # 1) Signal: trends + optional url text
-    trends = get_trending_hashtags(limit=15)
-
+    # 1) Signal: optional url text + trends
     input_value = ""
     url_text = ""
+    url_fetch = None
     if mode == "url":
         input_value = payload.get("url") or ""
         if input_value:
-            url_text = fetch_url_text(input_value)
+            fetched = fetch_cached(input_value, session=http_session())
+            url_text, url_fetch = fetched.text, fetched.meta()
     else:
         input_value = payload.get("niche") or ""
 
+    # cached (stale-while-revalidate): no provider call on the job path
+    trends = get_trending_hashtags(limit=15, lang=language, topic=input_value)
+
     context = {
         "mode": mode,
         "niche": input_value if mode == "niche" else "",
@@ -75,24 +90,13 @@ def run_build_pack(payload: dict) -> dict:
         "sources": {
             "trends": trends,
             "url": context.get("url"),
+            "url_fetch": url_fetch,
         },
     }
 
 
 def fetch_url_text(url: str) -> str:
-    try:
-        r = requests.get(url, timeout=20, headers={"User-Agent": "AI-DOMINATOR/1.0"})
-        r.raise_for_status()
-        html = r.text
-        soup = BeautifulSoup(html, "lxml")
-        # remove scripts/styles
-        for tag in soup(["script", "style", "noscript"]):
-            tag.extract()
-        text = soup.get_text(separator=" ")
-        text = re.sub(r"\s+", " ", text).strip()
-        return text
-    except Exception:
-        return ""
+    return fetch_cached(url, session=http_session()).text
 
 
 def nebula_models() -> list[str]:
@@ -121,7 +125,7 @@ def call_gemini(prompt: str, temperature: float = 0.7, max_tokens: int = 1024) -
                     "maxOutputTokens": max_tokens,
                 },
             }
-            r = requests.post(url, json=body, timeout=settings.MODEL_TIMEOUT_SEC)
+            r = http_session().post(url, json=body, timeout=settings.MODEL_TIMEOUT_SEC)
             if r.status_code in (429, 500, 502, 503, 504):
                 last_err = f"{model} -> {r.status_code}"
                 # prompt shrink on rate-limit
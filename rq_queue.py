@@ -1,18 +1,270 @@
 from __future__ import annotations
 
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
 from redis import Redis
 from rq import Queue
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
 from config import settings
 
 
-def get_redis() -> Redis | None:
+# -------------------------------
+# Queue classes
+# -------------------------------
+#
+# interactive: single-pack requests a user is waiting on (settings.QUEUE_NAME)
+# batch:       bulk / multi-item work
+# render:      image-heavy jobs (reels, scene renders)
+#
+# Workers listen on all three in smooth weighted round-robin order
+# (QUEUE_WEIGHTS); within a queue, each creator has at most
+# FAIR_MAX_INFLIGHT_PER_CREATOR jobs in the FIFO and the rest wait in a
+# per-creator backlog that is released as their earlier jobs start. A slot is
+# the job id itself, so a job that leaves the FIFO without starting
+# (cancelled, deleted, expired) is swept when its creator hits the limit, and
+# any slot older than _FAIR_TTL_SEC expires.
+
+QUEUE_CLASSES = ("interactive", "batch", "render")
+
+_FAIR_PREFIX = "dominator:fair"
+_SLO_PREFIX = "dominator:slo"
+_FAIR_TTL_SEC = 86400
+_SLO_SAMPLES = 1000
+
+# Atomically either give the job one of its creator's in-queue slots or park
+# it. Slots are a zset of job ids scored by when they were taken.
+_PARK_LUA = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', tonumber(ARGV[3]) - tonumber(ARGV[4]))
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+  redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+  return 0
+end
+redis.call('RPUSH', KEYS[2], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return 1
+"""
+
+# A job left the FIFO: free its slot (once; releasing twice is a no-op) and
+# hand it to the creator's next parked job, if any.
+_RELEASE_LUA = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then return false end
+local id = redis.call('LPOP', KEYS[2])
+if id then redis.call('ZADD', KEYS[1], ARGV[2], id) end
+return id
+"""
+
+# job states that still hold an in-queue slot
+_WAITING = {"created", "queued", "scheduled", "deferred"}
+
+
+def get_redis(decode_responses: bool = True) -> Redis | None:
+    # rq pickles job payloads, so anything handed to rq needs decode_responses=False
     if not settings.REDIS_URL:
         return None
-    return Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return Redis.from_url(settings.REDIS_URL, decode_responses=decode_responses)
+
+
+def _parse_kv(raw: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for part in (raw or "").split(","):
+        k, _, v = part.partition("=")
+        k = k.strip().lower()
+        if not k:
+            continue
+        try:
+            out[k] = float(v)
+        except ValueError:
+            continue
+    return out
+
+
+def queue_weights() -> Dict[str, float]:
+    w = _parse_kv(settings.QUEUE_WEIGHTS)
+    return {c: max(0.0, w.get(c, 1.0)) for c in QUEUE_CLASSES}
 
 
-def get_queue() -> Queue | None:
-    r = get_redis()
+def queue_slos() -> Dict[str, float]:
+    s = _parse_kv(settings.QUEUE_SLO_SEC)
+    return {c: s.get(c, 60.0) for c in QUEUE_CLASSES}
+
+
+def queue_name(qclass: str = "interactive") -> str:
+    if qclass not in QUEUE_CLASSES:
+        raise ValueError(f"Unknown queue class: {qclass}")
+    if qclass == "interactive":
+        return settings.QUEUE_NAME
+    return f"{settings.QUEUE_NAME}-{qclass}"
+
+
+def queue_class_of(name: str) -> str:
+    for c in QUEUE_CLASSES:
+        if queue_name(c) == name:
+            return c
+    return "interactive"
+
+
+def all_queue_names() -> List[str]:
+    # heaviest weight first (the initial dequeue order)
+    w = queue_weights()
+    return [queue_name(c) for c in sorted(QUEUE_CLASSES, key=lambda c: -w[c])]
+
+
+def get_queue(qclass: str = "interactive") -> Queue | None:
+    r = get_redis(decode_responses=False)
     if not r:
         return None
-    return Queue(name=settings.QUEUE_NAME, connection=r, default_timeout=settings.MODEL_TIMEOUT_SEC * 4)
+    return Queue(name=queue_name(qclass), connection=r, default_timeout=settings.MODEL_TIMEOUT_SEC * 4)
+
+
+def route_request(request: Dict[str, Any]) -> str:
+    """
+    Picks the queue class from the request type at enqueue time.
+    """
+    explicit = str(request.get("queue") or "").strip().lower()
+    if explicit in QUEUE_CLASSES:
+        return explicit
+    if request.get("batch") or len(request.get("items") or []) > 1:
+        return "batch"
+    if str(request.get("mode") or "").upper() == "REELS_ENGINE" or request.get("render"):
+        return "render"
+    return "interactive"
+
+
+def _fair_keys(qname: str, creator_id: str) -> List[str]:
+    return [f"{_FAIR_PREFIX}:{qname}:inflight:{creator_id}", f"{_FAIR_PREFIX}:{qname}:backlog:{creator_id}"]
+
+
+def _release_slot(queue: Queue, creator_id: str, job_id: str) -> None:
+    r = queue.connection
+    for _ in range(8):
+        next_id = r.eval(_RELEASE_LUA, 2, *_fair_keys(queue.name, creator_id), job_id, time.time())
+        if not next_id:
+            return
+        if isinstance(next_id, bytes):
+            next_id = next_id.decode()
+        try:
+            queue.enqueue_job(Job.fetch(next_id, connection=r))
+            return
+        except NoSuchJobError:
+            # parked job expired or was deleted: free the slot it was just given
+            job_id = next_id
+
+
+def _sweep_slots(queue: Queue, creator_id: str) -> None:
+    """
+    Frees slots whose job left the FIFO without starting (cancelled, deleted,
+    expired): rq runs no callback for those.
+    """
+    r = queue.connection
+    ids = [i.decode() if isinstance(i, bytes) else i for i in r.zrange(_fair_keys(queue.name, creator_id)[0], 0, -1)]
+    for job_id, job in zip(ids, Job.fetch_many(ids, connection=r)):
+        if job is None or job.get_status(refresh=False) not in _WAITING:
+            _release_slot(queue, creator_id, job_id)
+
+
+def release_job_slot(job: Job, queue: Queue) -> None:
+    """
+    For paths that drop a routed job before it starts (e.g. job.cancel()).
+    """
+    creator_id = (job.meta or {}).get("creator_id") or ""
+    if creator_id:
+        _release_slot(queue, creator_id, job.id)
+
+
+def enqueue_routed(
+    func: Callable[..., Any] | str,
+    *args: Any,
+    request: Dict[str, Any],
+    creator_id: str | None = None,
+    job_id: str | None = None,
+    timeout: int | None = None,
+) -> Job | None:
+    """
+    Enqueues `func(*args)` on the queue class chosen by route_request(),
+    applying per-creator fairness when a creator_id is known.
+    """
+    qclass = route_request(request)
+    q = get_queue(qclass)
+    if q is None:
+        return None
+
+    creator_id = (creator_id or "").strip()
+    meta = {"creator_id": creator_id, "qclass": qclass}
+    job = q.create_job(func, args=args, timeout=timeout, job_id=job_id, meta=meta)
+
+    limit = int(settings.FAIR_MAX_INFLIGHT_PER_CREATOR or 0)
+    if not creator_id or limit <= 0:
+        return q.enqueue_job(job)
+
+    job.save()
+    parked = q.connection.eval(_PARK_LUA, 2, *_fair_keys(q.name, creator_id), job.id, limit, time.time(), _FAIR_TTL_SEC)
+    if not int(parked):
+        q.enqueue_job(job)
+    else:
+        _sweep_slots(q, creator_id)  # may hand a leaked slot straight to this job
+    return job
+
+
+def _record_wait(r: Redis, qname: str, wait_sec: float) -> None:
+    slo = queue_slos()[queue_class_of(qname)]
+    p = r.pipeline(transaction=False)
+    p.lpush(f"{_SLO_PREFIX}:{qname}:waits", round(wait_sec * 1000.0, 1))
+    p.ltrim(f"{_SLO_PREFIX}:{qname}:waits", 0, _SLO_SAMPLES - 1)
+    p.hincrby(f"{_SLO_PREFIX}:{qname}:counts", "total", 1)
+    if wait_sec > slo:
+        p.hincrby(f"{_SLO_PREFIX}:{qname}:counts", "breach", 1)
+    p.execute()
+
+
+def on_job_started(job: Job, queue: Queue) -> None:
+    """
+    Worker hook: records queue wait against the SLO and releases the creator's
+    next parked job into the FIFO.
+    """
+    r = queue.connection
+    if job.enqueued_at is not None:
+        enq = job.enqueued_at
+        if enq.tzinfo is None:
+            enq = enq.replace(tzinfo=timezone.utc)
+        _record_wait(r, queue.name, max(0.0, (datetime.now(timezone.utc) - enq).total_seconds()))
+
+    if int(settings.FAIR_MAX_INFLIGHT_PER_CREATOR or 0) > 0:
+        release_job_slot(job, queue)
+
+
+def _percentile(sorted_vals: List[float], pct: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, int(round(pct / 100.0 * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+
+def queue_slo_report(r: Redis | None = None) -> Dict[str, Any]:
+    """
+    Per-queue depth, wait percentiles (last samples) and SLO attainment.
+    """
+    r = r or get_redis(decode_responses=False)
+    if r is None:
+        return {}
+    slos = queue_slos()
+    out: Dict[str, Any] = {}
+    for c in QUEUE_CLASSES:
+        qname = queue_name(c)
+        waits = sorted(float(x) for x in r.lrange(f"{_SLO_PREFIX}:{qname}:waits", 0, -1))
+        counts = {(k.decode() if isinstance(k, bytes) else k): int(v) for k, v in r.hgetall(f"{_SLO_PREFIX}:{qname}:counts").items()}
+        total = counts.get("total", 0)
+        out[c] = {
+            "queue": qname,
+            "depth": Queue(qname, connection=r).count,
+            "slo_sec": slos[c],
+            "wait_p50_ms": _percentile(waits, 50),
+            "wait_p95_ms": _percentile(waits, 95),
+            "wait_p99_ms": _percentile(waits, 99),
+            "jobs": total,
+            "attainment": round(1.0 - counts.get("breach", 0) / total, 4) if total else 1.0,
+        }
+    return out
@@ -23,6 +23,7 @@ class JobResponse(BaseModel):
     progress: float = 0.0
     pack_id: str | None = None
     error: str | None = None
+    reused: bool = False
 
 
 class PackResponse(BaseModel):
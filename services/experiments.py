@@ -1,10 +1,10 @@
 from __future__ import annotations
-import json
 from dataclasses import dataclass
 from typing import Any, Literal
 from sqlalchemy.orm import Session
 
 from models import Experiment, Creator
+from utils import fastjson
 from utils.logging import get_logger, safe_json
 
 log = get_logger("experiments")
@@ -92,7 +92,7 @@ def add_metrics_point(
     variant_key: Literal["A", "B", "C"],
     point: dict[str, Any],
 ) -> LiftResult:
-    metrics = json.loads(exp.metrics_json or "[]")
+    metrics = fastjson.loads(exp.metrics_json or "[]")
 
     # Find entry for this t_label or create
     t_label = point["t_label"]
@@ -125,7 +125,7 @@ def finalize_lift(db: Session, creator: Creator, exp: Experiment) -> LiftResult:
     Computes lift from latest metrics available.
     Updates creator baseline progressively.
     """
-    metrics = json.loads(exp.metrics_json or "[]")
+    metrics = fastjson.loads(exp.metrics_json or "[]")
     if not exp.winner:
         return LiftResult(None, 0.0, 0.0, 0.0)
 
@@ -0,0 +1,239 @@
+# services/packs_api.py
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Tuple
+
+from flask import Blueprint, jsonify, request
+from pydantic import ValidationError
+
+from config import settings
+from schemas import BuildPackRequest, JobResponse, PackResponse
+
+# SQLAlchemy, db and models are imported inside the handlers (or by the app's
+# background warmup) so registering this blueprint stays cheap at boot.
+
+packs_bp = Blueprint("packs_bp", __name__)
+
+
+def normalize_request(req: BuildPackRequest) -> Dict[str, Any]:
+    """
+    Canonical form of a build-pack request: two requests that would produce the
+    same pack normalize to the same dict (`sync` only changes delivery).
+    """
+    mode = (req.mode or "niche").strip().lower()
+    niche = re.sub(r"\s+", " ", (req.niche or "")).strip()
+    url = (req.url or "").strip()
+    return {
+        "mode": mode,
+        "niche": niche.casefold() if mode == "niche" else "",
+        "url": url if mode == "url" else "",
+        "platforms": sorted({p.strip().lower() for p in req.platforms if p and p.strip()}),
+        "language": (req.language or "ar").strip().lower(),
+        "tone": (req.tone or "authority").strip().lower(),
+        "include_visual": bool(req.include_visual),
+    }
+
+
+def request_hash(normalized: Dict[str, Any]) -> str:
+    blob = json.dumps(normalized, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _idempotency_key(req_hash: str, now: datetime) -> str:
+    # The request hash, bucketed by the freshness window, so the unique index
+    # closes the race between two concurrent identical submits. It is stored
+    # whether or not the client also sent an Idempotency-Key.
+    window = max(1, int(settings.IDEMPOTENCY_WINDOW_SEC or 0))
+    return f"h:{req_hash}:{int(now.timestamp()) // window}"
+
+
+def _client_key(header_key: str) -> str:
+    return hashlib.sha256(header_key.encode("utf-8")).hexdigest() if header_key else ""
+
+
+def _by_keys(db, idem_key: str, client_key: str):
+    from sqlalchemy import or_, select
+
+    from models import Job
+
+    cond = Job.idempotency_key == idem_key
+    if client_key:
+        # a client key is honoured across window buckets (a retry after the
+        # bucket rolled over) and even if the body changed
+        cond = or_(Job.client_key == client_key, cond)
+    return db.execute(select(Job).where(cond).order_by(Job.created_at)).scalars().first()
+
+
+def _find_reusable(db, idem_key: str, client_key: str, req_hash: str, now: datetime):
+    from sqlalchemy import select
+
+    from models import Job
+
+    job = _by_keys(db, idem_key, client_key)
+    if job is not None:
+        return job
+
+    window = int(settings.IDEMPOTENCY_WINDOW_SEC or 0)
+    if window <= 0:
+        return None
+    return (
+        db.execute(
+            select(Job)
+            .where(Job.request_hash == req_hash)
+            .where(Job.created_at >= now - timedelta(seconds=window))
+            .where(Job.status != "failed")
+            .order_by(Job.created_at.desc())
+        )
+        .scalars()
+        .first()
+    )
+
+
+def submit_build_pack(
+    req: BuildPackRequest,
+    header_key: str = "",
+    creator_id: str = "",
+    enqueue: bool = True,
+) -> Tuple[Any, bool]:
+    """
+    Returns (job, reused). A new job is only created (and enqueued) when no job
+    with the same client key, request-hash bucket or fresh request hash exists.
+    """
+    from sqlalchemy.exc import IntegrityError
+
+    from db import SessionLocal
+    from models import Job
+
+    now = datetime.now(timezone.utc)
+    normalized = normalize_request(req)
+    req_hash = request_hash(normalized)
+    idem_key = _idempotency_key(req_hash, now)
+    client_key = _client_key(header_key)
+
+    with SessionLocal() as db:
+        existing = _find_reusable(db, idem_key, client_key, req_hash, now)
+        if existing is not None:
+            return existing, True
+
+        payload = req.model_dump(exclude={"sync"})
+        job = Job(
+            request=payload,
+            idempotency_key=idem_key,
+            client_key=client_key or None,
+            request_hash=req_hash,
+            status="queued",
+        )
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            # lost the race to an identical submission
+            db.rollback()
+            existing = _by_keys(db, idem_key, client_key)
+            if existing is None:
+                raise
+            return existing, True
+        db.refresh(job)
+        db.expunge(job)
+
+    if not enqueue:
+        return job, False
+
+    from rq_queue import enqueue_routed
+
+    enqueue_routed("tasks.process_build_pack", job.id, request=payload, creator_id=creator_id)
+    return job, False
+
+
+def _job_response(job, reused: bool = False) -> Dict[str, Any]:
+    return JobResponse(
+        job_id=job.id,
+        status=job.status,
+        progress=float(job.progress or 0.0),
+        pack_id=job.pack_id,
+        error=job.error_message,
+        reused=reused,
+    ).model_dump()
+
+
+def _pack_response(pack) -> Dict[str, Any]:
+    return PackResponse(
+        pack_id=pack.id,
+        job_id=pack.job_id,
+        mode=pack.mode,
+        input_value=pack.input_value,
+        language=pack.language,
+        platforms=list(pack.platforms or []),
+        tone=pack.tone,
+        genes=pack.genes or {},
+        assets=pack.assets or {},
+        visual=pack.visual or {},
+        dominance=pack.dominance or {},
+        sources=pack.sources or {},
+    ).model_dump()
+
+
+@packs_bp.post("/v1/build-pack")
+def build_pack():
+    """
+    POST /v1/build-pack   (optional header: Idempotency-Key)
+    Response: JobResponse, or {"pack": PackResponse, "job_id": ...} for sync.
+    """
+    try:
+        req = BuildPackRequest.model_validate(request.get_json(silent=True) or {})
+    except ValidationError as e:
+        return jsonify({"error": "invalid request", "details": e.errors()}), 400
+    if not (req.niche if req.mode != "url" else req.url):
+        return jsonify({"error": "niche/url مطلوب"}), 400
+
+    header_key = (request.headers.get("Idempotency-Key") or "").strip()[:200]
+    creator_id = (request.headers.get("X-Creator-Id") or request.args.get("creator_id") or "").strip()
+
+    from db import SessionLocal
+    from models import Job, Pack
+
+    sync = req.sync or not settings.ASYNC_ENABLED
+    job, reused = submit_build_pack(req, header_key=header_key, creator_id=creator_id, enqueue=not sync)
+
+    if sync:
+        # a reused job is already owned by whoever created it
+        if not reused:
+            from tasks import process_build_pack
+
+            process_build_pack(job.id)
+        with SessionLocal() as db:
+            job = db.get(Job, job.id)
+            pack = db.get(Pack, job.pack_id) if job and job.pack_id else None
+            if pack is not None:
+                return jsonify({"job_id": job.id, "reused": reused, "pack": _pack_response(pack)})
+            return jsonify(_job_response(job, reused))
+
+    return jsonify(_job_response(job, reused)), (200 if reused else 202)
+
+
+@packs_bp.get("/v1/jobs/<job_id>")
+def get_job(job_id: str):
+    from db import SessionLocal
+    from models import Job
+
+    with SessionLocal() as db:
+        job = db.get(Job, job_id)
+        if job is None:
+            return jsonify({"error": "job not found"}), 404
+        return jsonify(_job_response(job))
+
+
+@packs_bp.get("/v1/packs/<pack_id>")
+def get_pack(pack_id: str):
+    from db import SessionLocal
+    from models import Pack
+
+    with SessionLocal() as db:
+        pack = db.get(Pack, pack_id)
+        if pack is None:
+            return jsonify({"error": "pack not found"}), 404
+        return jsonify(_pack_response(pack))
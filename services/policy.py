@@ -1,7 +1,35 @@
+"""
+Governance gate for generated content.
+
+Banned topics and blocked claims are compiled once per distinct list into a
+single scanner (cached; rebuilt only when the constraints change) and matched
+the way normalize_text() compares text: case, Arabic letter variants,
+diacritics / tatweel and whitespace runs don't matter. Blocked claims are
+removed from a flagged item in one regex pass per field.
+
+The pattern spells out case, letter variants and diacritics itself, so the
+raw text is scanned as is, with no lowercase / normalization pass over the
+item. With the 8 default terms a single item costs within a few microseconds
+of the old lowercase-and-substring check; the cost stays flat as the lists
+grow, and batches are faster at every list size.
+
+evaluate_policy_batch() vets many items (pack assets, variant sets) with one
+scan over the whole batch.
+
+Benchmark against the previous substring scan:
+    python -m services.policy
+"""
+
 from __future__ import annotations
+
+import re
+from bisect import bisect_right
 from dataclasses import dataclass
-from typing import Any
+from functools import lru_cache
+from typing import Any, Iterator, Sequence
+
 from utils.logging import get_logger
+from utils.text import fold_pattern, normalize_text
 
 log = get_logger("policy")
 
@@ -20,6 +48,116 @@ DEFAULT_BLOCKED_CLAIMS = [
     "guaranteed viral", "100% viral", "اكيد فيروسي", "مضمون 100%",
 ]
 
+# fields scanned per item
+CONTENT_FIELDS = ("script", "caption", "onscreen_text")
+VARIANT_FIELDS = ("title", "hook")  # services.generator.build_variants_for_idea
+PACK_FIELDS = ("linkedin", "x", "tiktok")  # pack payload["assets"]
+# fields blocked claims are removed from; always present in `sanitized`
+SANITIZED_FIELDS = ("script", "caption")
+
+_SEP = "\x00"  # joins a batch; no term can match across it
+
+
+# -------------------------------
+# Compiled matcher
+# -------------------------------
+
+
+@dataclass(frozen=True)
+class _Matcher:
+    scan: re.Pattern  # longest term at the leftmost position, on raw text
+    terms: dict[str, frozenset[int]]  # normalized term -> ids of the terms it contains
+    topics: tuple[tuple[str, int], ...]  # (as given, term id), reason order
+    claims: tuple[tuple[str, int], ...]
+
+    def implied(self, hit: str) -> frozenset[int]:
+        return self.terms.get(normalize_text(hit), frozenset())
+
+    def hits(self, text: str) -> Iterator[tuple[int, frozenset[int]]]:
+        hit = self.scan.search(text)
+        while hit:
+            yield hit.start(), self.implied(hit.group())
+            # resume one character on, not after the match: terms may overlap
+            hit = self.scan.search(text, hit.start() + 1)
+
+
+@lru_cache(maxsize=32)
+def _compile(topics: tuple[str, ...], claims: tuple[str, ...]) -> _Matcher:
+    topics = tuple(sorted(set(topics) | DEFAULT_BANNED_TOPICS))
+    claims = tuple(dict.fromkeys(tuple(DEFAULT_BLOCKED_CLAIMS) + claims))
+    norm = {t: normalize_text(t) for t in topics + claims}
+    ids = {n: i for i, n in enumerate(dict.fromkeys(n for n in norm.values() if n))}
+    # the scan only reports the longest term starting at each position, and a
+    # term found there implies every term contained in it
+    terms = {n: frozenset(j for o, j in ids.items() if o in n) for n in ids}
+    log.debug(f"policy matcher compiled: {len(ids)} terms")
+    return _Matcher(
+        scan=re.compile(fold_pattern(ids)),
+        terms=terms,
+        topics=tuple((t, ids[norm[t]]) for t in topics if norm[t]),
+        claims=tuple((c, ids[norm[c]]) for c in claims if norm[c]),
+    )
+
+
+@lru_cache(maxsize=32)
+def _strip_pattern(claims: tuple[str, ...]) -> re.Pattern:
+    # only needed for flagged items
+    return re.compile(fold_pattern(claims))
+
+
+def _matcher(constraints: dict[str, Any]) -> _Matcher:
+    # keyed on the lists as given: no per-call set / sort work on a cache hit
+    topics = constraints.get("banned_topics") or ()
+    claims = constraints.get("blocked_claims") or ()
+    return _compile(tuple(str(t) for t in topics), tuple(str(c) for c in claims))
+
+
+# -------------------------------
+# Evaluation
+# -------------------------------
+
+
+def _decide(m: _Matcher, content: dict[str, Any], found: set[int], sanitize: Sequence[str]) -> PolicyDecision:
+    if not found:
+        return PolicyDecision(allowed=True, reasons=[], sanitized=dict(content))
+    reasons = [f"Blocked topic keyword detected: {t}" for t, i in m.topics if i in found]
+    reasons += [f"Blocked claim detected: {c}" for c, i in m.claims if i in found]
+    sanitized = dict(content)
+    # remove blocked claim phrases (all variants) in one pass per field
+    strip = _strip_pattern(tuple(c for c, _ in m.claims))
+    for f in sanitize:
+        sanitized[f] = strip.sub("", str(sanitized.get(f, "")))
+    return PolicyDecision(allowed=not reasons, reasons=reasons, sanitized=sanitized)
+
+
+def evaluate_policy_batch(
+    contents: Sequence[dict[str, Any]],
+    constraints: dict[str, Any],
+    fields: Sequence[str] = CONTENT_FIELDS,
+    sanitize: Sequence[str] = SANITIZED_FIELDS,
+) -> list[PolicyDecision]:
+    """
+    One PolicyDecision per item, scanning `fields` of every item in a single
+    pass; blocked claims are removed from the `sanitize` fields of a flagged
+    item. E.g. evaluate_policy_batch(variants, {}, VARIANT_FIELDS, VARIANT_FIELDS)
+    or evaluate_policy_batch([p["assets"] for p in packs], {}, PACK_FIELDS, PACK_FIELDS).
+    """
+    if not contents:
+        return []
+    m = _matcher(constraints)
+    blobs = [" ".join([str(c.get(f, "")) for f in fields]) for c in contents]
+    text = _SEP.join(blobs)
+    if text.count(_SEP) != len(blobs) - 1:  # an item contained the separator
+        text = _SEP.join([b.replace(_SEP, " ") for b in blobs])
+    seps, i = [], text.find(_SEP)
+    while i >= 0:
+        seps.append(i)
+        i = text.find(_SEP, i + 1)
+    found: list[set[int]] = [set() for _ in contents]
+    for start, tids in m.hits(text):
+        found[bisect_right(seps, start)] |= tids
+    return [_decide(m, c, f, sanitize) for c, f in zip(contents, found)]
+
 
 def evaluate_policy(content: dict[str, Any], constraints: dict[str, Any]) -> PolicyDecision:
     """
@@ -27,29 +165,84 @@ def evaluate_policy(content: dict[str, Any], constraints: dict[str, Any]) -> Pol
     - Blocks risky topics/claims.
     - Ensures style constraints (tone/language) are not violated.
     """
-    reasons: list[str] = []
-    sanitized = dict(content)
+    m = _matcher(constraints)
+    text = " ".join([str(content.get(f, "")) for f in CONTENT_FIELDS])
+    found: set[int] = set()
+    for _, tids in m.hits(text):
+        found |= tids
+    return _decide(m, content, found, SANITIZED_FIELDS)
+
+
+# -------------------------------
+# Benchmark
+# -------------------------------
 
-    banned_topics = set(constraints.get("banned_topics", [])) | DEFAULT_BANNED_TOPICS
-    text_blob = " ".join([
-        str(content.get("script", "")),
-        str(content.get("caption", "")),
-        str(content.get("onscreen_text", "")),
-    ]).lower()
 
-    for t in banned_topics:
-        if t.lower() in text_blob:
-            reasons.append(f"Blocked topic keyword detected: {t}")
+def _bench() -> None:
+    import random
+    import time
 
-    for c in DEFAULT_BLOCKED_CLAIMS:
-        if c.lower() in text_blob:
-            reasons.append(f"Blocked claim detected: {c}")
+    from services.generator import build_variants_for_idea
+    from tasks import _make_pack_payload
 
-    allowed = len(reasons) == 0
-    if not allowed:
-        # Basic sanitization: remove blocked claims phrases
+    def legacy(content: dict[str, Any], constraints: dict[str, Any]) -> PolicyDecision:
+        # the previous implementation: a lowercase substring check per term
+        reasons: list[str] = []
+        sanitized = dict(content)
+        banned_topics = set(constraints.get("banned_topics", [])) | DEFAULT_BANNED_TOPICS
+        text_blob = " ".join([str(content.get(f, "")) for f in CONTENT_FIELDS]).lower()
+        for t in banned_topics:
+            if t.lower() in text_blob:
+                reasons.append(f"Blocked topic keyword detected: {t}")
         for c in DEFAULT_BLOCKED_CLAIMS:
-            sanitized["script"] = str(sanitized.get("script", "")).replace(c, "")
-            sanitized["caption"] = str(sanitized.get("caption", "")).replace(c, "")
+            if c.lower() in text_blob:
+                reasons.append(f"Blocked claim detected: {c}")
+        if reasons:
+            for c in DEFAULT_BLOCKED_CLAIMS:
+                sanitized["script"] = str(sanitized.get("script", "")).replace(c, "")
+                sanitized["caption"] = str(sanitized.get("caption", "")).replace(c, "")
+        return PolicyDecision(allowed=not reasons, reasons=reasons, sanitized=sanitized)
+
+    def timeit(fn, n: int) -> float:
+        best = float("inf")
+        for _ in range(5):  # best of 5 runs
+            t0 = time.perf_counter()
+            for _ in range(n):
+                fn()
+            best = min(best, time.perf_counter() - t0)
+        return best / n * 1e6
+
+    random.seed(7)
+    pack = _make_pack_payload("التسويق بالذكاء الاصطناعي لشركات المقاولات", "ar", "Authority", ["linkedin", "x", "tiktok"])
+    item = {"script": pack["assets"]["tiktok"], "caption": pack["assets"]["x"], "onscreen_text": pack["genes"]["angle"]}
+    variants = build_variants_for_idea("التسويق بالمحتوى", 1000)
+    items = [{"script": v["hook"], "caption": v["title"], "onscreen_text": v["angle"]} for v in variants]
+    for v in items[::50]:
+        v["caption"] += " مضمون 100%"
+
+    words = [w for w in normalize_text(pack["pack_markdown"]).split() if len(w) > 3]
+    for n_terms in (0, 4, 50, 500):
+        constraints = {"banned_topics": [f"topic{i}" for i in range(n_terms)]}
+        _matcher(constraints)  # compile outside the timing
+        one_old = timeit(lambda: legacy(item, constraints), 2000)
+        one_new = timeit(lambda: evaluate_policy(item, constraints), 2000)
+        batch_old = timeit(lambda: [legacy(c, constraints) for c in items], 20)
+        batch_new = timeit(lambda: evaluate_policy_batch(items, constraints), 20)
+        same = [legacy(c, constraints).allowed for c in items] == [d.allowed for d in evaluate_policy_batch(items, constraints)]
+        print(
+            f"{len(DEFAULT_BANNED_TOPICS) + n_terms + len(DEFAULT_BLOCKED_CLAIMS):4d} terms"
+            f" | pack item {one_old:8.1f}us -> {one_new:8.1f}us (x{one_old / max(one_new, 1e-9):.1f})"
+            f" | {len(items)} variants {batch_old / 1e3:7.2f}ms -> {batch_new / 1e3:7.2f}ms (x{batch_old / max(batch_new, 1e-9):.1f})"
+            f" | same decisions: {same}"
+        )
+    spelled = [{"script": f"{v['script']} {claim}"} for v, claim in zip(items, ("أكيد فيروسي", "مَضْمُون 100%", "GUARANTEED  viral", "اكيد فيروسى") * 250)]
+    print(
+        f"blocked claims in variant spellings: {sum(not legacy(c, {}).allowed for c in spelled)}"
+        f" -> {sum(not d.allowed for d in evaluate_policy_batch(spelled, {}))} of {len(spelled)}"
+    )
+    compile_us = timeit(lambda: _compile.__wrapped__(tuple(random.sample(words, 50)), tuple(DEFAULT_BLOCKED_CLAIMS)), 20)
+    print(f"compile (54 terms, uncached): {compile_us / 1e3:.2f}ms")
+
 
-    return PolicyDecision(allowed=allowed, reasons=reasons, sanitized=sanitized)
+if __name__ == "__main__":
+    _bench()
@@ -1,9 +1,107 @@
 from __future__ import annotations
 
+import re
+from itertools import repeat
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.text import normalize_text
+
+
 def clamp(x: float, lo: float, hi: float) -> float:
     return max(lo, min(hi, x))
 
 
+# Curiosity / pattern triggers and vague words, matched on normalized text
+# (utils.text), so spelling variants ("أخطاء" / "اخطاء", "تغيّر" / "تغير") count.
+TRIGGERS = [
+    "رقم", "صادم", "يفاجئك", "تغيّر اللعبة", "بدون", "خلال", "سر",
+    "خطأ", "أخطاء", "خطوات", "طريقة", "قبل ما", "لا تفعل", "توقف"
+]
+VAGUE = ["شيء", "موضوع", "كلام", "مرة", "أحيانًا"]
+
+
+_SEP = "\x00"  # joins a batch; never produced by normalize_text or matched by a word
+
+
+def _compile_matcher() -> Tuple[re.Pattern, Dict[str, int], int]:
+    # One alternation over every trigger and vague word (longest first, so
+    # overlapping words resolve to the longest match: "اخطاء" is not also
+    # counted as "خطا", as with the original `in` checks on raw text), plus
+    # digits and the batch separator. findall() then yields all of them in
+    # order from a single C-level scan of the whole batch.
+    triggers = list(dict.fromkeys(normalize_text(w) for w in TRIGGERS))
+    vague = [w for w in dict.fromkeys(normalize_text(w) for w in VAGUE) if w not in triggers]
+    ids = {w: i for i, w in enumerate(triggers + vague)}  # id < len(triggers): a trigger
+    alternatives = sorted(ids, key=len, reverse=True)
+    pattern = re.compile("|".join([re.escape(_SEP)] + [re.escape(w) for w in alternatives] + [r"\d"]))
+    ids[_SEP] = -1
+    return pattern, ids, len(triggers)
+
+
+_MATCHER, _WORD_IDS, _N_TRIGGERS = _compile_matcher()
+_DIGIT_ID = len(_WORD_IDS)  # tokens that are neither a word nor the separator
+
+
+def _combine(hook_len, screen_len, triggers, vague, digits):
+    # works on scalars and NumPy arrays alike
+    score = 68.0
+    # Length (shorter tends to win)
+    score = score + 6.0 * (hook_len <= 50) + 4.0 * (hook_len <= 35) + 2.0 * (hook_len <= 22)
+    # Curiosity / pattern triggers
+    score = score + 1.2 * triggers
+    # On-screen text should be punchy
+    score = score + 2.0 * ((screen_len > 0) & (screen_len <= 20))
+    score = score + 2.0 * digits
+    # Penalize very vague hooks
+    return score - 0.8 * vague
+
+
+def score_hooks(hooks: Sequence[str], onscreen: Optional[Sequence[str]] = None) -> np.ndarray:
+    """
+    score_hook for many hooks at once; returns a float64 array (50..95).
+    The whole batch is normalized and scanned as one string.
+    """
+    n = len(hooks)
+    if onscreen is not None and len(onscreen) != n:
+        raise ValueError("hooks and onscreen must have the same length")
+    if n == 0:
+        return np.zeros(0, dtype=np.float64)
+
+    t = [(h or "").strip() for h in hooks]
+    joined = _SEP.join(t)
+    if joined.count(_SEP) != n - 1:  # a hook contained the separator
+        t = [h.replace(_SEP, "") for h in t]
+        joined = _SEP.join(t)
+
+    tokens = _MATCHER.findall(normalize_text(joined))
+    tok = np.fromiter(map(_WORD_IDS.get, tokens, repeat(_DIGIT_ID)), dtype=np.int64, count=len(tokens))
+    sep = tok < 0
+    text, tok = np.cumsum(sep)[~sep], tok[~sep]
+
+    digits = np.zeros(n, dtype=bool)
+    digits[text[tok == _DIGIT_ID]] = True
+    words = tok != _DIGIT_ID
+    # distinct (text, word) pairs, then per-text counts by kind
+    pairs = np.unique(text[words] * _DIGIT_ID + tok[words])
+    pair_text, pair_word = pairs // _DIGIT_ID, pairs % _DIGIT_ID
+    triggers = np.bincount(pair_text[pair_word < _N_TRIGGERS], minlength=n)
+    vague = np.bincount(pair_text[pair_word >= _N_TRIGGERS], minlength=n)
+
+    screen_len = np.zeros(n, dtype=np.int64)
+    if onscreen is not None:
+        o = [(x or "").strip() for x in onscreen]
+        screen_len = np.fromiter(map(len, o), dtype=np.int64, count=n)
+        digits |= np.fromiter(map(_has_digit, o), dtype=bool, count=n)
+    hook_len = np.fromiter(map(len, t), dtype=np.int64, count=n)
+    return np.clip(_combine(hook_len, screen_len, triggers, vague, digits), 50.0, 95.0)
+
+
+def _has_digit(s: str) -> bool:
+    return any(ch.isdigit() for ch in s)
+
+
 def score_hook(hook_text: str, onscreen_text: str) -> float:
     """
     Heuristic TikTok hook scoring (MVP):
@@ -12,38 +110,23 @@ def score_hook(hook_text: str, onscreen_text: str) -> float:
     - boosts clarity and numeric cues
     Returns: 50..95
     """
-    t = (hook_text or "").strip()
+    t = (hook_text or "").replace(_SEP, "").strip()
     o = (onscreen_text or "").strip()
+    ids = {_WORD_IDS.get(tok, _DIGIT_ID) for tok in _MATCHER.findall(normalize_text(t))}
+    words = [i for i in ids if i != _DIGIT_ID]
+    triggers = sum(1 for i in words if i < _N_TRIGGERS)
+    digits = _DIGIT_ID in ids or _has_digit(o)
+    score = _combine(len(t), len(o), triggers, len(words) - triggers, digits)
+    return float(clamp(score, 50.0, 95.0))
 
-    score = 68.0
-
-    # Length (shorter tends to win)
-    if len(t) <= 50:
-        score += 6.0
-    if len(t) <= 35:
-        score += 4.0
-    if len(t) <= 22:
-        score += 2.0
-
-    # Curiosity / pattern triggers
-    triggers = [
-        "رقم", "صادم", "يفاجئك", "تغيّر اللعبة", "بدون", "خلال", "سر",
-        "خطأ", "أخطاء", "خطوات", "طريقة", "قبل ما", "لا تفعل", "توقف"
-    ]
-    for w in triggers:
-        if w in t:
-            score += 1.2
-
-    # On-screen text should be punchy
-    if 0 < len(o) <= 20:
-        score += 2.0
-    if any(ch.isdigit() for ch in (t + o)):
-        score += 2.0
-
-    # Penalize very vague hooks
-    vague = ["شيء", "موضوع", "كلام", "مرة", "أحيانًا"]
-    for w in vague:
-        if w in t:
-            score -= 0.8
 
-    return float(clamp(score, 50.0, 95.0))
+def rank_variants(variants: List[Dict[str, str]], k: Optional[int] = None, key: str = "hook") -> List[Dict[str, str]]:
+    """
+    Variants (e.g. from build_variants_for_idea) best hook first, each with
+    its "hook_score"; ties keep the input order.
+    """
+    if not variants:
+        return []
+    scores = score_hooks([str(v.get(key) or "") for v in variants])
+    order = np.argsort(-scores, kind="stable")[: k if k else len(variants)]
+    return [{**variants[i], "hook_score": round(float(scores[i]), 2)} for i in order]
@@ -0,0 +1,291 @@
+# services/trend_store.py
+from __future__ import annotations
+
+import fcntl
+import io
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from config import settings
+from utils import fastjson
+from utils.logging import get_logger
+
+log = get_logger("trend_store")
+
+# -------------------------------
+# Trend time-series store
+# -------------------------------
+#
+# Hashtag snapshots (ranked lists from a provider) are folded into a compact
+# per-language matrix: one float32 row per tag, one column per time bucket
+# (TREND_BUCKET_SEC wide, TREND_WINDOW_BUCKETS kept, oldest column first).
+# A cell is the tag's strongest weight seen in that bucket, so the series does
+# not depend on how often snapshots arrive.
+#
+# Every ingest re-ranks the language with two exponentially-decayed levels
+# (fast / slow half-life, in buckets):
+#   velocity     = fast - slow            (rising vs its own recent baseline)
+#   acceleration = velocity - velocity one bucket earlier
+#   score        = velocity + 0.5 * acceleration + 0.1 * fast
+# and publishes the top TREND_TOPK, which readers slice in O(1).
+#
+# State lives in Redis when REDIS_URL is set (shared by web and workers),
+# otherwise under TREND_STORE_DIR.
+
+_PREFIX = "dominator:trendstore"
+_TOPK_CACHE_SEC = 30.0
+
+_topk_cache: Dict[str, tuple] = {}
+_topk_lock = threading.Lock()
+_redis = None
+
+
+def norm_lang(lang: Optional[str]) -> str:
+    return ((lang or "en").strip().lower()[:2]) or "en"
+
+
+class TrendSeries:
+    """
+    In-memory series for one language.
+    """
+
+    def __init__(self, tags: Optional[List[str]] = None, matrix: Optional[np.ndarray] = None, last_bucket: int = 0):
+        self.width = int(settings.TREND_WINDOW_BUCKETS)
+        self.tags: List[str] = list(tags or [])
+        self.index: Dict[str, int] = {t: i for i, t in enumerate(self.tags)}
+        if matrix is None or matrix.shape[1] != self.width:
+            m = np.zeros((len(self.tags), self.width), dtype=np.float32)
+            if matrix is not None and len(matrix):
+                n = min(self.width, matrix.shape[1])
+                m[:, -n:] = matrix[:, -n:]
+            matrix = m
+        self.matrix = matrix.astype(np.float32, copy=False)
+        self.last_bucket = int(last_bucket)
+
+    # ---- ingest ----
+
+    def _advance(self, bucket: int) -> None:
+        if self.last_bucket == 0:
+            self.last_bucket = bucket
+            return
+        shift = bucket - self.last_bucket
+        if shift <= 0:
+            return
+        if shift >= self.width:
+            self.matrix[:] = 0.0
+        else:
+            self.matrix[:, :-shift] = self.matrix[:, shift:]
+            self.matrix[:, -shift:] = 0.0
+        self.last_bucket = bucket
+
+    def ingest(self, hashtags: Sequence[str], ts: Optional[float] = None, weights: Optional[Sequence[float]] = None) -> None:
+        bucket = int((ts or time.time()) // int(settings.TREND_BUCKET_SEC))
+        self._advance(bucket)
+        col = self.width - 1 - (self.last_bucket - bucket)
+        if col < 0:
+            return  # older than the window
+
+        n = len(hashtags)
+        if weights is None:
+            # rank-based: first tag 1.0, last ~1/n
+            weights = [(n - i) / n for i in range(n)]
+        new = [t for t in dict.fromkeys(hashtags) if t not in self.index]
+        if new:
+            for t in new:
+                self.index[t] = len(self.tags)
+                self.tags.append(t)
+            self.matrix = np.vstack([self.matrix, np.zeros((len(new), self.width), dtype=np.float32)])
+
+        rows = np.fromiter((self.index[t] for t in hashtags), dtype=np.int64, count=n)
+        w = np.asarray(weights, dtype=np.float32)
+        np.maximum.at(self.matrix[:, col], rows, w)
+
+    def compact(self) -> None:
+        # drop tags with nothing left in the window
+        keep = np.flatnonzero(self.matrix.any(axis=1))
+        if len(keep) == len(self.tags):
+            return
+        self.tags = [self.tags[i] for i in keep]
+        self.index = {t: i for i, t in enumerate(self.tags)}
+        self.matrix = self.matrix[keep]
+
+    # ---- ranking ----
+
+    def _decay(self, half_life: float, width: int) -> np.ndarray:
+        age = np.arange(width - 1, -1, -1, dtype=np.float32)  # newest column has age 0
+        w = np.power(0.5, age / max(0.1, half_life)).astype(np.float32)
+        return w / w.sum()
+
+    def rank(self, top: int) -> List[Dict[str, Any]]:
+        if not self.tags:
+            return []
+        fast_h, slow_h = float(settings.TREND_FAST_HALFLIFE), float(settings.TREND_SLOW_HALFLIFE)
+        x = self.matrix
+        fast = x @ self._decay(fast_h, self.width)
+        slow = x @ self._decay(slow_h, self.width)
+        prev = x[:, :-1]
+        velocity = fast - slow
+        prev_velocity = prev @ self._decay(fast_h, self.width - 1) - prev @ self._decay(slow_h, self.width - 1)
+        accel = velocity - prev_velocity
+        score = velocity + 0.5 * accel + 0.1 * fast
+
+        # highest score first; ties broken by tag so the order is stable
+        tie = np.argsort(np.argsort(np.asarray(self.tags), kind="stable"))
+        order = np.lexsort((tie, -score))[:top]
+        return [
+            {
+                "tag": self.tags[i],
+                "score": round(float(score[i]), 5),
+                "velocity": round(float(velocity[i]), 5),
+                "acceleration": round(float(accel[i]), 5),
+                "level": round(float(fast[i]), 5),
+            }
+            for i in order
+        ]
+
+    # ---- persistence ----
+
+    def to_bytes(self) -> bytes:
+        buf = io.BytesIO()
+        np.savez_compressed(buf, tags=np.asarray(self.tags, dtype=str), matrix=self.matrix, last_bucket=np.int64(self.last_bucket))
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, blob: Optional[bytes]) -> "TrendSeries":
+        if not blob:
+            return cls()
+        with np.load(io.BytesIO(blob), allow_pickle=False) as z:
+            return cls([str(t) for t in z["tags"]], z["matrix"], int(z["last_bucket"]))
+
+
+# -------------------------------
+# Storage (Redis or disk)
+# -------------------------------
+
+
+def _get_redis():
+    global _redis
+    if _redis is None and settings.REDIS_URL:
+        from redis import Redis
+
+        _redis = Redis.from_url(settings.REDIS_URL, decode_responses=False)
+    return _redis
+
+
+def _path(lang: str, suffix: str) -> str:
+    return os.path.join(settings.TREND_STORE_DIR, f"{lang}.{suffix}")
+
+
+@contextmanager
+def _write_lock(lang: str) -> Iterator[None]:
+    r = _get_redis()
+    if r is not None:
+        with r.lock(f"{_PREFIX}:{lang}:lock", timeout=30, blocking_timeout=30):
+            yield
+        return
+    os.makedirs(settings.TREND_STORE_DIR, exist_ok=True)
+    with open(_path(lang, "lock"), "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _atomic_write(path: str, blob: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(blob)
+    os.replace(tmp, path)
+
+
+def load_series(lang: str) -> TrendSeries:
+    lang = norm_lang(lang)
+    r = _get_redis()
+    if r is not None:
+        return TrendSeries.from_bytes(r.get(f"{_PREFIX}:{lang}:series"))
+    try:
+        with open(_path(lang, "npz"), "rb") as f:
+            return TrendSeries.from_bytes(f.read())
+    except OSError:
+        return TrendSeries()
+
+
+def _save(lang: str, series: TrendSeries, topk: List[Dict[str, Any]]) -> None:
+    blob, top_blob = series.to_bytes(), fastjson.dumps_bytes({"at": time.time(), "top": topk})
+    r = _get_redis()
+    if r is not None:
+        p = r.pipeline(transaction=True)
+        p.set(f"{_PREFIX}:{lang}:series", blob)
+        p.set(f"{_PREFIX}:{lang}:topk", top_blob)
+        p.sadd(f"{_PREFIX}:langs", lang)
+        p.execute()
+        return
+    os.makedirs(settings.TREND_STORE_DIR, exist_ok=True)
+    _atomic_write(_path(lang, "npz"), blob)
+    _atomic_write(_path(lang, "topk.json"), top_blob)
+
+
+# -------------------------------
+# Public API
+# -------------------------------
+
+
+def ingest_snapshot(
+    lang: str,
+    hashtags: Sequence[str],
+    ts: Optional[float] = None,
+    weights: Optional[Sequence[float]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Folds one ranked hashtag snapshot into the language's series, re-ranks and
+    publishes the top-K. Returns the new top-K.
+    """
+    lang = norm_lang(lang)
+    tags = [t for t in hashtags if t]
+    if not tags:
+        return []
+    with _write_lock(lang):
+        series = load_series(lang)
+        series.ingest(tags, ts=ts, weights=weights)
+        series.compact()
+        topk = series.rank(int(settings.TREND_TOPK))
+        _save(lang, series, topk)
+    with _topk_lock:
+        _topk_cache[lang] = (time.monotonic(), topk)
+    return topk
+
+
+def ranking(lang: str) -> List[Dict[str, Any]]:
+    """
+    Published top-K entries (tag, score, velocity, acceleration, level); read
+    at most every 30s per process, O(1) otherwise.
+    """
+    lang = norm_lang(lang)
+    hit = _topk_cache.get(lang)
+    if hit is not None and time.monotonic() - hit[0] < _TOPK_CACHE_SEC:
+        return hit[1]
+    raw = None
+    try:
+        r = _get_redis()
+        if r is not None:
+            raw = r.get(f"{_PREFIX}:{lang}:topk")
+        else:
+            with open(_path(lang, "topk.json"), "rb") as f:
+                raw = f.read()
+    except Exception:
+        raw = None
+    topk = (fastjson.loads(raw) or {}).get("top", []) if raw else []
+    with _topk_lock:
+        _topk_cache[lang] = (time.monotonic(), topk)
+    return topk
+
+
+def top_tags(lang: str, k: int = 12) -> List[str]:
+    return [e["tag"] for e in ranking(lang)[: max(0, int(k))]]
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
+from typing import Optional
+
 # Compatibility shim:
 # Existing code imports: from services.trends import get_trending_hashtags
-# But repo currently has trends_provider.py / trends_api.py, not trends.py.
-# This file bridges that gap safely without breaking boot.
+# Lookups go through services.trends_cache, which never blocks on a provider.
 
 def _mock_trends(limit: int = 15) -> list[str]:
     base = [
@@ -26,55 +27,24 @@ def _mock_trends(limit: int = 15) -> list[str]:
     return base[:limit]
 
 
-def _load_provider_func():
-    # Try trends_provider.py
-    try:
-        from . import trends_provider as tp  # type: ignore
-        for name in ("get_trending_hashtags", "get_trends", "get_hashtags", "fetch_trends"):
-            fn = getattr(tp, name, None)
-            if callable(fn):
-                return fn
-    except Exception:
-        pass
-
-    # Try trends_api.py
-    try:
-        from . import trends_api as ta  # type: ignore
-        for name in ("get_trending_hashtags", "get_trends", "get_hashtags", "fetch_trends"):
-            fn = getattr(ta, name, None)
-            if callable(fn):
-                return fn
-    except Exception:
-        pass
-
-    return None
-
-
-_PROVIDER_FN = _load_provider_func()
-
-
-def get_trending_hashtags(limit: int = 15) -> list[str]:
+def get_trending_hashtags(
+    limit: int = 15,
+    lang: str = "ar",
+    topic: Optional[str] = None,
+    creator_id: str = "",
+    segment: str = "general",
+) -> list[str]:
     """
     Public API expected by pipeline/app.
     Always returns a safe list (never crashes server boot).
     """
     try:
-        if _PROVIDER_FN:
-            result = _PROVIDER_FN(limit=limit)  # supports keyword if implemented
-            if isinstance(result, list):
-                clean = [str(x).strip() for x in result if str(x).strip()]
-                if clean:
-                    return clean[:limit]
-    except TypeError:
-        # Provider may accept positional only: fn(limit)
-        try:
-            result = _PROVIDER_FN(limit) if _PROVIDER_FN else None
-            if isinstance(result, list):
-                clean = [str(x).strip() for x in result if str(x).strip()]
-                if clean:
-                    return clean[:limit]
-        except Exception:
-            pass
+        from services.trends_cache import get_hashtags
+
+        res = get_hashtags(creator_id=creator_id, limit=limit, lang=lang, topic=topic, segment=segment)
+        clean = [str(x).strip() for x in res.hashtags if str(x).strip()]
+        if clean:
+            return clean[:limit]
     except Exception:
         pass
 
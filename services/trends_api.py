@@ -3,14 +3,14 @@ from __future__ import annotations
 
 from flask import Blueprint, jsonify, request
 
-from services.trends_provider import get_trends_provider
+from services.trends_cache import get_hashtags
 
 trends_bp = Blueprint("trends_bp", __name__)
 
 @trends_bp.get("/v1/trending-hashtags")
 def trending_hashtags():
     """
-    GET /v1/trending-hashtags?creator_id=...&limit=12&lang=en&topic=...
+    GET /v1/trending-hashtags?creator_id=...&limit=12&lang=en&topic=...&segment=...
     Response:
       { "hashtags":[...], "source":"...", "updated_at":"..." }
     """
@@ -27,9 +27,10 @@ def trending_hashtags():
 
     lang = (request.args.get("lang") or "en").strip().lower()
     topic = (request.args.get("topic") or "").strip() or None
+    segment = (request.args.get("segment") or "general").strip() or "general"
 
-    provider = get_trends_provider()
-    res = provider.get_hashtags(creator_id=creator_id, limit=limit, lang=lang, topic=topic)
+    # served from the trends cache (stale-while-revalidate), never a live call
+    res = get_hashtags(creator_id=creator_id, limit=limit, lang=lang, topic=topic, segment=segment)
 
     return jsonify({
         "hashtags": res.hashtags,
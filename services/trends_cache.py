@@ -0,0 +1,322 @@
+# services/trends_cache.py
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+from dataclasses import asdict
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from services.trends_provider import (
+    StaticFallbackProvider,
+    TrendsResult,
+    get_trends_provider,
+    indexed_tags,
+    latency_report,
+    record_snapshot,
+    top_up,
+)
+from utils import fastjson
+from utils.logging import get_logger
+
+log = get_logger("trends_cache")
+
+# -------------------------------
+# Stale-while-revalidate trends cache
+# -------------------------------
+#
+# Lookups never call a provider: they return the cached entry for
+# (lang, topic bucket, creator segment) however old it is, or the static
+# fallback on a cold key, and mark the key for refresh. Refreshing happens off
+# the request/job path: a self-rescheduling rq job on the batch queue
+# (refresh_job, started by worker.main via schedule_refresh) refreshes every
+# key requested in the last TRENDS_ACTIVE_SEC once it is older than
+# TRENDS_FRESH_SEC. Without Redis the cache is in-process and refreshed by a
+# daemon thread. Every refresh answer also feeds the trend time-series
+# (services.trend_store) whatever TRENDS_PROVIDER is, and the cached list is
+# its velocity ranking topped up from that answer.
+
+_PREFIX = "dominator:trends"
+_REFRESH_JOB_ID = "trends-refresh"
+
+_TOPIC_BUCKETS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("seo", ("seo", "search")),
+    ("ads", ("ads", "paid", "ppc")),
+    ("shortform", ("tiktok", "shorts", "reels")),
+    ("content", ("content", "copy", "script")),
+)
+# representative topic per bucket, handed to the provider on refresh
+_BUCKET_TOPIC = {"seo": "seo", "ads": "ads", "shortform": "reels", "content": "content", "general": None}
+
+_local: Dict[str, Dict[str, Any]] = {}
+_local_active: Dict[str, float] = {}
+_local_lock = threading.Lock()
+_local_refreshing = threading.Event()
+_local_latency: Dict[str, Any] = {}
+_redis = None
+
+
+def topic_bucket(topic: Optional[str]) -> str:
+    t = (topic or "").lower()
+    for bucket, words in _TOPIC_BUCKETS:
+        if any(w in t for w in words):
+            return bucket
+    return "general"
+
+
+def cache_key(lang: str, bucket: str, segment: str) -> str:
+    return f"{(lang or 'en').strip().lower()}:{bucket}:{(segment or 'general').strip().lower()}"
+
+
+def _get_redis():
+    global _redis
+    if _redis is None and settings.REDIS_URL:
+        from redis import Redis
+
+        _redis = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis
+
+
+# -------------------------------
+# Storage
+# -------------------------------
+
+
+def _load(key: str) -> Optional[Dict[str, Any]]:
+    r = _get_redis()
+    if r is None:
+        return _local.get(key)
+    raw = r.get(f"{_PREFIX}:e:{key}")
+    return fastjson.loads(raw) if raw else None
+
+
+def _store(key: str, entry: Dict[str, Any]) -> None:
+    r = _get_redis()
+    if r is None:
+        with _local_lock:
+            _local[key] = entry
+        return
+    r.set(f"{_PREFIX}:e:{key}", fastjson.dumps(entry), ex=int(settings.TRENDS_MAX_STALE_SEC))
+
+
+def _touch(key: str, creator_id: str) -> None:
+    # remember the key (and a creator to ask on its behalf) for the refresher
+    r = _get_redis()
+    now = time.time()
+    if r is None:
+        with _local_lock:
+            _local_active[key] = now
+            _local.setdefault(key, {}).setdefault("creator_id", creator_id)
+        return
+    p = r.pipeline(transaction=False)
+    p.zadd(f"{_PREFIX}:active", {key: now})
+    if creator_id:
+        p.hset(f"{_PREFIX}:creator", key, creator_id)
+    p.execute()
+
+
+def _active_keys() -> List[str]:
+    since = time.time() - int(settings.TRENDS_ACTIVE_SEC)
+    r = _get_redis()
+    if r is None:
+        with _local_lock:
+            return [k for k, ts in _local_active.items() if ts >= since]
+    r.zremrangebyscore(f"{_PREFIX}:active", "-inf", since)
+    return list(r.zrange(f"{_PREFIX}:active", 0, -1))
+
+
+def _is_fresh(entry: Optional[Dict[str, Any]]) -> bool:
+    return bool(entry and entry.get("hashtags") and time.time() - float(entry.get("fetched_at", 0)) < int(settings.TRENDS_FRESH_SEC))
+
+
+# -------------------------------
+# Read path
+# -------------------------------
+
+
+def get_hashtags(
+    *,
+    creator_id: str = "",
+    limit: int = 12,
+    lang: str = "en",
+    topic: Optional[str] = None,
+    segment: str = "general",
+) -> TrendsResult:
+    """
+    Cached TrendsResult for (lang, topic bucket, segment); never blocks on a
+    provider. source gets a ":stale" suffix when the entry is past
+    TRENDS_FRESH_SEC (a refresh is already scheduled).
+    """
+    key = cache_key(lang, topic_bucket(topic), segment)
+    entry = None
+    try:
+        entry = _load(key)
+        _touch(key, creator_id)
+    except Exception as e:
+        log.warning("trends cache unavailable: %s", e)
+
+    if entry and entry.get("hashtags"):
+        fresh = _is_fresh(entry)
+        if not fresh:
+            request_refresh()
+        return TrendsResult(
+            hashtags=list(entry["hashtags"])[: int(limit)],
+            source=entry.get("source", "cache") + ("" if fresh else ":stale"),
+            updated_at=entry.get("updated_at", ""),
+        )
+
+    request_refresh()
+    return StaticFallbackProvider().get_hashtags(creator_id=creator_id, limit=limit, lang=lang, topic=topic, segment=segment)
+
+
+# -------------------------------
+# Refresh path (worker)
+# -------------------------------
+
+
+def refresh_key(key: str, creator_id: str = "") -> Optional[TrendsResult]:
+    """
+    Asks the configured provider (without the trend index) for the key, feeds
+    the answer to the trend time-series, and caches the index ranking topped
+    up from that answer.
+    """
+    lang, bucket, segment = key.split(":", 2)
+    limit = int(settings.TRENDS_CACHE_LIMIT)
+    answer = get_trends_provider(indexed=False).get_hashtags(
+        creator_id=creator_id,
+        limit=limit,
+        lang=lang,
+        topic=_BUCKET_TOPIC.get(bucket),
+        segment=segment,
+    )
+    record_snapshot(lang, answer.hashtags)
+    res = top_up(indexed_tags(lang, limit), answer, limit)
+    if not res.hashtags:
+        return None
+    _store(key, {**asdict(res), "fetched_at": time.time(), "creator_id": creator_id})
+    return res
+
+
+def refresh_stale(force: bool = False) -> Dict[str, int]:
+    """
+    Refreshes every recently requested key that is missing or older than
+    TRENDS_FRESH_SEC (all of them with force=True).
+    """
+    out = {"active": 0, "refreshed": 0, "failed": 0}
+    r = _get_redis()
+    keys = _active_keys()
+    out["active"] = len(keys)
+    for key in keys:
+        entry = _load(key)
+        if not force and _is_fresh(entry):
+            continue
+        creator_id = (r.hget(f"{_PREFIX}:creator", key) if r is not None else (entry or {}).get("creator_id")) or ""
+        try:
+            if refresh_key(key, creator_id):
+                out["refreshed"] += 1
+        except Exception as e:
+            out["failed"] += 1
+            log.warning("trends refresh failed for %s: %s", key, e)
+    _publish_latency()
+    return out
+
+
+def _publish_latency() -> None:
+    # provider latencies live in the refreshing process (a worker job, or the
+    # local refresh thread): publish them where /readyz can read them
+    report = latency_report()
+    if not report:
+        return
+    r = _get_redis()
+    if r is None:
+        _local_latency.update(report)
+        return
+    try:
+        key = f"{_PREFIX}:latency"
+        p = r.pipeline(transaction=False)
+        p.hset(key, f"{socket.gethostname()}:{os.getpid()}", fastjson.dumps(report))
+        p.expire(key, int(settings.TRENDS_ACTIVE_SEC))
+        p.execute()
+    except Exception as e:
+        log.warning("trends latency publish failed: %s", e)
+
+
+def provider_latency() -> Dict[str, Any]:
+    """
+    Per refreshing process: {provider: {calls, errors, late, p50_ms, ...}}
+    (services.trends_provider.latency_report), for /readyz.
+    """
+    r = _get_redis()
+    if r is None:
+        return {"local": dict(_local_latency)} if _local_latency else {}
+    try:
+        return {proc: fastjson.loads(v) for proc, v in r.hgetall(f"{_PREFIX}:latency").items()}
+    except Exception as e:
+        log.warning("trends latency unavailable: %s", e)
+        return {}
+
+
+def refresh_job(hop: str = "") -> Dict[str, int]:
+    """
+    rq job: refresh, then make sure the next periodic run is scheduled (rq's
+    scheduler enqueues it). `hop` is set on the periodic runs themselves.
+    """
+    r = _get_redis()
+    if hop and r is not None and r.get(f"{_PREFIX}:next") == hop:
+        r.delete(f"{_PREFIX}:next")  # this hop ran; the chain may schedule the next one
+    try:
+        return refresh_stale()
+    finally:
+        if r is not None:
+            r.delete(f"{_PREFIX}:pending")
+        schedule_refresh(delay_sec=int(settings.TRENDS_REFRESH_SEC))
+
+
+def schedule_refresh(delay_sec: int = 0) -> None:
+    """
+    delay_sec=0: one out-of-band run now. Otherwise the next periodic run,
+    unless one is already scheduled: each hop gets its own job id (a running
+    job's key is deleted when it finishes, result_ttl=0) and the pending hop is
+    recorded in `{_PREFIX}:next`, which expires if the hop is lost.
+    """
+    from rq_queue import get_queue
+
+    q = get_queue("batch")
+    if q is None:
+        return
+    if delay_sec <= 0:
+        q.enqueue(refresh_job, result_ttl=0)
+        return
+    r = _get_redis()
+    hop = f"{_REFRESH_JOB_ID}-{int(time.time()) + delay_sec}"
+    if r is not None and not r.set(f"{_PREFIX}:next", hop, nx=True, ex=2 * delay_sec + 60):
+        return
+    q.enqueue_in(timedelta(seconds=delay_sec), refresh_job, hop, job_id=hop, result_ttl=0)
+
+
+def request_refresh() -> None:
+    """
+    Asks for an out-of-band refresh; cheap and deduplicated, safe to call per
+    request.
+    """
+    r = _get_redis()
+    if r is None:
+        if not _local_refreshing.is_set():
+            _local_refreshing.set()
+            threading.Thread(target=_local_refresh, name="trends-refresh", daemon=True).start()
+        return
+    try:
+        if r.set(f"{_PREFIX}:pending", "1", nx=True, ex=max(5, int(settings.TRENDS_REFRESH_SEC))):
+            schedule_refresh()
+    except Exception as e:
+        log.warning("trends refresh request failed: %s", e)
+
+
+def _local_refresh() -> None:
+    try:
+        refresh_stale()
+    finally:
+        _local_refreshing.clear()
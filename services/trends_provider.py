@@ -3,9 +3,13 @@ from __future__ import annotations
 
 import os
 import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import List, Optional, Protocol
+from typing import Deque, Dict, List, Optional, Protocol
 
 import requests
 
@@ -18,6 +22,7 @@ class TrendsResult:
 
 
 class TrendsProvider(Protocol):
+    # creator_id is empty on the refresh path, which asks per audience segment
     def get_hashtags(
         self,
         *,
@@ -25,6 +30,7 @@ class TrendsProvider(Protocol):
         limit: int = 12,
         lang: str = "en",
         topic: Optional[str] = None,
+        segment: str = "general",
     ) -> TrendsResult:
         ...
 
@@ -99,6 +105,7 @@ class ExternalTrendsAPIProvider:
         limit: int = 12,
         lang: str = "en",
         topic: Optional[str] = None,
+        segment: str = "general",
     ) -> TrendsResult:
         headers = {"Accept": "application/json"}
         if self.api_key:
@@ -112,6 +119,7 @@ class ExternalTrendsAPIProvider:
             "limit": int(limit),
             "lang": lang,
             "topic": topic or "",
+            "segment": segment,
         }
 
         r = requests.post(self.url, json=payload, headers=headers, timeout=self.timeout_sec)
@@ -132,6 +140,69 @@ class ExternalTrendsAPIProvider:
         )
 
 
+def record_snapshot(lang: str, hashtags: List[str]) -> None:
+    # feeds the trend time-series (services.trend_store); called by the trends
+    # cache refresh with every source answer, whichever provider answered
+    if not hashtags:
+        return
+    try:
+        from services.trend_store import ingest_snapshot
+
+        ingest_snapshot(lang, hashtags)
+    except Exception:
+        pass
+
+
+def indexed_tags(lang: str, limit: int) -> List[str]:
+    try:
+        from services.trend_store import top_tags
+
+        return top_tags(lang, limit)
+    except Exception:
+        return []
+
+
+def top_up(indexed: List[str], fb_res: TrendsResult, limit: int) -> TrendsResult:
+    """
+    The index ranking, topped up from a source answer when it is short.
+    """
+    if len(indexed) >= limit:
+        return TrendsResult(hashtags=indexed[:limit], source="trend_index", updated_at=_iso_now())
+    if not indexed:
+        return fb_res
+    return TrendsResult(
+        hashtags=_dedupe_keep_order(indexed + (fb_res.hashtags or []))[:limit],
+        source=f"trend_index+{fb_res.source}",
+        updated_at=_iso_now(),
+    )
+
+
+class IndexedTrendsProvider:
+    """
+    Reads the precomputed velocity ranking from services.trend_store (O(1)),
+    topped up from `fallback` when the index is empty or short for `lang`.
+    """
+
+    def __init__(self, fallback: TrendsProvider) -> None:
+        self.fallback = fallback
+
+    def get_hashtags(
+        self,
+        *,
+        creator_id: str,
+        limit: int = 12,
+        lang: str = "en",
+        topic: Optional[str] = None,
+        segment: str = "general",
+    ) -> TrendsResult:
+        limit = int(limit)
+        indexed = indexed_tags(lang, limit)
+        if len(indexed) >= limit:
+            return TrendsResult(hashtags=indexed[:limit], source="trend_index", updated_at=_iso_now())
+        fb_res = self.fallback.get_hashtags(creator_id=creator_id, limit=limit, lang=lang, topic=topic, segment=segment)
+        return top_up(indexed, fb_res, limit)
+
+
 class StaticFallbackProvider:
     """
     Smart-enough fallback that always returns something usable.
@@ -145,6 +216,7 @@ class StaticFallbackProvider:
         limit: int = 12,
         lang: str = "en",
         topic: Optional[str] = None,
+        segment: str = "general",
     ) -> TrendsResult:
         # Baseline tags (safe, evergreen)
         en_base = [
@@ -214,15 +286,110 @@ class StaticFallbackProvider:
         )
 
 
+class LatencyTracker:
+    """
+    Rolling window of call latencies (seconds) for one provider.
+    """
+
+    def __init__(self, window: int = 200) -> None:
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.late = 0  # answered after the mixer had already given up on it
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool = True, late: bool = False) -> None:
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self.samples.append(seconds)
+            else:
+                self.errors += 1
+            if late:
+                self.late += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            vals = sorted(self.samples)
+        if len(vals) < 5:
+            return None
+        k = min(len(vals) - 1, max(0, int(round(pct / 100.0 * (len(vals) - 1)))))
+        return vals[k]
+
+    def report(self) -> Dict[str, object]:
+        def ms(v: Optional[float]) -> Optional[float]:
+            return None if v is None else round(v * 1000.0, 1)
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "late": self.late,
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+        }
+
+
+_TRACKERS: Dict[str, LatencyTracker] = {}
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def latency_tracker(name: str) -> LatencyTracker:
+    with _EXECUTOR_LOCK:
+        return _TRACKERS.setdefault(name, LatencyTracker())
+
+
+def latency_report() -> Dict[str, Dict[str, object]]:
+    return {name: t.report() for name, t in _TRACKERS.items()}
+
+
+def _executor() -> ThreadPoolExecutor:
+    # shared: a late primary call keeps running here after the mixer returned
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="trends")
+        return _EXECUTOR
+
+
 class SmartMixerProvider:
     """
-    Tries external first; if it fails, falls back.
-    If external returns few tags, it tops up from fallback.
+    Runs external and fallback concurrently and returns the best result
+    available at the deadline: external topped up from fallback when external
+    answered in time, fallback alone otherwise.
+
+    The deadline is TRENDS_MIXER_DEADLINE when set, else adaptive: external
+    p95 latency x1.5, clamped to
+    [TRENDS_MIXER_MIN_DEADLINE, primary timeout]. If external is still silent
+    at its p95, one hedged duplicate request is sent and the first answer wins.
     """
 
     def __init__(self, primary: TrendsProvider, fallback: TrendsProvider) -> None:
         self.primary = primary
         self.fallback = fallback
+        self.tracker = latency_tracker(type(primary).__name__)
+        self.min_deadline = float(os.getenv("TRENDS_MIXER_MIN_DEADLINE", "0.3").strip() or "0.3")
+        self.max_deadline = float(getattr(primary, "timeout_sec", 6.0) or 6.0)
+        fixed = os.getenv("TRENDS_MIXER_DEADLINE", "").strip()
+        self.fixed_deadline = float(fixed) if fixed else None
+
+    def deadline(self) -> float:
+        if self.fixed_deadline is not None:
+            return self.fixed_deadline
+        p95 = self.tracker.percentile(95)
+        if p95 is None:
+            return self.max_deadline
+        return max(self.min_deadline, min(self.max_deadline, p95 * 1.5))
+
+    def _call_primary(self, started: float, state: Dict[str, bool], **kw) -> TrendsResult:
+        try:
+            res = self.primary.get_hashtags(**kw)
+        except Exception:
+            self.tracker.record(time.monotonic() - started, ok=False)
+            raise
+        self.tracker.record(time.monotonic() - started, late=state["done"])
+        return res
 
     def get_hashtags(
         self,
@@ -231,18 +398,37 @@ class SmartMixerProvider:
         limit: int = 12,
         lang: str = "en",
         topic: Optional[str] = None,
+        segment: str = "general",
     ) -> TrendsResult:
         limit = int(limit)
+        kw = dict(creator_id=creator_id, limit=limit, lang=lang, topic=topic, segment=segment)
+        started = time.monotonic()
+        end = started + max(0.0, self.deadline())
+        state = {"done": False}
 
-        primary_res: Optional[TrendsResult] = None
-        try:
-            primary_res = self.primary.get_hashtags(
-                creator_id=creator_id, limit=limit, lang=lang, topic=topic
-            )
-        except Exception:
-            primary_res = None
+        pending = {_executor().submit(self._call_primary, started, state, **kw)}
+        # fallback is local and cheap: compute it while external is in flight
+        fb_res = self.fallback.get_hashtags(**kw)
 
-        fb_res = self.fallback.get_hashtags(creator_id=creator_id, limit=limit, lang=lang, topic=topic)
+        primary_res: Optional[TrendsResult] = None
+        hedge_at = self.tracker.percentile(95)
+        hedged = False
+        while pending and primary_res is None:
+            now = time.monotonic()
+            if now >= end:
+                break
+            wake = end
+            if not hedged and hedge_at is not None and started + hedge_at < end:
+                wake = max(now, started + hedge_at)
+            done, pending = wait(pending, timeout=wake - now, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None and f.result() and f.result().hashtags:
+                    primary_res = f.result()
+                    break
+            if primary_res is None and not hedged and hedge_at is not None and time.monotonic() >= started + hedge_at:
+                hedged = True
+                pending.add(_executor().submit(self._call_primary, time.monotonic(), state, **kw))
+        state["done"] = True
 
         if not primary_res:
             return fb_res
@@ -255,20 +441,23 @@ class SmartMixerProvider:
         )
 
 
-def get_trends_provider() -> TrendsProvider:
+def get_trends_provider(indexed: bool = True) -> TrendsProvider:
     """
     Switch provider without touching UI or route:
       - TRENDS_PROVIDER=external   -> external + fallback mixer
       - TRENDS_PROVIDER=static     -> fallback only
+    The fallback reads the trend index first (filled by the trends cache
+    refresh) and tops up from the static lists; indexed=False leaves the index
+    out, for the refresh that feeds it.
     """
     choice = os.getenv("TRENDS_PROVIDER", "static").strip().lower()
 
-    fallback = StaticFallbackProvider()
+    fallback = IndexedTrendsProvider(StaticFallbackProvider()) if indexed else StaticFallbackProvider()
 
     if choice == "external":
         # external + fallback
         primary = ExternalTrendsAPIProvider()
         return SmartMixerProvider(primary=primary, fallback=fallback)
 
-    # default: static fallback only
+    # default: index + static fallback
     return fallback
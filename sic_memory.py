@@ -1,8 +1,47 @@
-PLATFORM_MEMORY = {
-    "linkedin": {"successes": 0, "failures": 0},
-    "twitter": {"successes": 0, "failures": 0},
-    "tiktok": {"successes": 0, "failures": 0},
-}
+# sic_memory.py
+# Shared platform-performance memory for SIC
+#
+# Success / failure counts are kept per UTC day and per dimension:
+#   p:<platform>                 platform
+#   n:<platform>:<niche>         platform x niche (normalized, utils.text)
+#   c:<platform>:<creator_id>    platform x creator
+# in Redis (one hash per day, HINCRBY) or, without Redis, the sic_counters
+# table (models.SicCounter). Increments are buffered in-process and written
+# in one pipeline / transaction by a background thread (write-behind:
+# every SIC_MEMORY_FLUSH_SEC, or sooner once SIC_MEMORY_FLUSH_MAX are
+# pending, and at exit). RQ work-horses leave via os._exit, so the worker
+# flushes after every job (worker._WeightedFairMixin.perform_job).
+# Outcomes are recorded by /api/tactical/execute: whether the draft for the
+# SIC's primary platform passed the render gate.
+#
+# Reads never touch the network: get_platform_score() uses a local snapshot
+# of decayed counts (x 0.5^(age_days / SIC_MEMORY_HALF_LIFE_DAYS)) refreshed
+# in the background every SIC_MEMORY_REFRESH_SEC, plus this process's
+# not-yet-visible increments. Days before yesterday are no longer written
+# to: each is loaded once, and a refresh only re-reads yesterday and today. Scores are Beta-smoothed hierarchically,
+# platform -> niche -> creator: each level is shrunk toward the one above
+# with SIC_MEMORY_PRIOR pseudo-observations, so a sparse creator or niche
+# stays near its parent instead of jumping to 0 or 1.
+
+import atexit
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from utils.logging import get_logger
+from utils.text import normalize_text
+
+log = get_logger("sic_memory")
+
+PLATFORMS = ("linkedin", "twitter", "tiktok")
+
+_KEY_PREFIX = "dominator:sic:mem"
+
+# (day, dim, "s" | "f") -> count
+Increments = Dict[Tuple[int, str, str], int]
+
 
 def normalize_platform(p: str) -> str:
     if not p:
@@ -12,26 +51,342 @@ def normalize_platform(p: str) -> str:
         return "twitter"
     return p
 
-def record_success(platform):
+
+def _today(now: Optional[float] = None) -> int:
+    return int((now if now is not None else time.time()) // 86400)
+
+
+def _dims(platform: str, creator_id: Optional[str] = None, niche: Optional[str] = None) -> List[str]:
+    dims = [f"p:{platform}"]
+    niche = normalize_text(niche or "")
+    if niche:
+        dims.append(f"n:{platform}:{niche}")
+    creator = str(creator_id or "").strip()
+    if creator:
+        dims.append(f"c:{platform}:{creator}")
+    return dims
+
+
+# -------------------------------
+# Backends
+# -------------------------------
+
+
+class _RedisBackend:
+    name = "redis"
+
+    def __init__(self, r) -> None:
+        self.r = r
+
+    def flush(self, inc: Increments) -> None:
+        ttl = (int(settings.SIC_MEMORY_WINDOW_DAYS) + 1) * 86400
+        p = self.r.pipeline(transaction=False)
+        days = set()
+        for (day, dim, kind), n in inc.items():
+            p.hincrby(f"{_KEY_PREFIX}:{day}", f"{dim}|{kind}", n)
+            days.add(day)
+        for day in days:
+            p.expire(f"{_KEY_PREFIX}:{day}", ttl)
+        p.execute()
+
+    def load(self, first_day: int, last_day: int) -> Increments:
+        days = list(range(first_day, last_day + 1))
+        p = self.r.pipeline(transaction=False)
+        for day in days:
+            p.hgetall(f"{_KEY_PREFIX}:{day}")
+        out: Increments = {}
+        for day, fields in zip(days, p.execute()):
+            for field, v in (fields or {}).items():
+                dim, _, kind = field.rpartition("|")
+                out[(day, dim, kind)] = int(v)
+        return out
+
+
+class _SQLBackend:
+    name = "sql"
+
+    def flush(self, inc: Increments) -> None:
+        from sqlalchemy import insert, update
+
+        from db import get_engine
+        from models import SicCounter
+
+        rows: Dict[Tuple[int, str], List[int]] = {}
+        for (day, dim, kind), n in inc.items():
+            rows.setdefault((day, dim), [0, 0])[0 if kind == "s" else 1] += n
+        values = [{"day": d, "dim": dim, "successes": s, "failures": f} for (d, dim), (s, f) in rows.items()]
+
+        eng = get_engine()
+        with eng.begin() as conn:
+            if eng.dialect.name in ("postgresql", "sqlite"):
+                if eng.dialect.name == "postgresql":
+                    from sqlalchemy.dialects.postgresql import insert as dialect_insert
+                else:
+                    from sqlalchemy.dialects.sqlite import insert as dialect_insert
+                stmt = dialect_insert(SicCounter).values(values)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[SicCounter.day, SicCounter.dim],
+                    set_={
+                        "successes": SicCounter.successes + stmt.excluded.successes,
+                        "failures": SicCounter.failures + stmt.excluded.failures,
+                    },
+                )
+                conn.execute(stmt)
+                return
+            for v in values:
+                res = conn.execute(
+                    update(SicCounter)
+                    .where(SicCounter.day == v["day"], SicCounter.dim == v["dim"])
+                    .values(successes=SicCounter.successes + v["successes"], failures=SicCounter.failures + v["failures"])
+                )
+                if not res.rowcount:
+                    conn.execute(insert(SicCounter).values(**v))
+
+    def load(self, first_day: int, last_day: int) -> Increments:
+        from sqlalchemy import select
+
+        from db import get_engine
+        from models import SicCounter
+
+        out: Increments = {}
+        with get_engine().connect() as conn:
+            q = select(SicCounter.day, SicCounter.dim, SicCounter.successes, SicCounter.failures).where(
+                SicCounter.day >= first_day, SicCounter.day <= last_day
+            )
+            for day, dim, s, f in conn.execute(q):
+                out[(day, dim, "s")] = int(s)
+                out[(day, dim, "f")] = int(f)
+        return out
+
+
+class _LocalBackend:
+    # no Redis / database: this process only
+    name = "local"
+
+    def __init__(self) -> None:
+        self.counts: Increments = {}
+
+    def flush(self, inc: Increments) -> None:
+        for k, n in inc.items():
+            self.counts[k] = self.counts.get(k, 0) + n
+
+    def load(self, first_day: int, last_day: int) -> Increments:
+        return {k: n for k, n in self.counts.items() if first_day <= k[0] <= last_day}
+
+
+def _make_backend():
+    mode = (settings.SIC_MEMORY_BACKEND or "auto").strip().lower()
+    if mode in ("auto", "redis") and settings.REDIS_URL:
+        from rq_queue import get_redis
+
+        return _RedisBackend(get_redis(decode_responses=True))
+    if mode in ("auto", "sql") and settings.DATABASE_URL:
+        return _SQLBackend()
+    return _LocalBackend()
+
+
+# -------------------------------
+# Write-behind buffer + read snapshot
+# -------------------------------
+
+
+class _Memory:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.io_lock = threading.Lock()  # one flush / refresh at a time
+        self.wake = threading.Event()
+        self.backend = None
+        self.thread: Optional[threading.Thread] = None
+        self.pending: Increments = {}
+        self.pending_n = 0
+        self.last_flush = time.monotonic()
+        # this process's outcomes not in the snapshot yet: dim -> [s, f]
+        self.local: Dict[str, List[int]] = {}
+        self.snapshot: Dict[str, Tuple[float, float]] = {}
+        self.snapshot_at = 0.0
+        # counts of days before yesterday, loaded once per day
+        self.settled: Increments = {}
+        self.settled_through: Optional[int] = None
+
+    def _backend(self):
+        if self.backend is None:
+            self.backend = _make_backend()
+        return self.backend
+
+    def ensure_thread(self) -> None:
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, name="sic-memory", daemon=True)
+            self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self.wake.wait(timeout=max(0.05, min(float(settings.SIC_MEMORY_FLUSH_SEC), float(settings.SIC_MEMORY_REFRESH_SEC))))
+            self.wake.clear()
+            try:
+                if self.pending_n and (
+                    self.pending_n >= int(settings.SIC_MEMORY_FLUSH_MAX)
+                    or time.monotonic() - self.last_flush >= float(settings.SIC_MEMORY_FLUSH_SEC)
+                ):
+                    self.flush()
+                if time.monotonic() - self.snapshot_at >= float(settings.SIC_MEMORY_REFRESH_SEC) or not self.snapshot_at:
+                    self.refresh()
+            except Exception as e:  # keep the thread alive; next tick retries
+                log.warning("sic memory sync failed: %s", e)
+
+    def record(self, dims: List[str], kind: str, now: Optional[float] = None) -> None:
+        day = _today(now)
+        with self.lock:
+            for dim in dims:
+                k = (day, dim, kind)
+                self.pending[k] = self.pending.get(k, 0) + 1
+                self.local.setdefault(dim, [0, 0])[0 if kind == "s" else 1] += 1
+            self.pending_n += 1
+            full = self.pending_n >= int(settings.SIC_MEMORY_FLUSH_MAX)
+        self.ensure_thread()
+        if full:
+            self.wake.set()
+
+    def flush(self) -> int:
+        with self.io_lock:
+            with self.lock:
+                batch, self.pending, n = self.pending, {}, self.pending_n
+                self.pending_n = 0
+                self.last_flush = time.monotonic()
+            if not batch:
+                return 0
+            try:
+                self._backend().flush(batch)
+            except Exception:
+                with self.lock:  # put them back for the next attempt
+                    for k, v in batch.items():
+                        self.pending[k] = self.pending.get(k, 0) + v
+                    self.pending_n += n
+                raise
+            return n
+
+    def refresh(self, now: Optional[float] = None) -> None:
+        today = _today(now)
+        window = int(settings.SIC_MEMORY_WINDOW_DAYS)
+        half_life = float(settings.SIC_MEMORY_HALF_LIFE_DAYS)
+        first, settled = today - window + 1, today - 2
+        with self.io_lock:
+            backend = self._backend()
+            start = first if self.settled_through is None else max(first, self.settled_through + 1)
+            if start <= settled:
+                self.settled = {k: n for k, n in self.settled.items() if k[0] >= first}
+                self.settled.update(backend.load(start, settled))
+                self.settled_through = settled
+            counts = {k: n for k, n in self.settled.items() if k[0] >= first}
+            counts.update(backend.load(max(first, settled + 1), today))
+            snap: Dict[str, List[float]] = {}
+            for (day, dim, kind), n in counts.items():
+                w = 0.5 ** (max(0, today - day) / half_life)
+                snap.setdefault(dim, [0.0, 0.0])[0 if kind == "s" else 1] += n * w
+            with self.lock:
+                self.snapshot = {dim: (s, f) for dim, (s, f) in snap.items()}
+                # flushes only run under io_lock, so everything flushed is in
+                # the snapshot and only the pending buffer stays local
+                self.local = {}
+                for (_, dim, kind), n in self.pending.items():
+                    self.local.setdefault(dim, [0, 0])[0 if kind == "s" else 1] += n
+                self.snapshot_at = time.monotonic()
+
+    def counts(self, dim: str) -> Tuple[float, float]:
+        s, f = self.snapshot.get(dim, (0.0, 0.0))
+        ls, lf = self.local.get(dim, (0, 0))  # recent, so undecayed
+        return s + ls, f + lf
+
+    def reset_after_fork(self) -> None:
+        # the parent flushes its own buffer; drop its thread and connections
+        self.lock = threading.Lock()
+        self.io_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.backend = None
+        self.thread = None
+        self.pending = {}
+        self.pending_n = 0
+        self.local = {}
+
+
+_MEMORY = _Memory()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_MEMORY.reset_after_fork)
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    if _MEMORY.pending_n:
+        try:
+            _MEMORY.flush()
+        except Exception as e:
+            log.warning("sic memory flush at exit failed: %s", e)
+
+
+# -------------------------------
+# API
+# -------------------------------
+
+
+def record_success(platform, creator_id: Optional[str] = None, niche: Optional[str] = None):
     platform = normalize_platform(platform)
-    if platform in PLATFORM_MEMORY:
-        PLATFORM_MEMORY[platform]["successes"] += 1
+    if platform in PLATFORMS:
+        _MEMORY.record(_dims(platform, creator_id, niche), "s")
+
 
-def record_failure(platform):
+def record_failure(platform, creator_id: Optional[str] = None, niche: Optional[str] = None):
     platform = normalize_platform(platform)
-    if platform in PLATFORM_MEMORY:
-        PLATFORM_MEMORY[platform]["failures"] += 1
+    if platform in PLATFORMS:
+        _MEMORY.record(_dims(platform, creator_id, niche), "f")
+
+
+def _smoothed(counts: Tuple[float, float], prior_mean: float) -> float:
+    k = float(settings.SIC_MEMORY_PRIOR)
+    s, f = counts
+    return (s + k * prior_mean) / (s + f + k)
 
-def get_platform_score(platform):
+
+def get_platform_score(platform, creator_id: Optional[str] = None, niche: Optional[str] = None):
     platform = normalize_platform(platform)
-    if platform not in PLATFORM_MEMORY:
+    if platform not in PLATFORMS:
         return 0.5
+    _MEMORY.ensure_thread()
 
-    successes = PLATFORM_MEMORY[platform]["successes"]
-    failures = PLATFORM_MEMORY[platform]["failures"]
-    total = successes + failures
+    score = 0.5
+    for dim in _dims(platform, creator_id, niche):
+        score = _smoothed(_MEMORY.counts(dim), score)
+    return score
+
+
+def pending() -> int:
+    """
+    Outcomes recorded in this process and not written yet.
+    """
+    return _MEMORY.pending_n
+
+
+def flush() -> int:
+    """
+    Writes buffered increments now; returns how many outcomes were flushed.
+    """
+    return _MEMORY.flush()
+
+
+def refresh() -> None:
+    """
+    Reloads the read snapshot now (normally done in the background).
+    """
+    _MEMORY.refresh()
 
-    if total == 0:
-        return 0.5
 
-    return successes / total
+def memory_stats() -> Dict:
+    return {
+        "backend": _MEMORY._backend().name,
+        "pending": _MEMORY.pending_n,
+        "dims": len(_MEMORY.snapshot),
+        "snapshot_age_sec": round(time.monotonic() - _MEMORY.snapshot_at, 1) if _MEMORY.snapshot_at else None,
+    }
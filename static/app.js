@@ -287,6 +287,18 @@
     ui.setLast(store.get("lastJobId"), store.get("lastPackId"));
   }
 
+  let idem = { state: null, key: null };
+
+  function idempotencyKeyFor(state) {
+    if (idem.state !== state) {
+      const key = (window.crypto && crypto.randomUUID)
+        ? crypto.randomUUID()
+        : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+      idem = { state, key };
+    }
+    return idem.key;
+  }
+
   async function forge() {
     const mode = getMode();
     const input = $("#inputValue").value.trim();
@@ -307,23 +319,35 @@
     if (mode === "url") body.url = input;
     else body.niche = input;
 
+    // One key per form state: retries and double-clicks of the same submission
+    // share it, so the server dedupes them. Editing the form starts a new key.
+    const idemKey = idempotencyKeyFor(JSON.stringify(body));
+
     $("#btnForge").disabled = true;
     $("#btnForge").textContent = "Forging…";
     try {
       const res = await fetchJson(API.build, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", "Idempotency-Key": idemKey },
         body: JSON.stringify(body),
       });
+      idem = { state: null, key: null };  // answered: only failed attempts are retried with the key
 
       // Async response (job)
       const jobId = res.job_id || res.job?.job_id || null;
       const packId = res.pack?.pack_id || null;
 
-      if (jobId) {
+      if (jobId && res.pack) {
+        // Sync response (or reused job that already has its pack)
+        store.set("lastJobId", jobId);
+        store.set("lastPackId", res.pack.pack_id);
+        ui.setLast(store.get("lastJobId"), store.get("lastPackId"));
+        ui.setOutputs(res.pack);
+        ui.toast(res.reused ? "تم استخدام Pack موجود." : "تم توليد Pack (sync).");
+      } else if (jobId) {
         store.set("lastJobId", jobId);
         ui.setLast(store.get("lastJobId"), store.get("lastPackId"));
-        ui.toast(`تم إنشاء Job: ${jobId}`);
+        ui.toast(res.reused ? `Job موجود: ${jobId}` : `تم إنشاء Job: ${jobId}`);
         await startPolling(jobId);
       } else if (packId) {
         // Sync fallback
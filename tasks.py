@@ -2,7 +2,6 @@
 from __future__ import annotations
 
 import json
-import os
 import re
 import time
 import uuid
@@ -11,15 +10,17 @@ import traceback
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import create_engine, MetaData, Table, select, insert, update, text
+from sqlalchemy import MetaData, Table, select, insert, update, text
 from sqlalchemy.engine import Engine
 
+from db import get_engine
+from utils import fastjson
+
 
 # -------------------------------
 # Lazy DB / Reflection utilities
 # -------------------------------
 
-_ENGINE: Optional[Engine] = None
 _META: Optional[MetaData] = None
 _TBL_JOBS: Optional[Table] = None
 _TBL_PACKS: Optional[Table] = None
@@ -29,31 +30,9 @@ def _utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def _normalize_db_url(url: str) -> str:
-    # Render sometimes provides postgres:// which SQLAlchemy wants as postgresql://
-    if url.startswith("postgres://"):
-        return "postgresql://" + url[len("postgres://") :]
-    return url
-
-
 def _get_engine() -> Engine:
-    global _ENGINE
-    if _ENGINE is not None:
-        return _ENGINE
-
-    db_url = os.environ.get("DATABASE_URL", "").strip()
-    if not db_url:
-        raise RuntimeError("DATABASE_URL is not set")
-
-    db_url = _normalize_db_url(db_url)
-    _ENGINE = create_engine(
-        db_url,
-        pool_pre_ping=True,
-        pool_size=int(os.environ.get("DB_POOL_SIZE", "3")),
-        max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", "2")),
-        future=True,
-    )
-    return _ENGINE
+    # Shared, fork-aware engine (same pool as db.py)
+    return get_engine()
 
 
 def _reflect_tables() -> Tuple[Table, Table]:
@@ -98,6 +77,18 @@ def _reflect_tables() -> Tuple[Table, Table]:
     return _TBL_JOBS, _TBL_PACKS
 
 
+def warmup() -> Dict[str, Any]:
+    """
+    Pay the per-process setup cost once: reflect jobs/packs and open one pooled
+    connection. Called by long-lived workers before they take jobs.
+    """
+    started = time.time()
+    jobs, packs = _reflect_tables()
+    with _get_engine().connect() as conn:
+        conn.execute(text("SELECT 1"))
+    return {"jobs": jobs.name, "packs": packs.name, "took_ms": int((time.time() - started) * 1000)}
+
+
 def _col(table: Table, *names: str) -> Optional[str]:
     cols = {c.name.lower(): c.name for c in table.columns}
     for n in names:
@@ -114,7 +105,7 @@ def _json_assign(table: Table, col_name: str, obj: Any) -> Any:
     tname = col.type.__class__.__name__.lower()
     if "json" in tname:
         return obj
-    return json.dumps(obj, ensure_ascii=False)
+    return fastjson.dumps(obj)
 
 
 def _is_uuid_column(col) -> bool:
@@ -181,7 +172,7 @@ def _ensure_niche_lock(niche: str, payload: Dict[str, Any]) -> None:
     niche = _clean_text(niche)
     if not niche:
         raise RuntimeError("Niche is empty (cannot generate)")
-    blob = json.dumps(payload, ensure_ascii=False)
+    blob = fastjson.dumps(payload)
     if niche not in blob:
         kws = _keywords(niche, limit=3)
         if not kws or not all(k in blob.lower() for k in kws):
@@ -444,7 +435,7 @@ def process_build_pack(job_id: str) -> Dict[str, Any]:
                     req = raw if isinstance(raw, dict) else {"payload": raw}
                 else:
                     try:
-                        req = json.loads(raw)
+                        req = fastjson.loads(raw)
                     except Exception:
                         req = {"raw": str(raw)}
 
@@ -497,17 +488,25 @@ def process_build_pack(job_id: str) -> Dict[str, Any]:
                 ("genes", payload.get("genes")),
                 ("dominance", payload.get("dominance")),
                 ("visual", payload.get("visual")),
+                ("sources", payload.get("sources") or {}),
+                ("platforms", platforms),
+            ]:
+                c = _col(packs, cname, cname + "_json")
+                if c:
+                    pack_row[c] = _json_assign(packs, c, val)
+
+            # plain text columns: stored as-is, not JSON-quoted
+            for cname, val in [
                 ("pack_markdown", payload.get("pack_markdown")),
                 ("niche", payload.get("niche")),
                 ("mode", mode),
                 ("input_value", niche),
                 ("language", lang),
                 ("tone", tone),
-                ("platforms", platforms),
             ]:
-                c = _col(packs, cname, cname + "_json")
-                if c:
-                    pack_row[c] = _json_assign(packs, c, val)
+                c = _col(packs, cname)
+                if c and val is not None:
+                    pack_row[c] = str(val)
 
             if packs_created_col and packs_created_col not in pack_row:
                 pack_row[packs_created_col] = _utc_now_iso()
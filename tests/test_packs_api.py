@@ -0,0 +1,31 @@
+import pytest
+
+import db
+from config import settings
+from schemas import BuildPackRequest
+from services import packs_api
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_URL", "sqlite:///%s" % (tmp_path / "jobs.db"))
+    db.init_db()
+
+
+def submit(header_key="", **fields):
+    req = BuildPackRequest(niche="Fintech", **fields)
+    return packs_api.submit_build_pack(req, header_key=header_key, enqueue=False)
+
+
+def test_header_key_is_reused_even_if_the_body_changes(database):
+    first, reused = submit("k1")
+    again, reused_again = submit("k1", tone="playful")
+    assert not reused and reused_again and again.id == first.id
+
+
+def test_request_hash_bucket_is_unique_with_a_header_key(database, monkeypatch):
+    first, _ = submit("k1")
+    # skip the lookups, as a concurrent submit that passed them would
+    monkeypatch.setattr(packs_api, "_find_reusable", lambda *a: None)
+    again, reused = submit("k2")
+    assert reused and again.id == first.id
@@ -0,0 +1,36 @@
+import pytest
+
+from services import policy
+
+
+SPELLINGS = [
+    "this is GUARANTEED  viral",
+    "أكيد فيروسي",
+    "مَضْمُون 100%",
+    "اكيد فيروسى",
+    "Hate speech",
+    "nothing to see here",
+    "شكيد فيروسي",  # not a blocked claim: wrong first letter
+]
+
+
+@pytest.mark.parametrize("topics", [[], [f"topic{i}" for i in range(60)]])
+def test_batch_and_single_item_agree(topics):
+    constraints = {"banned_topics": topics}
+    items = [{"script": s} for s in SPELLINGS]
+    got = [d.allowed for d in policy.evaluate_policy_batch(items, constraints)]
+    assert got == [False, False, False, False, False, True, True]
+    assert got == [policy.evaluate_policy(i, constraints).allowed for i in items]
+
+
+def test_batch_attributes_hits_per_item():
+    items = [{"script": "clean"}, {"caption": "مضمون 100%"}, {"onscreen_text": "illegal"}]
+    reasons = [d.reasons for d in policy.evaluate_policy_batch(items, {})]
+    assert reasons == [[], ["Blocked claim detected: مضمون 100%"], ["Blocked topic keyword detected: illegal"]]
+
+
+def test_sanitized_shape_matches_the_previous_gate():
+    d = policy.evaluate_policy({"caption": "Guaranteed viral reel", "onscreen_text": "guaranteed viral"}, {})
+    assert not d.allowed
+    # claims are removed from script and caption only, and both keys are always set
+    assert d.sanitized == {"caption": " reel", "onscreen_text": "guaranteed viral", "script": ""}
@@ -0,0 +1,49 @@
+import fakeredis
+from rq import Queue
+
+import sic_memory
+import worker
+
+
+class CountingBackend(sic_memory._LocalBackend):
+    def __init__(self):
+        super().__init__()
+        self.loads = []
+
+    def load(self, first_day, last_day):
+        self.loads.append((first_day, last_day))
+        return super().load(first_day, last_day)
+
+
+def test_refresh_reads_settled_days_once():
+    mem = sic_memory._Memory()
+    mem.backend = backend = CountingBackend()
+    day = 20000
+    backend.flush({(day - 10, "p:tiktok", "s"): 3, (day, "p:tiktok", "f"): 1})
+
+    mem.refresh(now=day * 86400.0)
+    mem.refresh(now=day * 86400.0 + 30)
+    assert mem.snapshot["p:tiktok"][1] == 1
+    first = day - sic_memory.settings.SIC_MEMORY_WINDOW_DAYS + 1
+    assert backend.loads == [(first, day - 2), (day - 1, day), (day - 1, day)]
+
+    mem.refresh(now=(day + 1) * 86400.0)  # next day: only the newly settled day
+    assert backend.loads[-2:] == [(day - 1, day - 1), (day, day + 1)]
+    assert mem.snapshot["p:tiktok"][0] > 0
+
+
+def record_outcome():
+    sic_memory.record_success("tiktok", niche="fintech")
+
+
+def test_worker_flushes_outcomes_recorded_by_a_job(monkeypatch):
+    backend = sic_memory._LocalBackend()
+    monkeypatch.setattr(sic_memory._MEMORY, "backend", backend)
+    conn = fakeredis.FakeStrictRedis()
+    q = Queue("default", connection=conn)
+    q.enqueue(record_outcome)
+
+    worker.FairSimpleWorker([q], connection=conn).work(burst=True)
+
+    assert sic_memory.pending() == 0
+    assert sum(backend.counts.values()) == 2  # platform + niche dimension
@@ -0,0 +1,97 @@
+import fakeredis
+import pytest
+from rq import Queue, SimpleWorker
+from rq.job import Job
+from rq.registry import ScheduledJobRegistry
+
+import rq_queue
+from services import trends_cache, trends_provider
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    server = fakeredis.FakeServer()
+    conn = fakeredis.FakeRedis(server=server)
+    q = Queue("batch", connection=conn)
+    monkeypatch.setattr(trends_cache, "_redis", fakeredis.FakeRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(rq_queue, "get_queue", lambda qclass="interactive": q)
+    monkeypatch.setattr(trends_cache, "refresh_stale", lambda force=False: {"active": 0, "refreshed": 0, "failed": 0})
+    return conn, q
+
+
+def _run_scheduled(conn, q) -> str:
+    # what rq's scheduler does once the hop is due, then one burst of work
+    registry = ScheduledJobRegistry(queue=q)
+    (job_id,) = registry.get_job_ids()
+    registry.remove(job_id)
+    q.enqueue_job(Job.fetch(job_id, connection=conn))
+    SimpleWorker([q], connection=conn).work(burst=True)
+    return job_id
+
+
+def test_refresh_chain_survives_consecutive_runs(chain, monkeypatch):
+    conn, q = chain
+    clock = [1_000_000.0]
+    monkeypatch.setattr(trends_cache.time, "time", lambda: clock[0])
+
+    trends_cache.schedule_refresh(delay_sec=60)
+    seen = []
+    for _ in range(2):
+        seen.append(_run_scheduled(conn, q))
+        clock[0] += 60
+        (next_id,) = ScheduledJobRegistry(queue=q).get_job_ids()
+        assert Job.exists(next_id, connection=conn)
+        assert next_id not in seen
+    assert len(set(seen)) == 2
+
+
+def test_out_of_band_refresh_does_not_fork_the_chain(chain):
+    conn, q = chain
+    trends_cache.schedule_refresh(delay_sec=60)
+    trends_cache.schedule_refresh()  # e.g. request_refresh on a stale read
+    SimpleWorker([q], connection=conn).work(burst=True)
+    assert len(ScheduledJobRegistry(queue=q).get_job_ids()) == 1
+
+
+class FakeExternal:
+    timeout_sec = 1.0
+
+    def __init__(self):
+        self.calls = []
+
+    def get_hashtags(self, *, creator_id, limit=12, lang="en", topic=None, segment="general"):
+        self.calls.append(segment)
+        return trends_provider.TrendsResult(hashtags=["#live"], source="external", updated_at="")
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    monkeypatch.setattr(trends_cache.settings, "TREND_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(trends_cache.settings, "REDIS_URL", "")
+
+
+def test_refresh_publishes_provider_latency(monkeypatch, store):
+    monkeypatch.setattr(trends_cache, "_redis", fakeredis.FakeRedis(decode_responses=True))
+    external = FakeExternal()
+    mixer = trends_provider.SmartMixerProvider(external, trends_provider.StaticFallbackProvider())
+    monkeypatch.setattr(trends_cache, "get_trends_provider", lambda indexed=True: mixer)
+
+    trends_cache.get_hashtags(creator_id="c1", lang="en", segment="Creators")
+    trends_cache.refresh_stale(force=True)
+
+    assert external.calls == ["creators"]
+    (report,) = trends_cache.provider_latency().values()
+    assert report["FakeExternal"]["calls"] == 1
+
+
+def test_static_refresh_feeds_the_trend_index(monkeypatch, store):
+    from services import trend_store
+
+    monkeypatch.setattr(trends_cache, "_redis", fakeredis.FakeRedis(decode_responses=True))
+    monkeypatch.setenv("TRENDS_PROVIDER", "static")
+
+    trends_cache.get_hashtags(creator_id="c1", lang="en")
+    trends_cache.refresh_stale(force=True)
+
+    assert trend_store.top_tags("en")
+    assert trends_cache.get_hashtags(creator_id="c1", lang="en").source.startswith("trend_index")
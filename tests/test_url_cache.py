@@ -0,0 +1,20 @@
+import time
+
+import fakeredis
+
+from utils import url_cache
+
+
+def test_redis_eviction_prunes_expired_entries(monkeypatch):
+    r = fakeredis.FakeRedis()
+    monkeypatch.setattr("redis.Redis.from_url", lambda url, **kw: r)
+    backend = url_cache._RedisBackend("redis://")
+    backend.put("old", b"x" * 60, max_age=3600, max_bytes=100)
+    r.pexpire(f"{url_cache._PREFIX}:e:old", 1)
+    time.sleep(0.01)
+
+    backend.put("new", b"y" * 60, max_age=3600, max_bytes=100)
+
+    assert r.get(f"{url_cache._PREFIX}:e:new") == b"y" * 60
+    assert r.hkeys(f"{url_cache._PREFIX}:size") == [b"new"]
+    assert r.zrange(f"{url_cache._PREFIX}:lru", 0, -1) == [b"new"]
@@ -0,0 +1,56 @@
+import pytest
+
+from utils import url_fetch
+
+
+class FakeResponse:
+    def __init__(self, body: bytes, content_type: str):
+        self.body = body
+        self.url = "https://example.com/"
+        self.status_code = 200
+        self.headers = {"Content-Type": content_type}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i : i + chunk_size]
+
+
+class FakeSession:
+    def __init__(self, body: bytes, content_type: str):
+        self.response = FakeResponse(body, content_type)
+
+    def get(self, url, **kwargs):
+        return self.response
+
+
+@pytest.mark.parametrize(
+    "body,content_type",
+    [
+        (b"<html><body><p>Hello Big World of text</p></body></html>", "text/html; charset=utf-8"),
+        (b"Hello Big World of text", "text/plain; charset=utf-8"),
+    ],
+)
+def test_short_body_cut_at_max_chars_is_truncated(body, content_type):
+    res = url_fetch.fetch_url("https://example.com/", session=FakeSession(body, content_type), max_chars=10)
+    assert len(res.text) == 10
+    assert res.reason == "text_limit" and res.truncated
+
+
+def test_short_body_within_max_chars_is_complete():
+    body = b"<html><body><p>Hello</p></body></html>"
+    res = url_fetch.fetch_url("https://example.com/", session=FakeSession(body, "text/html"), max_chars=100)
+    assert res.text == "Hello"
+    assert res.reason == "complete" and not res.truncated
+
+
+def test_long_body_cut_at_max_chars_is_truncated():
+    body = b"<html><body>" + b"<p>word word word</p>" * 2000 + b"</body></html>"
+    res = url_fetch.fetch_url("https://example.com/", session=FakeSession(body, "text/html"), max_chars=50)
+    assert len(res.text) == 50
+    assert res.reason == "text_limit" and res.truncated
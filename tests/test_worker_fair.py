@@ -0,0 +1,34 @@
+import fakeredis
+from rq import Queue
+
+import worker
+from rq_queue import all_queue_names, queue_name
+
+served = []
+
+
+def record(tag):
+    served.append(tag)
+
+
+def test_idle_queue_burst_does_not_starve_interactive():
+    conn = fakeredis.FakeStrictRedis()
+    queues = {n: Queue(n, connection=conn) for n in all_queue_names()}
+    interactive, batch = queues[queue_name("interactive")], queues[queue_name("batch")]
+    w = worker.FairSimpleWorker(list(queues.values()), connection=conn)
+
+    # a long spell where only interactive work is waiting
+    interactive.enqueue(record, "i")
+    for _ in range(1000):
+        w.reorder_queues(interactive)
+
+    served.clear()
+    for _ in range(20):
+        batch.enqueue(record, "b")
+    for _ in range(5):
+        interactive.enqueue(record, "i")
+    w.work(burst=True)
+
+    assert served.count("i") == 6 and served.count("b") == 20
+    # interactive (weight 6) keeps its share of the head of the line
+    assert served[:10].count("i") >= 5
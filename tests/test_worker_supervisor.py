@@ -0,0 +1,73 @@
+import itertools
+
+import pytest
+
+import worker
+
+_pids = itertools.count(1000)
+
+
+class FakeProcess:
+    def __init__(self, target=None, args=(), name="", daemon=False):
+        self.pid = next(_pids)
+        self.exitcode = None
+        self.alive = False
+
+    def start(self):
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+    def join(self, timeout=None):
+        pass
+
+    def terminate(self):
+        pass  # warm shutdown: still alive until its job finishes
+
+    def die(self, exitcode=1):
+        self.alive, self.exitcode = False, exitcode
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(worker.mp, "Process", FakeProcess)
+    monkeypatch.setattr(worker.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(worker.time, "sleep", lambda s: pytest.fail("supervisor slept for %s" % s))
+    return now
+
+
+def test_crash_loop_backoff_does_not_block_other_slots(clock):
+    sup = worker.WorkerSupervisor(["q"], 2)
+    for slot in range(2):
+        sup._spawn(slot)
+
+    sup.procs[0].die()
+    clock[0] += 1.0  # uptime < _MIN_UPTIME_SEC: crash loop
+    sup._reap()
+    assert 0 not in sup.procs and sup.respawn_at[0] == clock[0] + 1.0
+
+    sup.procs[1].die(exitcode=0)  # reaped and replaced while slot 0 waits
+    sup._reap()
+    assert sup.procs[1].is_alive() and 0 not in sup.procs
+
+    clock[0] += 1.0
+    sup._reap()
+    assert sup.procs[0].is_alive() and 0 not in sup.respawn_at
+
+
+def test_retiring_process_is_not_overwritten(clock):
+    sup = worker.WorkerSupervisor(["q"], 1, 3)
+    sup._spawn(0)
+    sup._scale_to(2)
+    first = sup.procs[1]
+    sup._scale_to(1)
+    sup._scale_to(2)
+    second = sup.procs[1]
+    sup._scale_to(1)
+
+    assert set(sup.retiring.values()) == {first, second}
+    first.die(exitcode=0)
+    sup._reap()
+    assert list(sup.retiring.values()) == [second]
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+import wpil_batch
+import wpil_memory
+
+
+@pytest.fixture
+def dump(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # wpil_memory.MEMORY_FILE is relative
+    monkeypatch.setattr(wpil_batch, "MIN_POSTS_PER_NICHE", 10)
+    monkeypatch.setattr(wpil_batch, "WORKERS", 1)
+    wpil_memory._INDEX.reset()
+
+    path = tmp_path / "posts.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for niche in ("leadership", "saas"):
+            for i in range(40):
+                post = {
+                    "platform": "linkedin",
+                    "niche": niche,
+                    "text": f"Why most {niche} teams fail at step {i}?\nThey skip the basics.\nHere is the fix.",
+                    "likes": 10 * i,
+                    "comments": i,
+                    "shares": i // 2,
+                }
+                f.write(json.dumps(post) + "\n")
+    yield str(path)
+    wpil_memory._INDEX.reset()
+
+
+@pytest.mark.parametrize("centroids", [False, True])
+def test_rerun_replaces_niche_patterns(dump, centroids):
+    now = 1_700_000_000.0
+    first = wpil_batch.run_batch(dump, now=now, centroids=centroids)
+    live = wpil_memory.load_patterns()
+    assert first["patterns"] > 0
+    assert len(live) == first["patterns"]
+
+    second = wpil_batch.run_batch(dump, now=now, centroids=centroids)
+    live = wpil_memory.load_patterns()
+    assert len(live) == second["patterns"] == first["patterns"]
+    assert {p["batch_id"] for p in live} == {second["batch_id"]}
+    assert {p["niche"] for p in live} == {"leadership", "saas"}
+
+
+def test_rerun_keeps_niches_it_did_not_derive(dump, tmp_path):
+    now = 1_700_000_000.0
+    wpil_batch.run_batch(dump, now=now)
+    kept = [p for p in wpil_memory.load_patterns() if p["niche"] == "saas"]
+
+    only_leadership = tmp_path / "leadership.jsonl"
+    with open(dump, encoding="utf-8") as src, open(only_leadership, "w", encoding="utf-8") as dst:
+        dst.writelines(line for line in src if '"leadership"' in line)
+    wpil_batch.run_batch(str(only_leadership), now=now)
+
+    assert [p for p in wpil_memory.load_patterns() if p["niche"] == "saas"] == kept
@@ -0,0 +1,147 @@
+"""
+Fingerprinted, precompressed static assets.
+
+Build step (run at deploy, output is gitignored):
+    python -m utils.assets
+
+For every file in ASSETS it writes static/dist/<name>.<hash>.<ext> plus .gz
+(and .br when the optional `brotli` package is installed), and a
+manifest.json mapping logical names to hashed ones. Hashed files are served
+from /assets/ with a one-year immutable Cache-Control; without a manifest,
+asset_url() falls back to the plain /static/ file.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+from flask import Response, request, url_for
+
+from utils.compression import choose_encoding
+
+try:
+    import brotli  # type: ignore
+except Exception:  # optional
+    brotli = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(ROOT, "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST = os.path.join(DIST_DIR, "manifest.json")
+
+ASSETS = ("app.js", "app.css", "style.css")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+
+_MIME = {
+    ".js": "application/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+    ".json": "application/json",
+}
+
+_manifest: Optional[Dict[str, str]] = None
+_loaded: Dict[str, Dict[str, bytes]] = {}
+
+
+def compress_variants(body: bytes) -> Dict[str, bytes]:
+    """
+    {"identity": body, "gzip": ..., "br": ...} (br only if brotli is installed).
+    """
+    out = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        out["br"] = brotli.compress(body, quality=11)
+    return out
+
+
+def build(static_dir: str = STATIC_DIR, dist_dir: str = DIST_DIR) -> Dict[str, str]:
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest: Dict[str, str] = {}
+    for name in ASSETS:
+        src = os.path.join(static_dir, name)
+        if not os.path.isfile(src):
+            continue
+        with open(src, "rb") as f:
+            body = f.read()
+        stem, ext = os.path.splitext(name)
+        hashed = f"{stem}.{hashlib.sha256(body).hexdigest()[:12]}{ext}"
+        for enc, data in compress_variants(body).items():
+            suffix = {"identity": "", "gzip": ".gz", "br": ".br"}[enc]
+            with open(os.path.join(dist_dir, hashed + suffix), "wb") as f:
+                f.write(data)
+        manifest[name] = hashed
+    with open(os.path.join(dist_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_manifest() -> Dict[str, str]:
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(MANIFEST, "r", encoding="utf-8") as f:
+                _manifest = json.load(f)
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest
+
+
+def asset_url(name: str) -> str:
+    hashed = load_manifest().get(name)
+    if hashed:
+        return f"/assets/{hashed}"
+    return url_for("static", filename=name)
+
+
+def _pick_encoding(available) -> str:
+    return choose_encoding(request.accept_encodings, available) or "identity"
+
+
+def respond(variants: Dict[str, bytes], mimetype: str, etag: str, cache_control: str) -> Response:
+    """
+    Serves one of the precompressed `variants` (negotiated), with ETag / 304.
+    """
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        enc = _pick_encoding(variants)
+        resp = Response(variants[enc], mimetype=mimetype)
+        if enc != "identity":
+            resp.headers["Content-Encoding"] = enc
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = cache_control
+    resp.headers["Vary"] = "Accept-Encoding"
+    return resp
+
+
+def send_asset(filename: str) -> Response:
+    """
+    Serves a hashed file from static/dist (only names listed in the manifest).
+    """
+    variants = _loaded.get(filename)
+    if variants is None:
+        if filename not in set(load_manifest().values()):
+            return Response("not found", status=404)
+        base = os.path.join(DIST_DIR, filename)
+        variants = {}
+        for enc, suffix in (("identity", ""), ("gzip", ".gz"), ("br", ".br")):
+            if os.path.isfile(base + suffix):
+                with open(base + suffix, "rb") as f:
+                    variants[enc] = f.read()
+        if "identity" not in variants:
+            return Response("not found", status=404)
+        # immutable by name: safe to keep in memory for the process lifetime
+        _loaded[filename] = variants
+    mimetype = _MIME.get(os.path.splitext(filename)[1], "application/octet-stream")
+    # the content hash is in the name, so it doubles as the ETag
+    return respond(variants, mimetype, filename, IMMUTABLE)
+
+
+if __name__ == "__main__":
+    for k, v in build().items():
+        print(f"{k} -> {v}")
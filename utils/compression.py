@@ -0,0 +1,150 @@
+"""
+Negotiated gzip / brotli response compression.
+
+    from utils import compression
+    compression.init_app(app)
+
+Applied in after_request to text-like responses (JSON, HTML, JS, CSS, SVG,
+...). Skipped for small bodies (< COMPRESS_MIN_BYTES), already-encoded
+responses (precompressed assets), media types that are compressed already
+(images, video, audio, archives), range requests and `no-transform`.
+Buffered bodies are compressed in one call; streamed responses (generators,
+file wrappers) chunk by chunk as they are sent, without buffering them.
+
+brotli is used when the optional `brotli` package is installed and the client
+prefers it; gzip otherwise.
+"""
+
+from __future__ import annotations
+
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from flask import Flask, Response, request
+
+from config import settings
+
+try:
+    import brotli  # type: ignore
+except Exception:  # optional
+    brotli = None
+
+_COMPRESSIBLE_PREFIXES = ("text/",)
+_COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/x-javascript",
+    "application/xml",
+    "application/manifest+json",
+    "application/x-ndjson",
+    "image/svg+xml",
+}
+
+
+def is_compressible(mimetype: Optional[str]) -> bool:
+    mt = (mimetype or "").lower()
+    if not mt:
+        return False
+    return mt.startswith(_COMPRESSIBLE_PREFIXES) or mt in _COMPRESSIBLE_TYPES or mt.endswith(("+json", "+xml"))
+
+
+def choose_encoding(accept_encodings, offered: Optional[Iterable[str]] = None) -> Optional[str]:
+    """
+    Best of `offered` (default: what this process can produce) for the
+    request's Accept-Encoding, honouring q-values (q=0 refuses); None for
+    identity.
+    """
+    if offered is None:
+        offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    else:
+        offered = [e for e in ("br", "gzip") if e in offered]
+    enc = accept_encodings.best_match(offered)
+    return enc if enc in offered else None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=int(settings.COMPRESS_BROTLI_QUALITY))
+        else:
+            # wbits=31 -> gzip container
+            self._c = zlib.compressobj(int(settings.COMPRESS_GZIP_LEVEL), zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._c.process(data)
+        return self._c.compress(data)
+
+    def finish(self) -> bytes:
+        return self._c.finish() if self.encoding == "br" else self._c.flush()
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    c = _Compressor(encoding)
+    return c.compress(data) + c.finish()
+
+
+def compress_stream(chunks: Iterable[bytes | str], encoding: str) -> Iterator[bytes]:
+    c = _Compressor(encoding)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            out = c.compress(chunk)
+            if out:
+                yield out
+        yield c.finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _should_compress(resp: Response) -> bool:
+    if not settings.COMPRESS_ENABLED:
+        return False
+    if resp.status_code < 200 or resp.status_code in (204, 206, 304) or request.method == "HEAD":
+        return False
+    if "Content-Encoding" in resp.headers or "Range" in request.headers:
+        return False
+    if "no-transform" in (resp.headers.get("Cache-Control") or "").lower():
+        return False
+    if not is_compressible(resp.mimetype):
+        return False
+    length = resp.content_length
+    if length is not None and length < int(settings.COMPRESS_MIN_BYTES):
+        return False
+    return True
+
+
+def compress_response(resp: Response) -> Response:
+    # Vary on any compressible response, even when this client got identity
+    if not _should_compress(resp):
+        if settings.COMPRESS_ENABLED and is_compressible(resp.mimetype) and "Content-Encoding" not in resp.headers:
+            resp.vary.add("Accept-Encoding")
+        return resp
+    resp.vary.add("Accept-Encoding")
+    enc = choose_encoding(request.accept_encodings)
+    if enc is None:
+        return resp
+
+    if resp.is_streamed:
+        # the original iterable (file wrapper, generator) is closed by compress_stream
+        source = resp.response
+        resp.direct_passthrough = False
+        resp.response = compress_stream(source, enc)
+        resp.headers.pop("Content-Length", None)
+    else:
+        resp.set_data(compress_bytes(resp.get_data(), enc))
+
+    resp.headers["Content-Encoding"] = enc
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        # different bytes than the identity body: only weakly equal
+        resp.set_etag(etag, weak=True)
+    return resp
+
+
+def init_app(app: Flask) -> None:
+    app.after_request(compress_response)
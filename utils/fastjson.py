@@ -0,0 +1,136 @@
+"""
+Fast JSON backend: orjson when installed, stdlib json otherwise.
+
+Used by the Flask JSON provider (app.json = FastJSONProvider(app)), the
+SQLAlchemy JSON column serializer (db.py), utils.logging.safe_json and the
+task / experiment helpers. Output is always UTF-8 with non-ASCII kept as-is
+(ensure_ascii=False); keys are not sorted unless asked for.
+
+Flask is only imported when FastJSONProvider is first used, so db / tasks /
+the worker can use this module without it.
+
+Benchmark on real pack payloads:
+    python -m utils.fastjson
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Optional
+
+try:
+    import orjson  # type: ignore
+except Exception:  # optional
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+if orjson is not None:
+    _OPTS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps_bytes(
+    obj: Any, default: Optional[Callable[[Any], Any]] = None, indent: bool = False, sort_keys: bool = False
+) -> bytes:
+    if orjson is not None:
+        opts = _OPTS | (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        try:
+            return orjson.dumps(obj, default=default, option=opts)
+        except TypeError:
+            # orjson.JSONEncodeError: >64-bit ints, exotic keys, ... -> stdlib
+            pass
+    return json.dumps(
+        obj, ensure_ascii=False, default=default, indent=2 if indent else None, sort_keys=sort_keys
+    ).encode("utf-8")
+
+
+def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None, indent: bool = False, sort_keys: bool = False) -> str:
+    if orjson is not None:
+        return dumps_bytes(obj, default=default, indent=indent, sort_keys=sort_keys).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, default=default, indent=2 if indent else None, sort_keys=sort_keys)
+
+
+def loads(data: str | bytes | bytearray) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _provider_class() -> type:
+    from flask.json.provider import DefaultJSONProvider
+
+    class FastJSONProvider(DefaultJSONProvider):
+        """
+        Flask JSON provider on top of dumps_bytes/loads. jsonify() bodies are
+        encoded straight to bytes (no intermediate str), which matters for the
+        multi-megabyte base64 reel responses. Unlike Flask's default provider,
+        datetimes are emitted as ISO 8601 (orjson) rather than HTTP dates, and
+        keys keep their insertion order: sort_keys defaults to False here (set
+        app.json.sort_keys = True to get Flask's sorted output back).
+        """
+
+        sort_keys = False
+
+        def dumps(self, obj: Any, **kwargs: Any) -> str:
+            return dumps(obj, default=kwargs.get("default", self.default), sort_keys=kwargs.get("sort_keys", self.sort_keys))
+
+        def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+            return loads(s)
+
+        def response(self, *args: Any, **kwargs: Any) -> Any:
+            obj = self._prepare_response_obj(args, kwargs)
+            pretty = self.compact is False or (self.compact is None and self._app.debug)
+            body = dumps_bytes(obj, default=self.default, indent=pretty, sort_keys=self.sort_keys) + b"\n"
+            return self._app.response_class(body, mimetype=self.mimetype)
+
+    FastJSONProvider.__qualname__ = "FastJSONProvider"
+    return FastJSONProvider
+
+
+def __getattr__(name: str) -> Any:
+    # FastJSONProvider subclasses Flask's provider: built on first access
+    if name == "FastJSONProvider":
+        cls = globals()[name] = _provider_class()
+        return cls
+    raise AttributeError(name)
+
+
+def _bench() -> None:
+    import base64
+    import os
+    import time
+
+    from tasks import _make_pack_payload
+
+    pack = _make_pack_payload("التسويق بالذكاء الاصطناعي لشركات المقاولات", "ar", "Authority", ["linkedin", "x", "tiktok"])
+    # execute_order-style reel response: 3 scenes with ~1 MB base64 images each
+    reel = {
+        "status": "SUCCESS",
+        "title": pack["genes"]["angle"],
+        "scenes": [
+            {"time": t, "voiceover": pack["assets"]["tiktok"][:200], "image_base64": base64.b64encode(os.urandom(750_000)).decode()}
+            for t in ("0-3s", "3-7s", "7-15s")
+        ],
+    }
+
+    def timeit(fn: Callable[[], Any], n: int) -> float:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return (time.perf_counter() - t0) / n * 1e6
+
+    print(f"backend: {BACKEND}")
+    for label, obj, n in (("pack", pack, 2000), ("reel (3x1MB b64)", reel, 20)):
+        std_enc = timeit(lambda: json.dumps(obj, ensure_ascii=False), n)
+        fast_enc = timeit(lambda: dumps_bytes(obj), n)
+        s = json.dumps(obj, ensure_ascii=False)
+        std_dec = timeit(lambda: json.loads(s), n)
+        fast_dec = timeit(lambda: loads(s), n)
+        print(
+            f"{label:18s} encode {std_enc:10.1f}us -> {fast_enc:10.1f}us (x{std_enc / max(fast_enc, 1e-9):.1f})"
+            f" | decode {std_dec:10.1f}us -> {fast_dec:10.1f}us (x{std_dec / max(fast_dec, 1e-9):.1f})"
+        )
+
+
+if __name__ == "__main__":
+    _bench()
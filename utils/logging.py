@@ -1,6 +1,6 @@
-import json
 import logging
 from config import settings
+from utils import fastjson
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -20,6 +20,6 @@ def get_logger(name: str) -> logging.Logger:
 
 def safe_json(data) -> str:
     try:
-        return json.dumps(data, ensure_ascii=False, default=str)
+        return fastjson.dumps(data, default=str)
     except Exception:
         return "{}"
@@ -0,0 +1,87 @@
+"""
+Text normalization shared by matching / scoring code.
+
+normalize_text() folds case and the common Arabic orthographic variants so
+"إدارة" / "ادارة", "مدرسة" / "مدرسه", "على" / "علي" and diacritized /
+tatweel-stretched spellings compare equal.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Iterable, List
+
+_AR_DIACRITICS = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")  # harakat, Quranic marks, tatweel
+# str.replace per pair: much faster than str.translate on non-ASCII text
+_AR_FOLD = (("أ", "ا"), ("إ", "ا"), ("آ", "ا"), ("ٱ", "ا"), ("ى", "ي"), ("ة", "ه"), ("ؤ", "و"), ("ئ", "ي"), ("٬", ","), ("،", ","))
+
+
+def normalize_text(text: str) -> str:
+    s = _AR_DIACRITICS.sub("", (text or "").casefold())
+    for a, b in _AR_FOLD:
+        if a in s:
+            s = s.replace(a, b)
+    return " ".join(s.split())  # collapse + strip whitespace
+
+
+def fold_pattern(phrases: Iterable[str]) -> str:
+    """
+    Regex source matching any of `phrases` in raw (un-normalized) text
+    wherever normalize_text() would make them equal: case, letter variants,
+    diacritics / tatweel and runs of whitespace. Case is spelled out per
+    letter (upper / title forms that casefold back to it), so no flags are
+    needed and the text needs no casefold pass; multi-character folds
+    (e.g. "ß" -> "ss") are not covered.
+
+    The phrases are laid out as a prefix trie (longest match wins), so a scan
+    tests each character once rather than once per phrase; normalize_text()
+    of a match gives back the phrase it matched. First characters are plain
+    literals (letter and case variants get their own branch), which lets the
+    regex engine skip non-candidate positions without entering the trie.
+    """
+    variants: Dict[str, List[str]] = {}
+    for a, b in _AR_FOLD:
+        variants.setdefault(b, [b]).append(a)
+    tail = f"{_AR_DIACRITICS.pattern}*"
+
+    def forms(ch: str) -> List[str]:
+        cased = sorted({c for c in (ch.upper(), ch.title()) if len(c) == 1 and c != ch and c.casefold() == ch})
+        return variants.get(ch, [ch]) + cased
+
+    trie: Dict[str, Any] = {}
+    for phrase in phrases:
+        n = normalize_text(phrase)
+        if n:
+            node = trie
+            for ch in n:
+                node = node.setdefault(ch, {})
+            node[""] = {}  # end of a phrase
+
+    def char(ch: str, alts: List[str]) -> str:
+        if ch == " ":
+            return r"\s+"
+        piece = "[" + "".join(re.escape(c) for c in alts) + "]" if len(alts) > 1 else re.escape(alts[0])
+        return piece + tail if "\u0620" <= ch <= "\u06ff" else piece  # diacritics / tatweel may follow an Arabic letter
+
+    def emit(node: Dict[str, Any], root: bool = False) -> str:
+        alts = []
+        for ch, child in sorted(node.items()):
+            if ch:
+                rest = emit(child)
+                alts.extend(char(ch, f) + rest for f in ([[v] for v in forms(ch)] if root else [forms(ch)]))
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie, root=True) or "(?!)"
+
+
+def char_ngrams(text: str, n: int = 3) -> List[str]:
+    """
+    Character n-grams of the normalized, space-padded text.
+    """
+    s = f" {normalize_text(text)} "
+    if len(s) <= n:
+        return [s]
+    return [s[i : i + n] for i in range(len(s) - n + 1)]
@@ -0,0 +1,278 @@
+"""
+Cache of extracted url-mode text, keyed by canonical URL.
+
+fetch_cached() serves an entry younger than URL_CACHE_TTL_SEC without
+touching the network. An older entry that has an ETag or Last-Modified is
+revalidated with a conditional GET: a 304 reuses the stored text (no
+download, no parse) and restarts the TTL. Otherwise the page is fetched and
+parsed again. Entries are dropped after URL_CACHE_MAX_AGE_SEC, and the least
+recently used ones are evicted once the cache holds more than
+URL_CACHE_MAX_BYTES.
+
+Backends (URL_CACHE_BACKEND): redis (shared by all web / worker processes),
+disk (one JSON file per URL under URL_CACHE_DIR), auto (redis when REDIS_URL
+is set, else disk) or off.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, fields
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+from config import settings
+from utils import fastjson
+from utils.url_fetch import FetchResult, fetch_url
+
+_PREFIX = "dominator:urlcache"
+
+# query parameters that never change the page content
+_TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid", "ref", "ref_src", "si", "_ga"}
+
+# results worth caching (partial text from a capped download is still the
+# best this page will give us)
+_CACHEABLE = {"complete", "text_limit", "byte_cap"}
+
+
+def canonical_url(url: str) -> str:
+    """
+    Lower-cased scheme/host, no default port, no fragment, no tracking
+    parameters, sorted query.
+    """
+    parts = urlsplit((url or "").strip())
+    scheme = (parts.scheme or "http").lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = [
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    ]
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(sorted(query)), ""))
+
+
+def _key(canonical: str) -> str:
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+# -------------------------------
+# Backends
+# -------------------------------
+
+
+class _RedisBackend:
+    """
+    One string per entry plus a ZSET (last access) and HASH (entry sizes) for
+    LRU eviction across processes. Entries expire on their own (ex=max_age);
+    eviction prunes their leftover ZSET / HASH members first.
+    """
+
+    def __init__(self, url: str):
+        from redis import Redis
+
+        self.r = Redis.from_url(url, decode_responses=False)
+
+    def get(self, key: str) -> Optional[bytes]:
+        raw = self.r.get(f"{_PREFIX}:e:{key}")
+        if raw is not None:
+            self.r.zadd(f"{_PREFIX}:lru", {key: time.time()})
+        return raw
+
+    def put(self, key: str, blob: bytes, max_age: int, max_bytes: int) -> None:
+        p = self.r.pipeline(transaction=False)
+        p.set(f"{_PREFIX}:e:{key}", blob, ex=max_age)
+        p.zadd(f"{_PREFIX}:lru", {key: time.time()})
+        p.hset(f"{_PREFIX}:size", key, len(blob))
+        p.execute()
+        self._evict(max_bytes)
+
+    def _evict(self, max_bytes: int) -> None:
+        sizes = {k.decode(): int(v) for k, v in self.r.hgetall(f"{_PREFIX}:size").items()}
+        if not sizes:
+            return
+        p = self.r.pipeline(transaction=False)
+        for k in sizes:
+            p.exists(f"{_PREFIX}:e:{k}")
+        expired = [k for k, alive in zip(list(sizes), p.execute()) if not alive]
+        if expired:
+            p = self.r.pipeline(transaction=False)
+            p.zrem(f"{_PREFIX}:lru", *expired)
+            p.hdel(f"{_PREFIX}:size", *expired)
+            p.execute()
+            for k in expired:
+                del sizes[k]
+
+        total = sum(sizes.values())
+        if total <= max_bytes:
+            return
+        for k in self.r.zrange(f"{_PREFIX}:lru", 0, -1):
+            if total <= max_bytes:
+                break
+            k = k.decode()
+            total -= sizes.get(k, 0)
+            p = self.r.pipeline(transaction=False)
+            p.delete(f"{_PREFIX}:e:{k}")
+            p.zrem(f"{_PREFIX}:lru", k)
+            p.hdel(f"{_PREFIX}:size", k)
+            p.execute()
+
+
+class _DiskBackend:
+    """
+    <dir>/<key>.json, written atomically (tmp + rename); mtime is the LRU clock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key + ".json")
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._file(key), "rb") as f:
+                blob = f.read()
+            os.utime(self._file(key))
+            return blob
+        except OSError:
+            return None
+
+    def put(self, key: str, blob: bytes, max_age: int, max_bytes: int) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, self._file(key))
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return
+        self._evict(max_age, max_bytes)
+
+    def _evict(self, max_age: int, max_bytes: int) -> None:
+        now = time.time()
+        entries = []
+        with os.scandir(self.path) as it:
+            for e in it:
+                if not e.name.endswith(".json"):
+                    continue
+                try:
+                    st = e.stat()
+                except OSError:
+                    continue
+                if now - st.st_mtime > max_age:
+                    self._unlink(e.path)
+                    continue
+                entries.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            self._unlink(path)
+            total -= size
+
+    @staticmethod
+    def _unlink(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+_backend: Any = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                mode = (settings.URL_CACHE_BACKEND or "auto").strip().lower()
+                if mode == "auto":
+                    mode = "redis" if settings.REDIS_URL else "disk"
+                if mode == "redis" and settings.REDIS_URL:
+                    _backend = _RedisBackend(settings.REDIS_URL)
+                elif mode == "disk":
+                    _backend = _DiskBackend(settings.URL_CACHE_DIR)
+                else:
+                    _backend = False
+    return _backend or None
+
+
+# -------------------------------
+# Cached fetch
+# -------------------------------
+
+_RESULT_FIELDS = {f.name for f in fields(FetchResult)}
+
+
+def _load(backend, key: str) -> Optional[Dict[str, Any]]:
+    try:
+        raw = backend.get(key)
+        return fastjson.loads(raw) if raw else None
+    except Exception:
+        return None
+
+
+def _store(backend, key: str, entry: Dict[str, Any]) -> None:
+    try:
+        backend.put(key, fastjson.dumps_bytes(entry), int(settings.URL_CACHE_MAX_AGE_SEC), int(settings.URL_CACHE_MAX_BYTES))
+    except Exception:
+        pass
+
+
+def _from_entry(entry: Dict[str, Any], cache: str, elapsed_ms: float) -> FetchResult:
+    res = FetchResult(**{k: v for k, v in entry["result"].items() if k in _RESULT_FIELDS})
+    res.cache = cache
+    res.elapsed_ms = elapsed_ms
+    return res
+
+
+def fetch_cached(url: str, session: Optional[requests.Session] = None) -> FetchResult:
+    backend = get_backend()
+    if backend is None:
+        return fetch_url(url, session=session)
+
+    t0 = time.monotonic()
+    canonical = canonical_url(url)
+    key = _key(canonical)
+    now = time.time()
+    entry = _load(backend, key)
+
+    if entry is not None and now - float(entry.get("validated_at", 0)) < int(settings.URL_CACHE_TTL_SEC):
+        return _from_entry(entry, "hit", round((time.monotonic() - t0) * 1000.0, 1))
+
+    conditional: Dict[str, str] = {}
+    if entry is not None:
+        if entry["result"].get("etag"):
+            conditional["If-None-Match"] = entry["result"]["etag"]
+        if entry["result"].get("last_modified"):
+            conditional["If-Modified-Since"] = entry["result"]["last_modified"]
+
+    res = fetch_url(url, session=session, headers=conditional or None)
+
+    if res.reason == "not_modified" and entry is not None:
+        entry["validated_at"] = now
+        _store(backend, key, entry)
+        return _from_entry(entry, "revalidated", res.elapsed_ms)
+
+    res.cache = "miss"
+    if res.reason in _CACHEABLE and res.text:
+        _store(backend, key, {"url": canonical, "validated_at": now, "result": asdict(res)})
+    elif entry is not None and res.reason in ("error", "deadline", "http_error") and res.status != 404:
+        # origin is down: better stale text than none
+        return _from_entry(entry, "stale", res.elapsed_ms)
+    return res
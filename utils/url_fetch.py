@@ -0,0 +1,303 @@
+"""
+Bounded, streaming URL ingestion for url-mode packs.
+
+fetch_url() streams the response and never holds more than
+URL_FETCH_MAX_BYTES of it. The body goes through a Python incremental
+decoder into an lxml HTMLPullParser, and main-content text is collected as
+the parser emits elements. Boilerplate subtrees (script, style, nav, header,
+footer, forms, ...) are skipped. The download stops as soon as max_chars of
+text are collected, the byte cap is hit, or the deadline passes.
+
+Non-text content types are not downloaded. The charset comes from the
+Content-Type header, then a BOM, then <meta charset> in the first bytes, and
+falls back to UTF-8.
+"""
+
+from __future__ import annotations
+
+import codecs
+import re
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from config import settings
+from utils import warmup
+
+_CHUNK = 16 * 1024
+_SNIFF_BYTES = 4096
+
+_HTML_TYPES = {"text/html", "application/xhtml+xml"}
+_TEXT_TYPES = {"text/plain", "text/markdown"}
+
+# subtrees whose text is never main content
+_SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "object",
+    "nav", "header", "footer", "aside", "form", "button", "select", "option", "menu",
+}
+
+# elements that break words apart when their text is flattened
+_BLOCK_TAGS = {
+    "title", "p", "div", "section", "article", "main", "h1", "h2", "h3", "h4", "h5", "h6",
+    "li", "ul", "ol", "dd", "dt", "blockquote", "pre", "br", "hr", "tr", "td", "th", "table", "figcaption",
+}
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_\-:.]+)""", re.I)
+_BOMS = ((codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+_WS = re.compile(r"\s+")
+
+
+@dataclass
+class FetchResult:
+    url: str
+    final_url: str = ""
+    status: int = 0
+    content_type: str = ""
+    charset: str = ""
+    text: str = ""
+    bytes_read: int = 0
+    truncated: bool = False
+    # complete | text_limit | byte_cap | deadline | not_modified | unsupported_type | http_error | error
+    reason: str = "complete"
+    elapsed_ms: float = 0.0
+    # validators for conditional revalidation (utils.url_cache)
+    etag: str = ""
+    last_modified: str = ""
+    # "" (uncached) | miss | hit | revalidated | stale
+    cache: str = ""
+
+    def meta(self) -> Dict[str, Any]:
+        """
+        Everything but the text: goes into pack["sources"]["url_fetch"].
+        """
+        out = asdict(self)
+        out.pop("text")
+        out["chars"] = len(self.text)
+        return out
+
+
+def _load_lxml_etree():
+    from lxml import etree
+
+    return etree
+
+
+warmup.register("html_parser", _load_lxml_etree)
+
+
+def parse_content_type(header: str) -> Tuple[str, str]:
+    """
+    "text/html; charset=UTF-8" -> ("text/html", "utf-8")
+    """
+    mimetype, _, params = (header or "").partition(";")
+    charset = ""
+    for p in params.split(";"):
+        k, _, v = p.partition("=")
+        if k.strip().lower() == "charset":
+            charset = v.strip().strip("\"'").lower()
+    return mimetype.strip().lower(), charset
+
+
+def sniff_charset(head: bytes, declared: str = "") -> str:
+    candidates = [declared]
+    for bom, enc in _BOMS:
+        if head.startswith(bom):
+            candidates.insert(0, enc)
+    m = _META_CHARSET.search(head)
+    if m:
+        candidates.append(m.group(1).decode("ascii", "ignore"))
+    for c in candidates:
+        if not c:
+            continue
+        try:
+            return codecs.lookup(c).name
+        except LookupError:
+            continue
+    return "utf-8"
+
+
+class _TextCollector:
+    """
+    Feeds decoded HTML into an lxml pull parser and keeps document-order text
+    from non-boilerplate elements, releasing finished subtrees as it goes.
+    """
+
+    def __init__(self, max_chars: int):
+        etree = warmup.get("html_parser")
+        self.parser = etree.HTMLPullParser(events=("start", "end"), remove_comments=True, remove_pis=True, no_network=True)
+        self.max_chars = max_chars
+        self.parts: List[str] = []
+        self.chars = 0
+        self._skip = 0
+
+    @property
+    def full(self) -> bool:
+        return self.chars >= self.max_chars
+
+    def _emit(self, s: Optional[str]) -> None:
+        if not s or self._skip:
+            return
+        s = _WS.sub(" ", s)
+        if s.strip():
+            self.parts.append(s)
+            self.chars += len(s)
+
+    def _break(self) -> None:
+        if self.parts and not self._skip and self.parts[-1] != " ":
+            self.parts.append(" ")
+
+    def feed(self, data: str) -> None:
+        self.parser.feed(data)
+        self._drain()
+
+    def close(self) -> None:
+        try:
+            self.parser.close()
+        except Exception:
+            pass
+        self._drain()
+
+    def _drain(self) -> None:
+        for event, el in self.parser.read_events():
+            if not isinstance(el.tag, str):
+                continue
+            tag = el.tag.lower()
+            if event == "start":
+                # text up to this tag is final: the parent's leading text or
+                # the previous sibling's tail
+                parent = el.getparent()
+                if parent is not None:
+                    prev = el.getprevious()
+                    self._emit(prev.tail if prev is not None else parent.text)
+                if tag in _BLOCK_TAGS:
+                    self._break()
+                if tag in _SKIP_TAGS:
+                    self._skip += 1
+            else:
+                if tag in _SKIP_TAGS:
+                    self._skip = max(0, self._skip - 1)
+                else:
+                    self._emit(el[-1].tail if len(el) else el.text)
+                    if tag in _BLOCK_TAGS:
+                        self._break()
+                # keep the tail (emitted later), drop finished earlier siblings
+                el.clear(keep_tail=True)
+                parent = el.getparent()
+                if parent is not None:
+                    while el.getprevious() is not None:
+                        del parent[0]
+            if self.full:
+                return
+
+    def text(self) -> str:
+        return _WS.sub(" ", "".join(self.parts)).strip()[: self.max_chars]
+
+
+def fetch_url(
+    url: str,
+    session: Optional[requests.Session] = None,
+    max_bytes: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    timeout: Optional[float] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> FetchResult:
+    """
+    `headers` are added to the request (e.g. If-None-Match / If-Modified-Since);
+    a 304 comes back as reason="not_modified" with no text.
+    """
+    max_bytes = int(max_bytes or settings.URL_FETCH_MAX_BYTES)
+    max_chars = int(max_chars or settings.URL_FETCH_MAX_CHARS)
+    timeout = float(timeout or settings.URL_FETCH_TIMEOUT_SEC)
+    session = session or requests.Session()
+
+    res = FetchResult(url=url)
+    t0 = time.monotonic()
+    deadline = t0 + timeout
+    try:
+        with session.get(
+            url,
+            stream=True,
+            timeout=(min(5.0, timeout), timeout),
+            headers={"User-Agent": "AI-DOMINATOR/1.0", "Accept": "text/html,application/xhtml+xml,text/plain;q=0.8", **(headers or {})},
+        ) as r:
+            res.final_url, res.status = r.url, r.status_code
+            res.etag = r.headers.get("ETag", "")
+            res.last_modified = r.headers.get("Last-Modified", "")
+            if r.status_code == 304:
+                res.reason = "not_modified"
+                return res
+            if r.status_code >= 400:
+                res.reason = "http_error"
+                return res
+            mimetype, declared = parse_content_type(r.headers.get("Content-Type", ""))
+            res.content_type = mimetype
+            is_html = mimetype in _HTML_TYPES or not mimetype
+            if not is_html and mimetype not in _TEXT_TYPES:
+                res.reason = "unsupported_type"
+                return res
+
+            collector = _TextCollector(max_chars) if is_html else None
+            plain: List[str] = []
+            decoder = None
+            head = b""
+
+            def take(s: str) -> None:
+                # every decoded piece goes through here, so a cut is always reported
+                if collector is not None:
+                    if collector.full:
+                        return
+                    collector.feed(s)
+                    if collector.full:
+                        res.reason = "text_limit"
+                else:
+                    plain.append(s)
+                    if sum(map(len, plain)) >= max_chars:
+                        res.reason = "text_limit"
+
+            for chunk in r.iter_content(chunk_size=_CHUNK):
+                if not chunk:
+                    continue
+                if res.bytes_read + len(chunk) > max_bytes:
+                    chunk = chunk[: max_bytes - res.bytes_read]
+                    res.reason = "byte_cap"
+                res.bytes_read += len(chunk)
+
+                if decoder is None:
+                    head += chunk
+                    if len(head) < _SNIFF_BYTES and res.reason == "complete":
+                        continue
+                    res.charset = sniff_charset(head, declared)
+                    decoder = codecs.getincrementaldecoder(res.charset)(errors="replace")
+                    chunk, head = head, b""
+
+                take(decoder.decode(chunk))
+
+                if res.reason != "complete":
+                    break
+                if time.monotonic() > deadline:
+                    res.reason = "deadline"
+                    break
+
+            if decoder is None:
+                # whole body was shorter than the sniff window
+                res.charset = sniff_charset(head, declared)
+                decoder = codecs.getincrementaldecoder(res.charset)(errors="replace")
+                take(decoder.decode(head))
+            take(decoder.decode(b"", final=True))
+
+            if collector is not None:
+                if not collector.full:
+                    collector.close()  # emits the text still held by the parser
+                    if collector.full and res.reason == "complete":
+                        res.reason = "text_limit"
+                res.text = collector.text()
+            else:
+                res.text = _WS.sub(" ", "".join(plain)).strip()[:max_chars]
+    except Exception:
+        res.reason = "error"
+    finally:
+        res.truncated = res.reason in ("text_limit", "byte_cap", "deadline")
+        res.elapsed_ms = round((time.monotonic() - t0) * 1000.0, 1)
+    return res
@@ -0,0 +1,106 @@
+"""
+Lazy initialisation + background warmup.
+
+Heavy SDKs (google.genai, SQLAlchemy models, the HTML parser) are not imported
+at module import time. Each one registers a warmer here; warmers run on first
+use or in a background thread right after boot, and /readyz reports which of
+them are warm.
+
+Startup profile:
+    python -m utils.warmup app        # top imports by cumulative time
+"""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_WARMERS: Dict[str, Callable[[], Any]] = {}
+_STATE: Dict[str, Dict[str, Any]] = {}
+_VALUES: Dict[str, Any] = {}
+_LOCKS: Dict[str, threading.Lock] = {}
+_REGISTRY_LOCK = threading.Lock()
+_BOOT = time.time()
+
+
+def register(name: str, fn: Callable[[], Any]) -> None:
+    with _REGISTRY_LOCK:
+        _WARMERS[name] = fn
+        _LOCKS.setdefault(name, threading.Lock())
+        _STATE.setdefault(name, {"warm": False})
+
+
+def get(name: str) -> Any:
+    """
+    Returns the warmer's value, running it once on first use (thread-safe).
+    A failed warmer returns None and is retried on the next call.
+    """
+    st = _STATE.get(name)
+    if st is None:
+        raise KeyError(name)
+    if st["warm"]:
+        return _VALUES.get(name)
+    with _LOCKS[name]:
+        if st["warm"]:
+            return _VALUES.get(name)
+        t0 = time.perf_counter()
+        try:
+            _VALUES[name] = _WARMERS[name]()
+            st.update({"warm": True, "ms": round((time.perf_counter() - t0) * 1000.0, 1), "error": None})
+        except Exception as e:
+            st.update({"warm": False, "error": str(e)[:200]})
+            return None
+    return _VALUES.get(name)
+
+
+def warm_all() -> None:
+    for name in list(_WARMERS):
+        get(name)
+
+
+def start_background() -> threading.Thread:
+    t = threading.Thread(target=warm_all, name="warmup", daemon=True)
+    t.start()
+    return t
+
+
+def state() -> Dict[str, Any]:
+    warmers = {k: dict(v) for k, v in _STATE.items()}
+    return {
+        "warm": all(v["warm"] for v in warmers.values()),
+        "uptime_sec": round(time.time() - _BOOT, 1),
+        "components": warmers,
+    }
+
+
+def import_profile(module: str, top: int = 25) -> List[Tuple[int, int, str]]:
+    """
+    Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+    returns the `top` imports as (cumulative_us, self_us, name).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    rows: List[Tuple[int, int, str]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:") :].split("|")
+        try:
+            self_us, cum_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue
+        rows.append((cum_us, self_us, parts[2].strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+if __name__ == "__main__":
+    mod: Optional[str] = sys.argv[1] if len(sys.argv) > 1 else "app"
+    for cum, own, name in import_profile(mod):
+        print(f"{cum / 1000:9.1f} ms  {own / 1000:8.1f} ms  {name}")
@@ -1,22 +1,386 @@
 from __future__ import annotations
 
-from rq import Worker, Connection
+import json
+import multiprocessing as mp
+import os
+import signal
+import socket
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
 
+from rq import Queue, SimpleWorker, Worker
+from rq.job import Job
+from rq.utils import utcparse
+
+import sic_memory
 from config import settings
-from rq_queue import get_redis  # ✅ renamed module (avoid stdlib queue collision)
+from rq_queue import (  # ✅ renamed module (avoid stdlib queue collision)
+    all_queue_names,
+    get_redis,
+    on_job_started,
+    queue_class_of,
+    queue_slo_report,
+    queue_weights,
+)
+from utils.logging import get_logger
 
 # Ensure the task function is importable for RQ
 import tasks  # noqa: F401
 
+log = get_logger("worker")
+
+# A child that dies sooner than this after spawn is treated as crash-looping.
+_MIN_UPTIME_SEC = 5.0
+_MAX_BACKOFF_SEC = 30.0
+
+
+# -------------------------------
+# Weighted fair dequeue
+# -------------------------------
+
+
+class _WeightedFairMixin:
+    """
+    Smooth weighted round-robin over the queue classes (QUEUE_WEIGHTS): after
+    every dequeue the queue with the highest running credit goes first, so a
+    backlog in one class cannot starve the others. Only queues with waiting
+    jobs take part: an idle queue's credit is reset, so a long quiet spell
+    cannot be cashed in as a back-to-back burst later. Also runs the per-job
+    fairness / SLO hook before the job executes.
+    """
+
+    def reorder_queues(self, reference_queue) -> None:
+        weights = getattr(self, "_wf_weights", None)
+        if weights is None:
+            w = queue_weights()
+            weights = self._wf_weights = {q.name: w[queue_class_of(q.name)] for q in self._ordered_queues}
+            self._wf_credit = dict(weights)
+        p = self.connection.pipeline(transaction=False)
+        for q in self._ordered_queues:
+            p.llen(q.key)
+        waiting = {q.name for q, n in zip(self._ordered_queues, p.execute()) if n}
+        # charge the queue that actually served, then accrue one round of
+        # credit among the queues that are competing for the next dequeue
+        name = getattr(reference_queue, "name", None)
+        if name in self._wf_credit:
+            self._wf_credit[name] -= sum(wt for n, wt in weights.items() if n in waiting or n == name)
+        for n, wt in weights.items():
+            self._wf_credit[n] = self._wf_credit[n] + wt if n in waiting else 0.0
+        self._ordered_queues = sorted(self._ordered_queues, key=lambda q: -self._wf_credit.get(q.name, 0.0))
+
+    def perform_job(self, job, queue) -> bool:
+        try:
+            on_job_started(job, queue)
+        except Exception as e:
+            log.warning("job start hook failed for %s: %s", job.id, e)
+        try:
+            return super().perform_job(job, queue)
+        finally:
+            # a fork-mode work-horse leaves via os._exit: no write-behind
+            # thread or atexit hook gets to write what the job recorded
+            if sic_memory.pending():
+                try:
+                    sic_memory.flush()
+                except Exception as e:
+                    log.warning("sic memory flush failed for %s: %s", job.id, e)
+
+
+class FairWorker(_WeightedFairMixin, Worker):
+    pass
+
+
+class FairSimpleWorker(_WeightedFairMixin, SimpleWorker):
+    pass
+
+
+# -------------------------------
+# Persistent mode
+# -------------------------------
+#
+# rq.Worker forks a work-horse per job, so reflected tables, DB pools and HTTP
+# sessions are rebuilt for every job. In persistent mode each process runs a
+# SimpleWorker (jobs execute in-process) and keeps that state warm; isolation
+# comes from the supervisor, which replaces any process that crashes.
+
+
+def _warm_process_state() -> None:
+    try:
+        info = tasks.warmup()
+        log.info("warm: reflected %s/%s in %sms", info["jobs"], info["packs"], info["took_ms"])
+    except Exception as e:
+        # Not fatal: the first job warms lazily instead.
+        log.warning("warmup failed: %s", e)
+
+    import pipeline
+    from utils import warmup
+
+    pipeline.http_session()
+    # lazily-loaded SDKs / parsers registered with utils.warmup
+    warmup.warm_all()
+
+
+def _run_persistent(slot: int, queues: List[str]) -> None:
+    # drop the supervisor's handlers inherited through fork; rq installs its own
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    redis_conn = get_redis(decode_responses=False)
+    if not redis_conn:
+        raise RuntimeError("REDIS_URL is not set. Worker cannot start.")
+
+    _warm_process_state()
+    w = FairSimpleWorker(queues, connection=redis_conn)
+    w.work(
+        # one scheduler per node is enough
+        with_scheduler=(slot == 0),
+        max_jobs=int(settings.WORKER_MAX_JOBS or 0) or None,
+    )
+
+
+def _decode(v) -> str:
+    if isinstance(v, bytes):
+        return v.decode("utf-8", "replace")
+    return v or ""
 
-def main():
-    redis_conn = get_redis()
+
+def sample_queues(redis_conn, queues: List[str]) -> Dict[str, float]:
+    """
+    Queue depth (sum) and age of the oldest waiting job (max) across `queues`.
+    """
+    depth = 0
+    oldest_age = 0.0
+    now = datetime.now(timezone.utc)
+    for name in queues:
+        q = Queue(name, connection=redis_conn)
+        depth += q.count
+        head = redis_conn.lindex(q.key, 0)
+        if not head:
+            continue
+        enq = _decode(redis_conn.hget(Job.key_for(_decode(head)), "enqueued_at"))
+        if enq:
+            try:
+                oldest_age = max(oldest_age, (now - utcparse(enq)).total_seconds())
+            except ValueError:
+                pass
+    return {"depth": float(depth), "oldest_age_sec": oldest_age}
+
+
+class WorkerSupervisor:
+    """
+    Keeps between `min_size` and `max_size` persistent worker processes alive.
+    Scales on queue depth / oldest job age and drains everything on SIGTERM.
+    min_size == max_size gives a fixed pool.
+    """
+
+    def __init__(self, queues: List[str], min_size: int, max_size: Optional[int] = None) -> None:
+        self.queues = queues
+        self.min_size = max(1, int(min_size))
+        self.max_size = max(self.min_size, int(max_size or min_size))
+        self.target = self.min_size
+        self.procs: Dict[int, mp.Process] = {}
+        self.started_at: Dict[int, float] = {}
+        self.backoff: Dict[int, float] = {}
+        self.respawn_at: Dict[int, float] = {}  # slot -> monotonic time of its delayed respawn
+        self.retiring: Dict[int, mp.Process] = {}  # pid -> process finishing its last job
+        self.stopping = False
+        self.last_busy = time.monotonic()
+        self.last_sample: Dict[str, float] = {}
+        self._work_time: Dict[int, Tuple[float, float]] = {}
+        self.utilization: Dict[int, float] = {}
+        self.slo: Dict[str, object] = {}
+
+    def _spawn(self, slot: int) -> None:
+        p = mp.Process(target=_run_persistent, args=(slot, self.queues), name=f"rq-persistent-{slot}", daemon=False)
+        p.start()
+        self.procs[slot] = p
+        self.started_at[slot] = time.monotonic()
+        self.respawn_at.pop(slot, None)
+        log.info("spawned slot=%s pid=%s", slot, p.pid)
+
+    def _reap(self) -> None:
+        for pid, p in list(self.retiring.items()):
+            if not p.is_alive():
+                p.join(timeout=0)
+                del self.retiring[pid]
+
+        now = time.monotonic()
+        for slot, p in list(self.procs.items()):
+            if p.is_alive():
+                continue
+            p.join(timeout=0)
+            uptime = now - self.started_at.get(slot, 0.0)
+            del self.procs[slot]
+            if self.stopping or slot >= self.target:
+                continue
+
+            if p.exitcode == 0:
+                # clean exit (max_jobs recycle)
+                self.backoff.pop(slot, None)
+            else:
+                log.warning("slot=%s pid=%s died exitcode=%s uptime=%.1fs", slot, p.pid, p.exitcode, uptime)
+                if uptime < _MIN_UPTIME_SEC:
+                    # crash loop: respawn this slot later; the other slots are
+                    # still reaped and the pool still scaled meanwhile
+                    delay = min(_MAX_BACKOFF_SEC, self.backoff.get(slot, 0.5) * 2)
+                    self.backoff[slot] = delay
+                    self.respawn_at[slot] = now + delay
+                    log.warning("slot=%s respawn in %.1fs", slot, delay)
+                else:
+                    self.backoff.pop(slot, None)
+
+        if self.stopping:
+            return
+        for slot in range(self.target):
+            if slot not in self.procs and self.respawn_at.get(slot, 0.0) <= now:
+                self._spawn(slot)
+
+    def desired_size(self, depth: float, oldest_age_sec: float) -> int:
+        current = self.target
+        per_proc = max(1, int(settings.WORKER_SCALE_UP_DEPTH or 1))
+        want = -(-int(depth) // per_proc)  # ceil
+        if oldest_age_sec > float(settings.WORKER_SCALE_UP_AGE_SEC or 0) > 0:
+            want = max(want, current + 1)
+
+        now = time.monotonic()
+        if depth > 0:
+            self.last_busy = now
+        if want < current:
+            # shrink one step at a time, and only after a quiet period
+            if now - self.last_busy < float(settings.WORKER_SCALE_DOWN_IDLE_SEC or 0):
+                want = current
+            else:
+                want = current - 1
+        return max(self.min_size, min(self.max_size, want))
+
+    def _scale_to(self, n: int) -> None:
+        if n == self.target:
+            return
+        log.info("scale %s -> %s (%s)", self.target, n, self.last_sample)
+        old = self.target
+        self.target = n
+        for slot in range(old, n):
+            if slot not in self.procs:
+                self._spawn(slot)
+        for slot in range(n, old):
+            self.respawn_at.pop(slot, None)
+            p = self.procs.pop(slot, None)
+            if p is not None and p.is_alive():
+                # warm shutdown: the process finishes its current job first;
+                # keyed by pid, the slot may retire again before this one exits
+                p.terminate()
+                self.retiring[p.pid] = p
+
+    def _sample_utilization(self, redis_conn) -> None:
+        """
+        Fraction of wall time each process spent on jobs since the last sample,
+        from rq's per-worker total_working_time.
+        """
+        try:
+            workers = {w.pid: w for w in Worker.all(connection=redis_conn)}
+        except Exception:
+            return
+        now = time.monotonic()
+        util: Dict[int, float] = {}
+        for slot, p in self.procs.items():
+            w = workers.get(p.pid)
+            if w is None:
+                continue
+            busy = float(getattr(w, "total_working_time", 0.0) or 0.0)
+            prev = self._work_time.get(p.pid)
+            self._work_time[p.pid] = (now, busy)
+            if prev and now > prev[0]:
+                util[slot] = round(max(0.0, min(1.0, (busy - prev[1]) / (now - prev[0]))), 3)
+        self.utilization = util
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "target": self.target,
+            "min": self.min_size,
+            "max": self.max_size,
+            "alive": sum(1 for p in self.procs.values() if p.is_alive()),
+            "retiring": len(self.retiring),
+            "queues": self.queues,
+            "sample": self.last_sample,
+            "utilization": {str(self.procs[s].pid): u for s, u in self.utilization.items() if s in self.procs},
+            "slo": self.slo,
+        }
+
+    def _publish(self, redis_conn) -> None:
+        key = f"dominator:supervisor:{socket.gethostname()}:{os.getpid()}"
+        try:
+            redis_conn.set(key, json.dumps(self.stats()), ex=max(30, int(settings.WORKER_SCALE_INTERVAL_SEC) * 3))
+        except Exception:
+            pass
+
+    def _on_term(self, signum, frame) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        log.info("signal %s: draining %s worker(s)", signum, len(self.procs))
+        for p in list(self.procs.values()) + list(self.retiring.values()):
+            if p.is_alive():
+                # rq treats the first SIGTERM as a warm shutdown (finish current job)
+                p.terminate()
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._on_term)
+        signal.signal(signal.SIGINT, self._on_term)
+
+        redis_conn = get_redis(decode_responses=False)
+        interval = max(1.0, float(settings.WORKER_SCALE_INTERVAL_SEC or 5))
+        next_sample = 0.0
+
+        for slot in range(self.target):
+            self._spawn(slot)
+
+        while not self.stopping:
+            self._reap()
+            if redis_conn is not None and time.monotonic() >= next_sample:
+                next_sample = time.monotonic() + interval
+                try:
+                    self.last_sample = sample_queues(redis_conn, self.queues)
+                    if self.max_size > self.min_size:
+                        self._scale_to(self.desired_size(**self.last_sample))
+                    self._sample_utilization(redis_conn)
+                    self.slo = queue_slo_report(redis_conn)
+                    self._publish(redis_conn)
+                except Exception as e:
+                    log.warning("autoscale sample failed: %s", e)
+            time.sleep(1.0)
+
+        deadline = time.monotonic() + settings.MODEL_TIMEOUT_SEC * 4
+        for p in list(self.procs.values()) + list(self.retiring.values()):
+            p.join(timeout=max(0.0, deadline - time.monotonic()))
+            if p.is_alive():
+                p.kill()
+                p.join()
+        log.info("supervisor stopped")
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    redis_conn = get_redis(decode_responses=False)
     if not redis_conn:
         raise RuntimeError("REDIS_URL is not set. Worker cannot start.")
 
-    with Connection(redis_conn):
-        w = Worker([settings.QUEUE_NAME])
-        w.work(with_scheduler=True)
+    # start (or join) the periodic trends refresh chain on the batch queue
+    from services.trends_cache import request_refresh
+
+    request_refresh()
+
+    # `python worker.py autoscale` overrides WORKER_MODE
+    mode = (argv[0] if argv else settings.WORKER_MODE or "fork").strip().lower()
+    if mode == "persistent":
+        WorkerSupervisor(all_queue_names(), settings.MAX_CONCURRENT_JOBS).run()
+        return
+    if mode == "autoscale":
+        WorkerSupervisor(all_queue_names(), settings.WORKER_MIN_PROCS, settings.WORKER_MAX_PROCS).run()
+        return
+
+    w = FairWorker(all_queue_names(), connection=redis_conn)
+    w.work(with_scheduler=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,271 @@
+# wpil_batch.py
+# WPIL Batch Pipeline (see WPIL_PIPELINE_BLUEPRINT.md)
+# Raw public-post dumps (JSONL / CSV) -> engagement-filtered structural patterns
+#
+#   python wpil_batch.py posts.jsonl [--dry-run] [--centroids]
+#
+# Pass 1 streams the dump in chunks, computes decayed engagement scores
+# (NumPy, per chunk) and keeps only the float32 scores per platform / niche:
+# enough for exact platform medians and per-niche caps.
+# Pass 2 streams it again, keeps posts scoring above their platform median and
+# within their niche's top WPIL_MAX_POSTS_PER_NICHE (at most that many posts
+# per niche are held in memory), then extracts structural patterns per niche
+# in a process pool (wpil_features) and writes each niche through
+# wpil_ingest.replace_niche_patterns, so a rerun replaces the niche's earlier
+# batch / centroid patterns instead of adding to them. With --centroids only
+# one pattern per (platform, niche, intent) is written: the niche centroid.
+# Niches with fewer than WPIL_MIN_POSTS_PER_NICHE posts are skipped.
+
+import csv
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from wpil_features import extract_by_niche, niche_centroids
+from wpil_ingest import replace_niche_patterns
+
+MIN_POSTS_PER_NICHE = int(os.getenv("WPIL_MIN_POSTS_PER_NICHE", "300"))
+MAX_POSTS_PER_NICHE = int(os.getenv("WPIL_MAX_POSTS_PER_NICHE", "1000"))
+DECAY_HALF_LIFE_DAYS = float(os.getenv("WPIL_DECAY_HALF_LIFE_DAYS", "7"))
+CHUNK_SIZE = 5000
+WORKERS = int(os.getenv("WPIL_WORKERS", "0"))  # 0 = one per CPU
+
+# likes, comments, reposts/shares
+METRIC_WEIGHTS = np.array([1.0, 2.0, 3.0], dtype=np.float64)
+
+_PLATFORM_ALIASES = {"twitter": "x", "x.com": "x", "linked_in": "linkedin"}
+
+
+# -------------------------------
+# Reading / normalization
+# -------------------------------
+
+
+def _parse_ts(v) -> float:
+    if v is None or v == "":
+        return float("nan")
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        pass
+    try:
+        dt = datetime.fromisoformat(str(v).replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
+    except ValueError:
+        return float("nan")
+
+
+def _num(v) -> float:
+    try:
+        return float(v or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def normalize_post(raw: Dict) -> Optional[Dict]:
+    """
+    Blueprint section 4 shape, plus published_ts (epoch seconds) and the
+    source post_id when the dump has one.
+    """
+    platform = str(raw.get("platform") or "").strip().lower()
+    platform = _PLATFORM_ALIASES.get(platform, platform)
+    niche = str(raw.get("niche") or "").strip()
+    text = raw.get("raw_text") or raw.get("text") or ""
+    if not platform or not niche or not text:
+        return None
+    m = raw.get("metrics") if isinstance(raw.get("metrics"), dict) else raw
+    return {
+        "platform": platform,
+        "niche": niche,
+        "raw_text": str(text),
+        "metrics": {
+            "likes": _num(m.get("likes")),
+            "comments": _num(m.get("comments")),
+            "shares": _num(m.get("shares", m.get("reposts"))),
+        },
+        "published_ts": _parse_ts(raw.get("published_at") or raw.get("created_at")),
+        "post_id": str(raw.get("id") or raw.get("post_id") or raw.get("url") or "") or None,
+    }
+
+
+def _raw_rows(path: str) -> Iterator[Dict]:
+    if path.lower().endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def read_posts(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[List[Dict]]:
+    chunk: List[Dict] = []
+    for raw in _raw_rows(path):
+        post = normalize_post(raw)
+        if post is None:
+            continue
+        chunk.append(post)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# -------------------------------
+# Scoring
+# -------------------------------
+
+
+def raw_scores(posts: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (log1p(weighted likes/comments/shares), published_ts) per post.
+    """
+    n = len(posts)
+    metrics = np.empty((n, 3), dtype=np.float64)
+    ts = np.empty(n, dtype=np.float64)
+    for i, p in enumerate(posts):
+        m = p["metrics"]
+        metrics[i] = (m["likes"], m["comments"], m["shares"])
+        ts[i] = p["published_ts"]
+    return np.log1p(np.clip(metrics, 0, None) @ METRIC_WEIGHTS), ts
+
+
+def decay(raw: np.ndarray, ts: np.ndarray, now: float) -> np.ndarray:
+    """
+    raw x 0.5^(age_days / half-life); posts without a timestamp get no decay.
+    """
+    age_days = np.nan_to_num(np.clip((now - ts) / 86400.0, 0, None), nan=0.0)
+    return (raw * np.power(0.5, age_days / DECAY_HALF_LIFE_DAYS)).astype(np.float32)
+
+
+def engagement_scores(posts: List[Dict], now: float) -> np.ndarray:
+    raw, ts = raw_scores(posts)
+    return decay(raw, ts, now)
+
+
+def _collect_scores(path: str, now: float) -> Tuple[Dict[str, np.ndarray], Dict[Tuple[str, str], np.ndarray], int]:
+    by_platform: Dict[str, List[np.ndarray]] = {}
+    by_niche: Dict[Tuple[str, str], List[np.ndarray]] = {}
+    total = 0
+    for chunk in read_posts(path):
+        scores = engagement_scores(chunk, now)
+        total += len(chunk)
+        keys = [(p["platform"], p["niche"]) for p in chunk]
+        plats = np.array([k[0] for k in keys], dtype=object)
+        for plat in set(plats):
+            by_platform.setdefault(plat, []).append(scores[plats == plat])
+        order: Dict[Tuple[str, str], List[int]] = {}
+        for i, k in enumerate(keys):
+            order.setdefault(k, []).append(i)
+        for k, idx in order.items():
+            by_niche.setdefault(k, []).append(scores[idx])
+    return (
+        {k: np.concatenate(v) for k, v in by_platform.items()},
+        {k: np.concatenate(v) for k, v in by_niche.items()},
+        total,
+    )
+
+
+def _thresholds(path: str, now: float) -> Tuple[Dict[str, float], Dict[Tuple[str, str], float], Dict]:
+    plat_scores, niche_scores, total = _collect_scores(path, now)
+    medians = {k: float(np.median(v)) for k, v in plat_scores.items()}
+
+    # a post qualifies when score > platform median and it is within the
+    # niche's top MAX_POSTS_PER_NICHE qualifying posts
+    cutoffs: Dict[Tuple[str, str], float] = {}
+    skipped: Dict[str, int] = {}
+    for (plat, niche), s in niche_scores.items():
+        if len(s) < MIN_POSTS_PER_NICHE:
+            skipped[f"{plat}/{niche}"] = int(len(s))
+            continue
+        above = s[s > medians[plat]]
+        if len(above) == 0:
+            continue
+        if len(above) > MAX_POSTS_PER_NICHE:
+            cutoffs[(plat, niche)] = float(np.partition(above, -MAX_POSTS_PER_NICHE)[-MAX_POSTS_PER_NICHE])
+        else:
+            cutoffs[(plat, niche)] = float(np.nextafter(np.float32(medians[plat]), np.float32(np.inf)))
+    return medians, cutoffs, {"posts": total, "skipped_small_niches": skipped}
+
+
+# -------------------------------
+# Run
+# -------------------------------
+
+
+def run_batch(path: str, now: Optional[float] = None, dry_run: bool = False, centroids: bool = False) -> Dict:
+    t0 = time.perf_counter()
+    now = float(now or time.time())
+    batch_id = uuid.uuid4().hex[:12]
+
+    medians, cutoffs, report = _thresholds(path, now)
+
+    groups: Dict[Tuple[str, str], List[Dict]] = {}
+    for chunk in read_posts(path):
+        scores = engagement_scores(chunk, now)
+        for post, score in zip(chunk, scores):
+            key = (post["platform"], post["niche"])
+            cut = cutoffs.get(key)
+            if cut is None or score < cut:
+                continue
+            group = groups.setdefault(key, [])
+            if len(group) >= MAX_POSTS_PER_NICHE:
+                continue  # ties at the cutoff
+            post["engagement_score"] = round(float(score), 4)
+            group.append(post)
+
+    t1 = time.perf_counter()
+    by_niche = extract_by_niche(groups, WORKERS)
+    source = "centroid" if centroids else "batch"
+    per_niche: Dict[Tuple[str, str], List[Dict]] = {}
+    for key in sorted(by_niche):
+        patterns = niche_centroids(by_niche[key]) if centroids else by_niche[key]
+        for p in patterns:
+            p.update({"source": source, "batch_id": batch_id})
+        per_niche[key] = patterns
+    extract_sec = time.perf_counter() - t1
+
+    written = sum(len(v) for v in per_niche.values())
+    if not dry_run:
+        # one retire + append per niche; niches this run did not derive keep
+        # their patterns
+        written = sum(replace_niche_patterns(plat, niche, patterns) for (plat, niche), patterns in per_niche.items())
+
+    elapsed = time.perf_counter() - t0
+    report.update(
+        {
+            "batch_id": batch_id,
+            "dry_run": dry_run,
+            "centroids": centroids,
+            "platform_medians": {k: round(v, 4) for k, v in medians.items()},
+            "patterns": written,
+            "kept_per_niche": {f"{k[0]}/{k[1]}": len(v) for k, v in sorted(groups.items())},
+            "extract_sec": round(extract_sec, 2),
+            "elapsed_sec": round(elapsed, 2),
+            "posts_per_min": int(report["posts"] / elapsed * 60) if elapsed > 0 else None,
+        }
+    )
+    return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python wpil_batch.py <posts.jsonl|posts.csv> [--dry-run] [--centroids]")
+        sys.exit(2)
+    flags = sys.argv[2:]
+    print(json.dumps(run_batch(sys.argv[1], dry_run="--dry-run" in flags, centroids="--centroids" in flags), ensure_ascii=False, indent=2))
@@ -0,0 +1,213 @@
+# wpil_features.py
+# Structural Feature Extraction
+# Turns raw winning posts into abstract patterns (hook / structure / cta / intent)
+# and aggregates them into per-niche centroids. The text itself never leaves
+# this module.
+#
+# Splitting is Arabic-aware: lines, then sentences on . ! ? … and the Arabic
+# ؟ ؛ (not on decimals like 3.5), with bullets / list markers stripped.
+# Hook and CTA cues are matched on normalized text (utils.text) in English
+# and Arabic.
+
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from utils.text import normalize_text
+
+_LINE_SPLIT = re.compile(r"\n+")
+# sentence ends need trailing whitespace, so "3.5" or "example.com" never split
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?؟؛…])\s+")
+_BULLET = re.compile(r"^\s*(?:[-•*▪►✅✔👉→]+\s*|[0-9٠-٩]+[.)\-]\s+|\([0-9٠-٩]+\)\s*)")
+_NUMBERED = re.compile(r"^\s*(?:[0-9٠-٩]+[.)\-]\s|\([0-9٠-٩]+\)|[-•*▪►✅✔👉→])")
+_WORD = re.compile(r"\w+", re.UNICODE)
+_QUESTION_END = re.compile(r"[?؟]\s*\W*$")
+
+# cue words (normalized: casefolded, Arabic letter variants folded)
+_HOOK_CUES: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("contrarian", ("stop ", "unpopular opinion", "nobody tells you", "is dead", "توقف", "الخطا", "لا احد يخبرك", "انتهي عصر")),
+    ("how_why", ("how ", "why ", "what ", "كيف ", "لماذا ", "لماذا", "ما الذي", "ماذا ")),
+    ("personal_story", ("i ", "i'm ", "my ", "when i ", "last year", "انا ", "كنت ", "عندما ", "قبل سنه", "في العام الماضي")),
+    ("number_list", ()),
+    ("bold_claim", ()),
+)
+_CTA_ACTION = ("comment", "share", "follow", "save", "repost", "dm me", "subscribe",
+               "علق", "شارك", "تابع", "احفظ", "اكتب", "راسلني", "اشترك")
+_CTA_LINK = ("link in", "link below", "الرابط", "في البايو", "in bio")
+_PROBLEM = ("mistake", "fail", "problem", "wrong", "stop", "الخطا", "يفشل", "مشكله", "خطا", "توقف")
+
+
+def split_lines(text: str) -> List[str]:
+    """
+    Non-empty lines, then sentences within each line; list markers stripped.
+    """
+    out: List[str] = []
+    for line in _LINE_SPLIT.split(text or ""):
+        for sent in _SENTENCE_SPLIT.split(line.strip()):
+            s = _BULLET.sub("", sent).strip()
+            if s and _WORD.search(s):
+                out.append(s)
+    return out
+
+
+def classify_hook(first: str) -> str:
+    if _QUESTION_END.search(first):
+        return "question"
+    if re.match(r"^\s*[0-9٠-٩]+", first):
+        return "number_list"
+    f = normalize_text(first) + " "
+    for kind, cues in _HOOK_CUES:
+        if cues and any(f.startswith(c) or (kind == "contrarian" and c in f) for c in cues):
+            return kind
+    return "bold_claim"
+
+
+def detect_cta(lines: List[str]) -> Dict[str, str]:
+    """
+    CTA type (question / action / link / curiosity / none) and position
+    (final_line / body / none), looking at the last two lines first.
+    """
+    if not lines:
+        return {"type": "none", "position": "none"}
+    tail = lines[-2:]
+    for pos, line in ((len(lines) - len(tail) + i, l) for i, l in enumerate(tail)):
+        n = normalize_text(line)
+        position = "final_line" if pos == len(lines) - 1 else "body"
+        if any(c in n for c in _CTA_LINK):
+            return {"type": "link", "position": position}
+        if any(c in n for c in _CTA_ACTION):
+            return {"type": "action", "position": position}
+    if _QUESTION_END.search(lines[-1]) and len(lines) > 1:
+        return {"type": "question", "position": "final_line"}
+    return {"type": "curiosity", "position": "final_line"}
+
+
+def _narrative_arc(raw_lines: List[str], lines: List[str], hook_type: str) -> str:
+    if sum(1 for l in raw_lines if _NUMBERED.match(l)) >= 3:
+        return "list"
+    if hook_type == "personal_story":
+        return "story_to_lesson"
+    if hook_type in ("contrarian", "question") or any(p in normalize_text(lines[0]) for p in _PROBLEM):
+        return "problem_to_insight"
+    return "claim_to_proof"
+
+
+def _intent(hook_type: str, cta_type: str, arc: str) -> str:
+    if cta_type == "question" or hook_type == "question":
+        return "engagement"
+    if arc == "list" or hook_type in ("number_list", "how_why"):
+        return "education"
+    if arc == "story_to_lesson":
+        return "story"
+    return "authority"
+
+
+def extract_pattern(post: Dict) -> Dict:
+    """
+    Abstract structural pattern for one normalized post
+    ({"platform", "niche", "raw_text", ...}).
+    """
+    text = post.get("raw_text") or ""
+    raw_lines = [l for l in _LINE_SPLIT.split(text) if l.strip()]
+    lines = split_lines(text) or [""]
+    words = [len(_WORD.findall(l)) for l in lines]
+    avg = sum(words) / max(1, len(words))
+    per_line = len(lines) / max(1, len(raw_lines))
+
+    hook_type = classify_hook(lines[0])
+    cta = detect_cta(lines)
+    arc = _narrative_arc(raw_lines, lines, hook_type)
+    return {
+        "platform": post["platform"],
+        "niche": post["niche"],
+        "intent": _intent(hook_type, cta["type"], arc),
+        "hook": {"type": hook_type, "max_words": max(4, words[0])},
+        "structure": {
+            "line_density": "one_idea_per_line" if per_line <= 1.3 else "dense",
+            "sentence_length": "short" if avg <= 12 else "medium" if avg <= 22 else "long",
+            "narrative_arc": arc,
+            "lines": len(lines),
+            "avg_sentence_words": round(avg, 1),
+        },
+        "cta": cta,
+    }
+
+
+# -------------------------------
+# Parallel extraction + centroids
+# -------------------------------
+
+
+def _extract_group(posts: List[Dict]) -> List[Dict]:
+    out = []
+    for p in posts:
+        pattern = extract_pattern(p)
+        if "engagement_score" in p:
+            pattern["engagement_score"] = p["engagement_score"]
+        out.append(pattern)
+    return out
+
+
+def extract_by_niche(groups: Dict[Tuple[str, str], List[Dict]], workers: int = 0) -> Dict[Tuple[str, str], List[Dict]]:
+    """
+    {(platform, niche): posts} -> {(platform, niche): patterns}, one process
+    pool task per niche. Small inputs (or workers=1) run inline.
+    """
+    total = sum(len(v) for v in groups.values())
+    workers = workers or min(len(groups), os.cpu_count() or 1)
+    if workers <= 1 or total < 2000:
+        return {k: _extract_group(v) for k, v in groups.items()}
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = {k: ex.submit(_extract_group, v) for k, v in groups.items()}
+        return {k: f.result() for k, f in futures.items()}
+
+
+def _mode(values: Iterable[str]) -> str:
+    # most frequent; ties broken by name so centroids are deterministic
+    c = Counter(values)
+    return min(c.items(), key=lambda kv: (-kv[1], kv[0]))[0]
+
+
+def niche_centroids(patterns: List[Dict], min_support: int = 5) -> List[Dict]:
+    """
+    One centroid per (platform, niche, intent): categorical features take the
+    (engagement-unweighted) mode, numeric ones the median; `support` is how
+    many patterns it summarizes.
+    """
+    groups: Dict[Tuple[str, str, str], List[Dict]] = {}
+    for p in patterns:
+        groups.setdefault((p["platform"], p["niche"], p["intent"]), []).append(p)
+
+    out = []
+    for (platform, niche, intent), ps in sorted(groups.items()):
+        if len(ps) < min_support:
+            continue
+        num = np.array(
+            [(p["hook"]["max_words"], p["structure"]["lines"], p["structure"]["avg_sentence_words"]) for p in ps],
+            dtype=np.float64,
+        )
+        med = np.median(num, axis=0)
+        eng = [p["engagement_score"] for p in ps if "engagement_score" in p]
+        out.append(
+            {
+                "platform": platform,
+                "niche": niche,
+                "intent": intent,
+                "hook": {"type": _mode(p["hook"]["type"] for p in ps), "max_words": int(round(med[0]))},
+                "structure": {
+                    "line_density": _mode(p["structure"]["line_density"] for p in ps),
+                    "sentence_length": _mode(p["structure"]["sentence_length"] for p in ps),
+                    "narrative_arc": _mode(p["structure"]["narrative_arc"] for p in ps),
+                    "lines": int(round(med[1])),
+                    "avg_sentence_words": round(float(med[2]), 1),
+                },
+                "cta": {"type": _mode(p["cta"]["type"] for p in ps), "position": _mode(p["cta"]["position"] for p in ps)},
+                "support": len(ps),
+                "engagement_score": round(float(np.mean(eng)), 4) if eng else None,
+            }
+        )
+    return out
@@ -0,0 +1,306 @@
+# wpil_incremental.py
+# Incremental WPIL recomputation (see WPIL_PIPELINE_BLUEPRINT.md)
+#
+#   python wpil_incremental.py posts.jsonl [--dry-run] [--centroids]
+#
+# Same selection rules as wpil_batch (score > platform median, top
+# WPIL_MAX_POSTS_PER_NICHE per niche, niches under WPIL_MIN_POSTS_PER_NICHE
+# skipped) but state is kept between runs in WPIL_STATE_DIR:
+#
+#   watermarks.json        per (platform, niche): watermark (newest
+#                          published_ts ingested), post count, fingerprint
+#                          of the published selection, last batch_id
+#   <niche>.npz            per retained post: key, raw score, published_ts,
+#                          extracted pattern (JSON)
+#
+# A run streams the dump once. Posts older than their niche's watermark, or
+# whose key is already held, are skipped without extraction; new posts are
+# scored and their structural pattern extracted once (wpil_features, process
+# pool). Posts older than WPIL_RETENTION_DAYS expire.
+#
+# Decay multiplies every score by the same factor as time passes, so the
+# ranking within a niche (and against its platform median) only changes
+# when posts arrive or expire. The platform medians are recomputed from the
+# stored raw scores; a niche is republished only when its selected set
+# differs from the last run, via one wpil_ingest.replace_niche_patterns
+# append per niche. Late posts older than a niche's watermark are ignored.
+#
+# --dry-run reports which niches would change (and why) without writing.
+
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from wpil_batch import MAX_POSTS_PER_NICHE, MIN_POSTS_PER_NICHE, WORKERS, decay, raw_scores, read_posts
+from wpil_features import extract_by_niche, niche_centroids
+from wpil_ingest import replace_niche_patterns
+
+STATE_DIR = os.getenv("WPIL_STATE_DIR", "wpil_state")
+RETENTION_DAYS = float(os.getenv("WPIL_RETENTION_DAYS", "28"))
+WATERMARKS_FILE = "watermarks.json"
+
+NicheKey = Tuple[str, str]
+
+
+# -------------------------------
+# State
+# -------------------------------
+
+
+def _post_key(post: Dict) -> np.uint64:
+    ident = post.get("post_id") or f"{post['published_ts']}\x00{post['raw_text']}"
+    h = hashlib.blake2b(f"{post['platform']}\x00{post['niche']}\x00{ident}".encode("utf-8"), digest_size=8)
+    return np.frombuffer(h.digest(), dtype=np.uint64)[0]
+
+
+def _niche_file(key: NicheKey) -> str:
+    return hashlib.sha1(f"{key[0]}/{key[1]}".encode("utf-8")).hexdigest()[:16] + ".npz"
+
+
+class _NicheState:
+    def __init__(self, key: NicheKey, meta: Optional[Dict] = None) -> None:
+        self.key = key
+        self.meta = dict(meta or {})
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.raw = np.empty(0, dtype=np.float32)
+        self.ts = np.empty(0, dtype=np.float64)
+        self.patterns = np.empty(0, dtype=str)
+        self.held: set = set()
+        self.new_posts = 0
+        self.expired = 0
+
+    @property
+    def watermark(self) -> float:
+        return float(self.meta.get("watermark", -math.inf))
+
+    def load(self) -> "_NicheState":
+        path = os.path.join(STATE_DIR, _niche_file(self.key))
+        if os.path.exists(path):
+            with np.load(path, allow_pickle=False) as z:
+                self.keys, self.raw, self.ts, self.patterns = z["keys"], z["raw"], z["ts"], z["patterns"]
+        self.held = set(self.keys.tolist())
+        return self
+
+    def save(self) -> None:
+        path = os.path.join(STATE_DIR, _niche_file(self.key))
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp, keys=self.keys, raw=self.raw, ts=self.ts, patterns=self.patterns)
+        os.replace(tmp, path)
+
+    def add(self, keys: np.ndarray, raw: np.ndarray, ts: np.ndarray, patterns: List[str]) -> None:
+        self.keys = np.concatenate([self.keys, keys])
+        self.raw = np.concatenate([self.raw, raw.astype(np.float32)])
+        self.ts = np.concatenate([self.ts, ts])
+        self.patterns = np.concatenate([self.patterns, np.array(patterns, dtype=str)]) if len(self.patterns) else np.array(patterns, dtype=str)
+        self.held.update(keys.tolist())
+        self.new_posts += len(keys)
+        finite = ts[np.isfinite(ts)]
+        if len(finite):
+            self.meta["watermark"] = max(self.watermark, float(finite.max()))
+
+    def expire(self, cutoff_ts: float) -> None:
+        keep = self.ts >= cutoff_ts
+        self.expired = int(len(keep) - keep.sum())
+        if self.expired:
+            self.keys, self.raw, self.ts, self.patterns = self.keys[keep], self.raw[keep], self.ts[keep], self.patterns[keep]
+            self.held = set(self.keys.tolist())
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.new_posts or self.expired)
+
+
+def _load_watermarks() -> Dict[str, Dict]:
+    try:
+        with open(os.path.join(STATE_DIR, WATERMARKS_FILE), "r", encoding="utf-8") as f:
+            return json.load(f).get("niches", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_watermarks(niches: Dict[str, Dict], now: float) -> None:
+    path = os.path.join(STATE_DIR, WATERMARKS_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"updated_at": now, "niches": niches}, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _load_states() -> Dict[NicheKey, _NicheState]:
+    states = {}
+    for name, meta in _load_watermarks().items():
+        key = (meta["platform"], meta["niche"])
+        states[key] = _NicheState(key, meta).load()
+    return states
+
+
+# -------------------------------
+# Ingest new posts
+# -------------------------------
+
+
+def _ingest_new(path: str, states: Dict[NicheKey, _NicheState], now: float) -> Dict[str, int]:
+    """
+    Streams the dump and adds unseen posts (score + pattern) to `states`.
+    """
+    oldest = now - RETENTION_DAYS * 86400.0
+    marks = {k: st.watermark for k, st in states.items()}  # as of the last run, not this one
+    seen = old = 0
+    for chunk in read_posts(path):
+        raw, ts = raw_scores(chunk)
+        groups: Dict[NicheKey, List[int]] = {}
+        for i, post in enumerate(chunk):
+            key = (post["platform"], post["niche"])
+            st = states.get(key)
+            t = ts[i]
+            if not math.isnan(t) and t < oldest:
+                old += 1
+                continue
+            if not math.isnan(t) and t < marks.get(key, -math.inf):
+                seen += 1
+                continue
+            k = _post_key(post)
+            if st is not None and int(k) in st.held:
+                seen += 1
+                continue
+            if st is None:
+                st = states[key] = _NicheState(key, {"platform": key[0], "niche": key[1]})
+            st.held.add(int(k))  # duplicates inside the dump
+            post["_key"] = k
+            groups.setdefault(key, []).append(i)
+
+        if not groups:
+            continue
+        extracted = extract_by_niche({k: [chunk[i] for i in idx] for k, idx in groups.items()}, WORKERS)
+        for key, idx in groups.items():
+            # posts without a timestamp are dated at first sight so they decay and expire
+            t = np.where(np.isnan(ts[idx]), now, ts[idx])
+            keys = np.array([chunk[i]["_key"] for i in idx], dtype=np.uint64)
+            pats = [json.dumps(p, ensure_ascii=False, separators=(",", ":")) for p in extracted[key]]
+            states[key].add(keys, raw[idx], t, pats)
+    return {"already_seen": seen, "too_old": old}
+
+
+# -------------------------------
+# Selection
+# -------------------------------
+
+
+def _selection(st: _NicheState, median: float, now: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (positions, decayed scores) of the niche's published posts, best first.
+    """
+    scores = decay(st.raw, st.ts, now)
+    pos = np.flatnonzero(scores > median)
+    # highest score first, ties by key so the selection is stable between runs
+    pos = pos[np.lexsort((st.keys[pos], -scores[pos]))][:MAX_POSTS_PER_NICHE]
+    return pos, scores[pos]
+
+
+def _fingerprint(keys: np.ndarray) -> str:
+    return hashlib.sha1(np.sort(keys).tobytes()).hexdigest()[:16] if len(keys) else ""
+
+
+def run_incremental(path: str, now: Optional[float] = None, dry_run: bool = False, centroids: bool = False) -> Dict:
+    t0 = time.perf_counter()
+    now = float(now or time.time())
+    batch_id = uuid.uuid4().hex[:12]
+    os.makedirs(STATE_DIR, exist_ok=True)
+
+    states = _load_states()
+    report: Dict = _ingest_new(path, states, now)
+    for st in states.values():
+        st.expire(now - RETENTION_DAYS * 86400.0)
+
+    by_platform: Dict[str, List[np.ndarray]] = {}
+    for (plat, _), st in states.items():
+        by_platform.setdefault(plat, []).append(decay(st.raw, st.ts, now))
+    medians = {p: float(np.median(np.concatenate(v))) if sum(len(a) for a in v) else 0.0 for p, v in by_platform.items()}
+
+    niches: Dict[str, Dict] = {}
+    written = 0
+    for key in sorted(states):
+        st = states[key]
+        name = f"{key[0]}/{key[1]}"
+        small = len(st.keys) < MIN_POSTS_PER_NICHE
+        pos, scores = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) if small else _selection(st, medians[key[0]], now)
+        fp = _fingerprint(st.keys[pos])
+        changed = fp != st.meta.get("published", "")
+
+        if small and not st.meta.get("published"):
+            status, changed = "skipped_small", False
+        elif not changed:
+            status = "unchanged"
+        elif small:
+            status = "dropped"
+        elif st.new_posts and st.expired:
+            status = "new_and_expired"
+        elif st.new_posts:
+            status = "new"
+        elif st.expired:
+            status = "expired"
+        else:
+            status = "threshold"  # the platform median moved
+        niches[name] = {
+            "status": status,
+            "posts": int(len(st.keys)),
+            "new_posts": st.new_posts,
+            "expired_posts": st.expired,
+            "selected": int(len(pos)),
+            "previously_selected": int(st.meta.get("selected", 0)),
+        }
+
+        if changed:
+            patterns = []
+            for i, score in zip(pos, scores):
+                p = json.loads(str(st.patterns[i]))
+                p["engagement_score"] = round(float(score), 4)
+                patterns.append(p)
+            if centroids:
+                patterns = niche_centroids(patterns)
+            for p in patterns:
+                p.update({"source": "centroid" if centroids else "batch", "batch_id": batch_id})
+            niches[name]["patterns"] = len(patterns)
+            if not dry_run:
+                written += replace_niche_patterns(key[0], key[1], patterns)
+            st.meta.update({"published": fp, "selected": int(len(pos)), "batch_id": batch_id, "computed_at": now})
+
+        st.meta.update({"platform": key[0], "niche": key[1], "posts": int(len(st.keys))})
+        if st.dirty and not dry_run:
+            st.save()
+
+    if not dry_run:
+        _save_watermarks({f"{k[0]}/{k[1]}": st.meta for k, st in states.items()}, now)
+
+    counts: Dict[str, int] = {}
+    for n in niches.values():
+        counts[n["status"]] = counts.get(n["status"], 0) + 1
+    report.update(
+        {
+            "batch_id": batch_id,
+            "dry_run": dry_run,
+            "centroids": centroids,
+            "platform_medians": {k: round(v, 4) for k, v in medians.items()},
+            "recomputed": sorted(k for k, n in niches.items() if "patterns" in n),
+            "status_counts": counts,
+            "niches": niches,
+            "patterns": written if not dry_run else sum(n.get("patterns", 0) for n in niches.values()),
+            "elapsed_sec": round(time.perf_counter() - t0, 2),
+        }
+    )
+    return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python wpil_incremental.py <posts.jsonl|posts.csv> [--dry-run] [--centroids]")
+        sys.exit(2)
+    flags = sys.argv[2:]
+    print(json.dumps(run_incremental(sys.argv[1], dry_run="--dry-run" in flags, centroids="--centroids" in flags), ensure_ascii=False, indent=2))
@@ -2,13 +2,14 @@
 # Controlled Pattern Ingestion Pipeline
 # Inserts ONLY abstract winning patterns into WPIL memory
 
-from wpil_memory import store_pattern
+from typing import Iterable, Sequence
 
+from wpil_memory import replace_patterns, store_pattern, store_patterns
 
-def ingest_pattern(pattern: dict) -> None:
+
+def validate_pattern(pattern: dict) -> None:
     """
-    Validates and stores a winning pattern.
-    This function is the ONLY allowed entry point to WPIL memory.
+    Raises ValueError unless `pattern` is a complete, purely structural pattern.
     """
 
     required_fields = [
@@ -39,9 +40,43 @@ def ingest_pattern(pattern: dict) -> None:
         if key in pattern:
             raise ValueError(f"Forbidden key detected: {key}")
 
+
+def ingest_pattern(pattern: dict) -> None:
+    """
+    Validates and stores a winning pattern.
+    This function (or ingest_patterns for batches) is the ONLY allowed entry
+    point to WPIL memory.
+    """
+    validate_pattern(pattern)
     store_pattern(pattern)
 
 
+def ingest_patterns(patterns: Iterable[dict]) -> int:
+    """
+    Validates every pattern, then stores them with one append.
+    Nothing is stored if any pattern is invalid.
+    """
+    batch = list(patterns)
+    for p in batch:
+        validate_pattern(p)
+    store_patterns(batch)
+    return len(batch)
+
+
+def replace_niche_patterns(platform: str, niche: str, patterns: Iterable[dict], sources: Sequence[str] = ("batch", "centroid")) -> int:
+    """
+    Validates, then atomically swaps the niche's derived patterns (those
+    from `sources`) for `patterns`. An empty list just retires them.
+    """
+    batch = list(patterns)
+    for p in batch:
+        validate_pattern(p)
+        if (p["platform"], p["niche"]) != (platform, niche):
+            raise ValueError(f"Pattern outside {platform}/{niche}: {p['platform']}/{p['niche']}")
+    replace_patterns(platform, niche, batch, sources)
+    return len(batch)
+
+
 if __name__ == "__main__":
     # Example controlled ingestion (manual trigger)
 
@@ -1,24 +1,147 @@
 # wpil_memory.py
 # WPIL Memory Store
 # Stores ONLY abstract winning patterns (no content, no text)
+#
+# Append-only JSONL log (one pattern per line) + in-memory index on
+# (platform, niche, intent). Writers append under an exclusive flock with a
+# single write() per batch, so concurrent processes never interleave lines.
+# Readers load the log once and then only read the bytes appended since
+# (by any process), keyed on the file's size / inode.
+#
+# A niche is re-derived by appending a retire record
+#   {"_retire": {"platform": ..., "niche": ..., "sources": [...]}}
+# followed by its new patterns in the same write: the record hides every
+# earlier pattern of that platform / niche from those sources.
 
+import fcntl
 import json
 import os
-from typing import Dict, List
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
-MEMORY_FILE = "wpil_patterns.json"
+MEMORY_FILE = "wpil_patterns.jsonl"
+LEGACY_FILE = "wpil_patterns.json"  # pre-JSONL store, imported once
 
+INDEX_FIELDS = ("platform", "niche", "intent")
 
-def _load_memory() -> List[Dict]:
-    if not os.path.exists(MEMORY_FILE):
-        return []
-    with open(MEMORY_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
 
+class _PatternIndex:
+    def __init__(self) -> None:
+        self.patterns: List[Dict] = []
+        self.by_key: Dict[Tuple, List[int]] = {}
+        self.by_field: Dict[str, Dict[object, List[int]]] = {f: {} for f in INDEX_FIELDS}
+        self.retired: Set[int] = set()
+        self.offset = 0
+        self.inode: Optional[int] = None
+        self.lock = threading.Lock()
 
-def _save_memory(patterns: List[Dict]) -> None:
-    with open(MEMORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(patterns, f, ensure_ascii=False, indent=2)
+    def reset(self) -> None:
+        self.patterns = []
+        self.by_key = {}
+        self.by_field = {f: {} for f in INDEX_FIELDS}
+        self.retired = set()
+        self.offset = 0
+        self.inode = None
+
+    def add(self, pattern: Dict) -> None:
+        if "_retire" in pattern:
+            self.retire(pattern["_retire"])
+            return
+        pos = len(self.patterns)
+        self.patterns.append(pattern)
+        self.by_key.setdefault(tuple(pattern.get(f) for f in INDEX_FIELDS), []).append(pos)
+        for f in INDEX_FIELDS:
+            self.by_field[f].setdefault(pattern.get(f), []).append(pos)
+
+    def retire(self, spec: Dict) -> None:
+        sources = set(spec.get("sources") or ())
+        plat = set(self.by_field["platform"].get(spec.get("platform"), []))
+        for pos in self.by_field["niche"].get(spec.get("niche"), []):
+            if pos in plat and self.patterns[pos].get("source") in sources:
+                self.retired.add(pos)
+
+    def live(self, positions: Iterable[int]) -> List[Dict]:
+        return [self.patterns[p] for p in positions if p not in self.retired]
+
+    def refresh(self) -> None:
+        """
+        Picks up lines appended since the last call (O(new bytes)).
+        """
+        try:
+            st = os.stat(MEMORY_FILE)
+        except FileNotFoundError:
+            self.reset()
+            return
+        if self.inode is not None and (st.st_ino != self.inode or st.st_size < self.offset):
+            self.reset()  # replaced or truncated: reload
+        if st.st_size == self.offset:
+            return
+        with open(MEMORY_FILE, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read(st.st_size - self.offset)
+        # only complete lines; a torn tail is picked up on the next refresh
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                self.add(json.loads(line))
+            except ValueError:
+                continue
+        self.offset += end
+        self.inode = st.st_ino
+
+
+_INDEX = _PatternIndex()
+
+
+def _append(patterns: Iterable[Dict]) -> None:
+    blob = "".join(json.dumps(p, ensure_ascii=False, separators=(",", ":")) + "\n" for p in patterns).encode("utf-8")
+    fd = os.open(MEMORY_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            _migrate_legacy(fd)
+            view = memoryview(blob)
+            while view:
+                n = os.write(fd, view)
+                view = view[n:]
+            if blob:
+                os.fsync(fd)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def _migrate_legacy(fd: int) -> None:
+    # called with the log locked: the first write imports the old JSON array
+    if os.fstat(fd).st_size > 0 or not os.path.exists(LEGACY_FILE):
+        return
+    try:
+        with open(LEGACY_FILE, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+    except (OSError, ValueError):
+        return
+    if isinstance(legacy, list) and legacy:
+        os.write(fd, "".join(json.dumps(p, ensure_ascii=False, separators=(",", ":")) + "\n" for p in legacy).encode("utf-8"))
+
+
+def _index() -> _PatternIndex:
+    with _INDEX.lock:
+        if _INDEX.inode is None and not os.path.exists(MEMORY_FILE) and os.path.exists(LEGACY_FILE):
+            _append([])  # creates the log and imports the legacy file
+        _INDEX.refresh()
+    return _INDEX
+
+
+def store_version() -> Tuple[Optional[int], int]:
+    """
+    Changes whenever the log does (inode, indexed bytes): cache key for
+    anything derived from the patterns.
+    """
+    idx = _index()
+    return idx.inode, idx.offset
 
 
 def store_pattern(pattern: Dict) -> None:
@@ -26,28 +149,63 @@ def store_pattern(pattern: Dict) -> None:
     Stores a single winning pattern.
     Pattern must be structural ONLY.
     """
-    patterns = _load_memory()
-    patterns.append(pattern)
-    _save_memory(patterns)
+    _append([pattern])
+
+
+def store_patterns(patterns: List[Dict]) -> None:
+    """
+    Stores many patterns with one locked append.
+    """
+    _append(patterns)
+
+
+def replace_patterns(platform: str, niche: str, patterns: List[Dict], sources: Sequence[str]) -> None:
+    """
+    Retires the niche's patterns from `sources` and stores `patterns` in
+    their place, in one locked append (readers never see the niche empty).
+    """
+    _append([{"_retire": {"platform": platform, "niche": niche, "sources": list(sources)}}] + list(patterns))
+
+
+def load_patterns() -> List[Dict]:
+    """
+    All live (not retired) patterns, in insertion order.
+    """
+    idx = _index()
+    return idx.live(range(len(idx.patterns)))
 
 
 def get_patterns(filter_by: Dict = None) -> List[Dict]:
     """
     Retrieves stored patterns.
-    Optional filtering by platform / niche / intent.
+    Optional filtering by platform / niche / intent (indexed); other keys are
+    matched against the indexed candidates.
     """
-    patterns = _load_memory()
+    idx = _index()
     if not filter_by:
-        return patterns
-
-    filtered = []
-    for p in patterns:
-        match = True
-        for k, v in filter_by.items():
-            if p.get(k) != v:
-                match = False
-                break
-        if match:
-            filtered.append(p)
-
-    return filtered
+        return idx.live(range(len(idx.patterns)))
+
+    indexed = {k: v for k, v in filter_by.items() if k in INDEX_FIELDS}
+    if len(indexed) == len(INDEX_FIELDS):
+        positions = idx.by_key.get(tuple(indexed[f] for f in INDEX_FIELDS), [])
+    elif indexed:
+        sets = sorted((idx.by_field[k].get(v, []) for k, v in indexed.items()), key=len)
+        common = set(sets[0]).intersection(*sets[1:])
+        positions = [p for p in sets[0] if p in common]
+    else:
+        positions = range(len(idx.patterns))
+
+    rest = {k: v for k, v in filter_by.items() if k not in INDEX_FIELDS}
+    return [p for p in idx.live(positions) if all(p.get(k) == v for k, v in rest.items())]
+
+
+def candidates(platform=None, niche=None, intent=None) -> List[Dict]:
+    """
+    Patterns matching ANY of the given fields, in insertion order.
+    """
+    idx = _index()
+    positions = set()
+    for f, v in (("platform", platform), ("niche", niche), ("intent", intent)):
+        if v is not None:
+            positions.update(idx.by_field[f].get(v, []))
+    return idx.live(sorted(positions))
@@ -1,33 +1,109 @@
 # wpil_runtime.py
 # WPIL Runtime Interface (No-evaluation, no-rejection)
-from typing import Dict, Any
+#
+# Constraints = defaults (+ remix extras) overlaid with the structural fields
+# of the best stored winning pattern for (platform, niche, intent)
+# (wpil_selector); only a pattern from a matching niche is applied, otherwise
+# the defaults stand. Resolved constraints are memoized per
+# (platform, niche, mode, intent) and the map is dropped whenever the
+# pattern store changes (wpil_memory.store_version), so a repeated lookup is
+# a stat + dict hit.
+import copy
+import threading
+from typing import Any, Dict, Optional, Tuple
 
+from wpil_memory import store_version
+from wpil_selector import retrieve_patterns
+
+CACHE_MAX_ENTRIES = 4096
+
+# stored patterns use the batch pipeline's platform names
+_PATTERN_PLATFORM = {"twitter": "x", "x.com": "x", "linked_in": "linkedin"}
+
+# only these pattern fields may override the defaults (structure only)
+_PATTERN_FIELDS = {
+    "hook": ("type", "max_words"),
+    "structure": ("line_density", "sentence_length", "narrative_arc", "avg_sentence_words"),
+    "cta": ("type", "position"),
+}
 
-def invoke_wpil(content_signal: Dict[str, Any]) -> Dict[str, Any]:
-    platform = (content_signal.get("platform") or "linkedin").lower().strip()
-    niche = (content_signal.get("niche") or "general").strip()
-    winning_post = (content_signal.get("winning_post") or "").strip()
 
+def _default_constraints(platform: str, mode: str) -> Dict[str, Any]:
     # Default constraints (بنيوية فقط)
     constraints = {
         "hook": {"type": "bold_claim", "max_words": 12},
         "structure": {"line_density": "one_idea_per_line", "avg_sentence_words": 14},
         "cta": {"type": "question", "position": "end"}
     }
-
-    mode = "direct"
-    notes = "defaults"
-
-    # لو المستخدم لصق Winning Post: نفعّل Remix Mode ونزيد الانضباط البنيوي
-    if len(winning_post) > 20:
-        mode = "remix"
-        notes = f"remix enabled for niche={niche}"
+    if mode == "remix":
         if platform == "twitter":
             constraints["thread"] = {"tweets": "5-7", "max_lines_per_tweet": 4}
         if platform == "linkedin":
             constraints["length_hint"] = {"words": "120-220"}
         if platform == "tiktok":
             constraints["video"] = {"seconds": "45-70", "shots": "5-8"}
+    return constraints
+
+
+def _resolve(platform: str, niche: str, mode: str, intent: Optional[str]) -> Tuple[Dict[str, Any], str]:
+    constraints = _default_constraints(platform, mode)
+    ranked = retrieve_patterns(
+        {"platform": _PATTERN_PLATFORM.get(platform, platform), "niche": niche, "intent": intent}, k=1, require_niche=True
+    )
+    if not ranked:
+        return constraints, "defaults"
+
+    score, pattern = ranked[0]
+    for section, fields in _PATTERN_FIELDS.items():
+        src = pattern.get(section)
+        if not isinstance(src, dict):
+            continue
+        for f in fields:
+            if src.get(f) is not None:
+                constraints[section][f] = src[f]
+    return constraints, f"pattern {pattern.get('platform')}/{pattern.get('niche')} ({pattern.get('intent')}, score={score})"
+
+
+_CACHE: Dict[str, Any] = {"version": None, "entries": {}}
+_LOCK = threading.Lock()
+
+
+def resolve_constraints(platform: str, niche: str, mode: str = "direct", intent: Optional[str] = None) -> Tuple[Dict[str, Any], str]:
+    """
+    (constraints, provenance note); memoized until the pattern store changes.
+    Callers get their own copy of the constraints.
+    """
+    key = (platform, niche, mode, intent)
+    version = store_version()
+    with _LOCK:
+        if _CACHE["version"] != version:
+            _CACHE["entries"] = {}
+            _CACHE["version"] = version
+        hit = _CACHE["entries"].get(key)
+    if hit is None:
+        hit = _resolve(platform, niche, mode, intent)
+        with _LOCK:
+            entries = _CACHE["entries"]
+            if _CACHE["version"] == version:
+                if len(entries) >= CACHE_MAX_ENTRIES:
+                    entries.pop(next(iter(entries)))
+                entries[key] = hit
+    return copy.deepcopy(hit[0]), hit[1]
+
+
+def invoke_wpil(content_signal: Dict[str, Any]) -> Dict[str, Any]:
+    platform = (content_signal.get("platform") or "linkedin").lower().strip()
+    niche = (content_signal.get("niche") or "general").strip()
+    winning_post = (content_signal.get("winning_post") or "").strip()
+    intent = (content_signal.get("intent") or "").strip() or None
+
+    # لو المستخدم لصق Winning Post: نفعّل Remix Mode ونزيد الانضباط البنيوي
+    mode = "remix" if len(winning_post) > 20 else "direct"
+    constraints, source = resolve_constraints(platform, niche, mode, intent)
+
+    notes = source
+    if mode == "remix":
+        notes = f"remix enabled for niche={niche}; {source}"
 
     return {
         "mode": mode,
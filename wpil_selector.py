@@ -1,50 +1,168 @@
 # wpil_selector.py
 # Winning Pattern Selection Engine
 # Chooses the best matching winning pattern for the current signal
+#
+# Scoring keeps the original priorities (platform 3, niche 2, intent 1) but
+# the niche term is a similarity in [0, 1]: cosine over character 3-gram
+# TF-IDF vectors of the normalized niche (utils.text), so "SaaS" finds
+# "saas startups" and Arabic spelling variants match. The index over distinct
+# niches is built once per store version; a query only touches niches that
+# share an n-gram with it (inverted postings), and only patterns with a
+# non-zero score are scored (NumPy) and ranked.
 
-from typing import Dict, List
-from wpil_memory import load_patterns
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 
-def select_winning_pattern(content_signal: Dict) -> Dict:
-    """
-    Selects the most relevant winning pattern based on strict matching.
-    Priority:
-    1. platform
-    2. niche
-    3. intent
-    """
+from utils.text import char_ngrams
+from wpil_memory import load_patterns, store_version
 
-    patterns: List[Dict] = load_patterns()
+W_PLATFORM, W_NICHE, W_INTENT = 3.0, 2.0, 1.0
+MIN_NICHE_SIM = 0.25  # below this a niche does not count as a match
 
-    if not patterns:
-        raise RuntimeError("WPIL has no stored patterns.")
 
-    platform = content_signal.get("platform")
-    niche = content_signal.get("niche")
-    intent = content_signal.get("intent")
+class _RetrievalIndex:
+    def __init__(self, patterns: List[Dict]) -> None:
+        self.patterns = patterns
+        n = len(patterns)
 
-    scored_patterns = []
+        niches: Dict[str, int] = {}
+        self.niche_ids = np.empty(n, dtype=np.int32)
+        for i, p in enumerate(patterns):
+            self.niche_ids[i] = niches.setdefault(str(p.get("niche") or ""), len(niches))
+        self.niche_list = list(niches)
+        self.by_niche: List[List[int]] = [[] for _ in self.niche_list]
+        for i, nid in enumerate(self.niche_ids):
+            self.by_niche[nid].append(i)
 
-    for pattern in patterns:
-        score = 0
+        self.platforms = np.array([str(p.get("platform") or "") for p in patterns], dtype=object)
+        self.intents = np.array([str(p.get("intent") or "") for p in patterns], dtype=object)
+        self.by_platform: Dict[str, List[int]] = {}
+        self.by_intent: Dict[str, List[int]] = {}
+        for i in range(n):
+            self.by_platform.setdefault(self.platforms[i], []).append(i)
+            self.by_intent.setdefault(self.intents[i], []).append(i)
 
-        if pattern.get("platform") == platform:
-            score += 3
+        # TF-IDF over distinct niches: sublinear tf, smoothed idf, L2-normalized
+        tfs = []
+        df: Dict[str, int] = {}
+        for niche in self.niche_list:
+            tf: Dict[str, int] = {}
+            for g in char_ngrams(niche):
+                tf[g] = tf.get(g, 0) + 1
+            tfs.append(tf)
+            for g in tf:
+                df[g] = df.get(g, 0) + 1
+        total = len(self.niche_list)
+        self.idf = {g: math.log((1 + total) / (1 + c)) + 1.0 for g, c in df.items()}
 
-        if pattern.get("niche") == niche:
-            score += 2
+        postings: Dict[str, Tuple[List[int], List[float]]] = {}
+        for nid, tf in enumerate(tfs):
+            w = {g: (1.0 + math.log(c)) * self.idf[g] for g, c in tf.items()}
+            norm = math.sqrt(sum(v * v for v in w.values())) or 1.0
+            for g, v in w.items():
+                ids, ws = postings.setdefault(g, ([], []))
+                ids.append(nid)
+                ws.append(v / norm)
+        self.postings = {g: (np.array(ids, dtype=np.int32), np.array(ws, dtype=np.float32)) for g, (ids, ws) in postings.items()}
 
-        if pattern.get("intent") == intent:
-            score += 1
+    def niche_similarity(self, niche: str) -> Dict[int, float]:
+        """
+        {niche_id: cosine} for niches sharing at least one n-gram with `niche`.
+        """
+        tf: Dict[str, int] = {}
+        for g in char_ngrams(niche):
+            if g in self.postings:
+                tf[g] = tf.get(g, 0) + 1
+        if not tf:
+            return {}
+        q = {g: (1.0 + math.log(c)) * self.idf[g] for g, c in tf.items()}
+        # unseen n-grams still count towards the query norm
+        unseen = len(char_ngrams(niche)) - sum(tf.values())
+        norm = math.sqrt(sum(v * v for v in q.values()) + max(0, unseen)) or 1.0
+        acc = np.zeros(len(self.niche_list), dtype=np.float32)
+        for g, v in q.items():
+            ids, ws = self.postings[g]
+            acc[ids] += ws * (v / norm)
+        hit = np.flatnonzero(acc)
+        return {int(i): float(acc[i]) for i in hit}
 
-        if score > 0:
-            scored_patterns.append((score, pattern))
+    def top_k(
+        self, platform: Optional[str], niche: Optional[str], intent: Optional[str], k: int, require_niche: bool = False
+    ) -> List[Tuple[float, Dict]]:
+        sims = self.niche_similarity(niche) if niche else {}
+        sims = {nid: s for nid, s in sims.items() if s >= MIN_NICHE_SIM}
 
-    if not scored_patterns:
-        raise RuntimeError("No compatible winning pattern found.")
+        cand = set()
+        if not require_niche:
+            cand.update(self.by_platform.get(str(platform), []) if platform else [])
+            cand.update(self.by_intent.get(str(intent), []) if intent else [])
+        for nid in sims:
+            cand.update(self.by_niche[nid])
+        if not cand:
+            return []
+
+        pos = np.fromiter(sorted(cand), dtype=np.int64, count=len(cand))
+        niche_sim = np.zeros(len(self.niche_list), dtype=np.float32)
+        for nid, s in sims.items():
+            niche_sim[nid] = s
+        score = (
+            W_PLATFORM * (self.platforms[pos] == str(platform)).astype(np.float32)
+            + W_NICHE * niche_sim[self.niche_ids[pos]]
+            + W_INTENT * (self.intents[pos] == str(intent)).astype(np.float32)
+        )
+
+        k = max(1, int(k))
+        if len(pos) > k:
+            part = np.argpartition(-score, k - 1)[:k]
+            # argpartition is unordered and ties at the cut are arbitrary:
+            # widen to every candidate scoring >= the k-th best, then order
+            part = np.flatnonzero(score >= score[part].min())
+        else:
+            part = np.arange(len(pos))
+        # highest score first; ties go to the earliest stored pattern
+        order = part[np.lexsort((pos[part], -score[part]))][:k]
+        return [(round(float(score[i]), 4), self.patterns[pos[i]]) for i in order if score[i] > 0]
+
+
+_CACHE: Dict[str, object] = {"version": None, "index": None}
+_LOCK = threading.Lock()
+
+
+def _retrieval_index() -> _RetrievalIndex:
+    version = store_version()
+    with _LOCK:
+        if _CACHE["version"] != version or _CACHE["index"] is None:
+            _CACHE["index"] = _RetrievalIndex(load_patterns())
+            _CACHE["version"] = version
+        return _CACHE["index"]  # type: ignore[return-value]
 
-    # Choose the highest scoring pattern
-    scored_patterns.sort(key=lambda x: x[0], reverse=True)
 
-    return scored_patterns[0][1]
+def retrieve_patterns(content_signal: Dict, k: int = 5, require_niche: bool = False) -> List[Tuple[float, Dict]]:
+    """
+    Top-k (score, pattern) for the signal, best first. With require_niche,
+    only patterns whose niche matches (similarity >= MIN_NICHE_SIM).
+    """
+    idx = _retrieval_index()
+    return idx.top_k(content_signal.get("platform"), content_signal.get("niche"), content_signal.get("intent"), k, require_niche)
+
+
+def select_winning_pattern(content_signal: Dict) -> Dict:
+    """
+    Selects the most relevant winning pattern.
+    Priority:
+    1. platform
+    2. niche (fuzzy)
+    3. intent
+    """
+    idx = _retrieval_index()
+    if not idx.patterns:
+        raise RuntimeError("WPIL has no stored patterns.")
+
+    ranked = idx.top_k(content_signal.get("platform"), content_signal.get("niche"), content_signal.get("intent"), 1)
+    if not ranked:
+        raise RuntimeError("No compatible winning pattern found.")
+
+    return ranked[0][1]